@@ -0,0 +1,100 @@
+"""
+This file contains the benchmark of the input parser, it compares the parser with the previous parser based on ast.literal_eval on generated network-scale inputs.
+Run it from the src/sprout directory: python -m benchmarks.inputParserBenchmark [numberOfBusStops]
+
+:author: Lukas Katona
+"""
+
+import ast
+import random
+import sys
+import timeit
+
+from sprout.backend.InputParser import HourRate, InputParser
+from sprout.backend.models import BusStop
+
+def parseBusStopsWithLiteralEval(string: str) -> list[BusStop]:
+    """
+    Parse the bus stops the way the previous parser did, with ast.literal_eval for the passenger arrival rates.
+
+    :param string: The string containing the bus stops.
+    :type string: str
+    :return: A list of bus stops.
+    :rtype: list[BusStop]
+    """
+    busStops = []
+    for line in string.split("\n"):
+        line = line.strip()
+        if line.startswith("#") or line == "":
+            continue
+        name, timeDeltaToArrive, passengerArrivalRatesPerHour, leavingPassengersRate = line.split(":")
+        parsedHourRate = [HourRate(hour, rate) for hour, rate in ast.literal_eval(passengerArrivalRatesPerHour)]
+        busStops.append(BusStop(name.strip(), int(timeDeltaToArrive.strip()), parsedHourRate, float(leavingPassengersRate.strip())))
+    return busStops
+
+def generateBusStops(numberOfBusStops: int, seed: int = 0) -> str:
+    """
+    Generate bus stops in the input format, with rates for hours 5 to 22 like the sample inputs.
+
+    :param numberOfBusStops: The number of bus stops.
+    :type numberOfBusStops: int
+    :param seed: The seed of the generator, defaults to 0
+    :type seed: int, optional
+    :return: The bus stops in the input format.
+    :rtype: str
+    """
+    generator = random.Random(seed)
+    lines = ["# generated bus stops"]
+    for i in range(numberOfBusStops):
+        rates = ", ".join(f"({hour}, {generator.randint(20, 100)})" for hour in range(5, 23))
+        lines.append(f"Zastavka {i}:{generator.randint(1, 5)}:[{rates}]:{generator.randint(0, 100) / 100}")
+    return "\n".join(lines)
+
+def generateTimeTable(numberOfDays: int, seed: int = 0) -> str:
+    """
+    Generate a timetable in the input format, the 24 hours are repeated for every day to get a large input.
+
+    :param numberOfDays: The number of repetitions of the 24 hours.
+    :type numberOfDays: int
+    :param seed: The seed of the generator, defaults to 0
+    :type seed: int, optional
+    :return: The timetable in the input format.
+    :rtype: str
+    """
+    generator = random.Random(seed)
+    lines = ["# generated timetable"]
+    for _ in range(numberOfDays):
+        for hour in range(24):
+            minutes = sorted(generator.sample(range(60), generator.randint(1, 12)))
+            lines.append(f"{hour}:" + ", ".join(str(minute) for minute in minutes))
+    return "\n".join(lines)
+
+def measure(function, repeat: int = 5) -> float:
+    """
+    Measure the best time of the function over the repetitions.
+
+    :param function: The function to measure.
+    :type function: Callable
+    :param repeat: The number of repetitions, defaults to 5
+    :type repeat: int, optional
+    :return: The best time in seconds.
+    :rtype: float
+    """
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+def main():
+    numberOfBusStops = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    busStopsString = generateBusStops(numberOfBusStops)
+    timeTableString = generateTimeTable(numberOfBusStops // 24 + 1)
+
+    literalEvalTime = measure(lambda: parseBusStopsWithLiteralEval(busStopsString))
+    parserTime = measure(lambda: InputParser.parseBusStopsFromString(busStopsString))
+    timeTableTime = measure(lambda: InputParser.parseTimeTableFromString(timeTableString))
+
+    print(f"Bus stops: {numberOfBusStops}")
+    print(f"ast.literal_eval parser: {literalEvalTime * 1000:.1f} ms")
+    print(f"InputParser: {parserTime * 1000:.1f} ms ({literalEvalTime / parserTime:.1f}x faster)")
+    print(f"Timetable rows: {len(timeTableString.splitlines()) - 1}, InputParser: {timeTableTime * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
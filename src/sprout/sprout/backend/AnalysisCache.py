@@ -0,0 +1,229 @@
+"""
+This file contains the AnalysisCache class, which is used to remember the averaged statistics of already analyzed scenarios.
+
+:author: Lukas Katona
+"""
+
+from collections import OrderedDict
+import copy
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+
+from .models import BusStop, TimeTable
+from .Statistics import Statistics
+
+class AnalysisCache:
+    # Static version of the cached results, bump it when the simulation changes its results, so old files on disk are not used
+    version = 3
+
+    # INIT
+    def __init__(self, maxSize: int = 64, directory: str = None):
+        self.maxSize = maxSize
+        # directory of the on-disk tier, None if only the in-memory tier is used
+        self.directory = directory
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+        # key -> statistics, ordered from least to most recently used, callers only get copies of them
+        self.entries = OrderedDict()
+        # the cache is shared by the handlers of all sessions, the entries and the counters are changed under the lock
+        self.lock = threading.Lock()
+        self.memoryHits = 0
+        self.diskHits = 0
+        self.misses = 0
+
+    # METHODS
+    @staticmethod
+    def key(busStops: list[BusStop], timeTable: TimeTable, vehicleCapacity: int, vehicleSeats: int, numberOfSimulations: int, seed: int, engine, antitheticVariates: bool = False, controlVariates: bool = False, relativePrecision: float = None, timeBudget: float = None, initialSimulations: int = None, batchSize: int = None) -> str:
+        """
+        Get the cache key of the scenario and the simulation settings.
+        The key is a hash of the parsed inputs, so it does not change with comments, whitespace or the order of the timetable rows.
+        All stopping parameters of adaptive replications are a part of the key, results which stopped on the time budget should not be cached at all.
+
+        :param busStops: The bus stops.
+        :type busStops: list[BusStop]
+        :param timeTable: The timetable.
+        :type timeTable: TimeTable
+        :param vehicleCapacity: The capacity of the vehicle.
+        :type vehicleCapacity: int
+        :param vehicleSeats: The number of seats in the vehicle.
+        :type vehicleSeats: int
+        :param numberOfSimulations: The number of simulations, or the maximum number of simulations of adaptive replications.
+        :type numberOfSimulations: int
+        :param seed: The root seed of the simulations.
+        :type seed: int
+        :param engine: The simulation engine.
+        :type engine: Simulation.Engine
+        :param antitheticVariates: Whether the replications are antithetic pairs, defaults to False
+        :type antitheticVariates: bool, optional
+        :param controlVariates: Whether the expected number of arrived passengers is used as a control variate, defaults to False
+        :type controlVariates: bool, optional
+        :param relativePrecision: The relative precision of adaptive replications, defaults to None (fixed number of simulations)
+        :type relativePrecision: float, optional
+        :param timeBudget: The time budget of adaptive replications in seconds, defaults to None
+        :type timeBudget: float, optional
+        :param initialSimulations: The number of simulations of the first batch of adaptive replications, defaults to None
+        :type initialSimulations: int, optional
+        :param batchSize: The number of simulations of the following batches of adaptive replications, defaults to None
+        :type batchSize: int, optional
+        :return: The cache key.
+        :rtype: str
+        """
+        scenario = (
+            AnalysisCache.version,
+            tuple((busStop.name, int(busStop.timeDeltaToArrive), tuple((int(hour), float(rate)) for hour, rate in busStop.passengerArrivalRatesPerHour), float(busStop.leavingPassengersRate)) for busStop in busStops),
+            tuple(sorted(timeTable.getAllTimes())),
+            int(vehicleCapacity),
+            int(vehicleSeats),
+            int(numberOfSimulations),
+            seed,
+            engine.name,
+            bool(antitheticVariates),
+            bool(controlVariates),
+            relativePrecision,
+            timeBudget,
+            initialSimulations,
+            batchSize,
+        )
+        return hashlib.sha256(repr(scenario).encode()).hexdigest()
+
+    def get(self, key: str) -> Statistics | None:
+        """
+        Get the statistics of the scenario, from memory or from disk.
+        Statistics found on disk are moved to memory.
+        The caller gets its own copy, which it can modify.
+
+        :param key: The cache key.
+        :type key: str
+        :return: The statistics, or None on a miss.
+        :rtype: Statistics | None
+        """
+        with self.lock:
+            stats = self.entries.get(key)
+            if stats is not None:
+                self.memoryHits += 1
+                self.entries.move_to_end(key)
+                return copy.deepcopy(stats)
+        # the file is read without the lock, the other handlers do not wait for the disk
+        stats = self.loadFromDisk(key)
+        with self.lock:
+            if stats is not None:
+                self.diskHits += 1
+                self.addToMemory(key, stats)
+                return copy.deepcopy(stats)
+            self.misses += 1
+            return None
+
+    def add(self, key: str, stats: Statistics):
+        """
+        Add the statistics of the scenario to memory and to disk.
+        The cache keeps its own copy, so the caller can modify the statistics afterwards.
+
+        :param key: The cache key.
+        :type key: str
+        :param stats: The statistics.
+        :type stats: Statistics
+        """
+        stats = copy.deepcopy(stats)
+        with self.lock:
+            self.addToMemory(key, stats)
+        self.saveToDisk(key, stats)
+
+    def addToMemory(self, key: str, stats: Statistics):
+        """
+        Add the statistics to memory and evict the least recently used statistics if the cache is full.
+        Called with the lock held.
+
+        :param key: The cache key.
+        :type key: str
+        :param stats: The statistics.
+        :type stats: Statistics
+        """
+        if self.maxSize <= 0:
+            return
+        self.entries[key] = stats
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+
+    def loadFromDisk(self, key: str) -> Statistics | None:
+        """
+        Load the statistics from disk.
+
+        :param key: The cache key.
+        :type key: str
+        :return: The statistics, or None if there is no on-disk tier, no file for the key or the file can not be read.
+        :rtype: Statistics | None
+        """
+        if self.directory is None:
+            return None
+        try:
+            with open(os.path.join(self.directory, key + ".pickle"), "rb") as file:
+                return pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+
+    def saveToDisk(self, key: str, stats: Statistics):
+        """
+        Save the statistics to disk, the file is written under a temporary name and renamed, so a reader never sees a partial file.
+
+        :param key: The cache key.
+        :type key: str
+        :param stats: The statistics.
+        :type stats: Statistics
+        """
+        if self.directory is None:
+            return
+        descriptor, temporaryPath = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                pickle.dump(stats, file)
+            os.replace(temporaryPath, os.path.join(self.directory, key + ".pickle"))
+        except OSError:
+            if os.path.exists(temporaryPath):
+                os.remove(temporaryPath)
+
+    def hitRate(self) -> float:
+        """
+        Get the ratio of hits to all lookups.
+
+        :return: The hit rate, 0 if there were no lookups.
+        :rtype: float
+        """
+        lookups = self.memoryHits + self.diskHits + self.misses
+        return (self.memoryHits + self.diskHits) / lookups if lookups > 0 else 0
+
+    # CLEAR
+    def clear(self):
+        """
+        Clear the in-memory tier and the counters, the files on disk are kept.
+        """
+        with self.lock:
+            self.entries = OrderedDict()
+            self.memoryHits = 0
+            self.diskHits = 0
+            self.misses = 0
+
+    # STR
+    def __str__(self):
+        return f"AnalysisCache: {len(self.entries)}/{self.maxSize} entries, {self.memoryHits} memory hits, {self.diskHits} disk hits, {self.misses} misses"
+
+# Analysis cache shared by all sessions of the server, created on the first use
+sharedAnalysisCache = None
+sharedAnalysisCacheLock = threading.Lock()
+
+def getAnalysisCache() -> AnalysisCache:
+    """
+    Get the analysis cache shared by all sessions of the server.
+    The on-disk tier is used if the SPROUT_ANALYSIS_CACHE_DIR environment variable is set.
+
+    :return: The shared analysis cache.
+    :rtype: AnalysisCache
+    """
+    global sharedAnalysisCache
+    with sharedAnalysisCacheLock:
+        if sharedAnalysisCache is None:
+            sharedAnalysisCache = AnalysisCache(directory=os.environ.get("SPROUT_ANALYSIS_CACHE_DIR"))
+        return sharedAnalysisCache
@@ -0,0 +1,76 @@
+"""
+This file contains the ArrivalStreams class, which holds the passenger arrivals shared by simulations using common random numbers.
+
+:author: Lukas Katona
+"""
+
+import numpy as np
+
+class ArrivalStreams:
+    """
+    Passenger arrivals of every bus stop and hour, drawn once and shared by all simulations using the streams.
+    A bus arriving at a stop in a given hour takes the passengers of the stream of that stop and hour, who arrived since the previous bus.
+    The stream of a stop and hour is a poisson process with the rate of that hour over the whole simulation, so the number of passengers
+    in any interval has the same poisson distribution as in a simulation with its own random numbers, but simulations of different timetables see the same passengers.
+    """
+    # Static length of the interval before the start of the simulation, from which the passengers for the first bus can arrive
+    firstBusWaitingTime = 15
+
+    # INIT
+    def __init__(self, seed, busStops, startTime: int, endTime: int):
+        self.seedSequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.busStops = busStops
+        self.startTime = startTime
+        self.endTime = endTime
+        # bus stop index -> (arrival times sorted within every hour, arrival times shifted by their hour so the whole array is sorted), generated on the first use
+        self.streams = {}
+
+    # METHODS
+    def getStreams(self, busStopIndex: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Get the arrivals of all hours of the bus stop, draw them on the first use.
+        Every stop has its own random number stream spawned from the seed, so the arrivals do not depend on the order of the requests.
+
+        :param busStopIndex: The index of the bus stop in the list of bus stops.
+        :type busStopIndex: int
+        :return: The arrival times ordered by hour and time, and the same times shifted by their hour times the span of the simulation.
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+        if busStopIndex not in self.streams:
+            start = self.startTime - ArrivalStreams.firstBusWaitingTime
+            span = self.endTime - start
+            rates = np.zeros(24)
+            for hourRate in reversed(self.busStops[busStopIndex].passengerArrivalRatesPerHour):
+                rates[hourRate.hour] = hourRate.rate / 60
+            rng = np.random.default_rng(np.random.SeedSequence(self.seedSequence.entropy, spawn_key=self.seedSequence.spawn_key + (busStopIndex,)))
+            numberOfPassengers = rng.poisson(rates * span)
+            # shifting the arrivals by their hour keeps the hours apart, so a single sort orders them by hour and time
+            shifts = np.repeat(np.arange(24) * span, numberOfPassengers)
+            keys = np.sort(shifts + rng.uniform(0, span, len(shifts)))
+            self.streams[busStopIndex] = (keys - shifts + start, keys)
+        return self.streams[busStopIndex]
+
+    def takeArrivals(self, busStopIndex: int, hours: np.ndarray, intervalStarts: np.ndarray, times: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Get the passengers of every bus visit, who arrived in the interval since the previous bus, from the stream of the hour of the visit.
+
+        :param busStopIndex: The index of the bus stop in the list of bus stops.
+        :type busStopIndex: int
+        :param hours: The hour of every visit.
+        :type hours: np.ndarray
+        :param intervalStarts: The start of the arrival interval of every visit.
+        :type intervalStarts: np.ndarray
+        :param times: The time of every visit, the end of its arrival interval.
+        :type times: np.ndarray
+        :return: The number of passengers of every visit, and the arrival times of all passengers, sorted within every visit and in the order of the visits.
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+        arrivalTimes, keys = self.getStreams(busStopIndex)
+        span = self.endTime - (self.startTime - ArrivalStreams.firstBusWaitingTime)
+        start = self.startTime - ArrivalStreams.firstBusWaitingTime
+        low = np.searchsorted(keys, hours * span + (intervalStarts - start), side="right")
+        high = np.searchsorted(keys, hours * span + (times - start), side="right")
+        numberOfPassengers = np.maximum(high - low, 0)
+        firstPassengers = np.cumsum(numberOfPassengers) - numberOfPassengers
+        indices = np.repeat(low - firstPassengers, numberOfPassengers) + np.arange(int(numberOfPassengers.sum()))
+        return numberOfPassengers, arrivalTimes[indices]
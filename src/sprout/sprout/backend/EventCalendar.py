@@ -4,6 +4,8 @@ This file contains event calendar class and event class, both used in the simula
 :author: Lukas Katona
 """
 
+import heapq
+
 class Event:
     # INIT
     def __init__(self, time, action, actionArgument):
@@ -11,6 +13,7 @@ class Event:
         self.time = time
         self.action = action
         self.actionArgument = actionArgument
+        self.cancelled = False
 
     # CALL
     def __call__(self):
@@ -32,18 +35,21 @@ class Event:
 class EventCalendar:
     # INIT
     def __init__(self):
+        # binary heap of (time, id, event) entries, id keeps events with the same time in insertion order
         self.events = []
+        # id -> event of the pending events, the events which are added and neither cancelled nor returned yet
+        self.pendingIds = {}
         self.maxId = 0
 
     # METHODS
     def isEmpty(self) -> bool:
         """
-        Check if the event calendar is empty.
+        Check if the event calendar is empty. Cancelled events are not counted.
 
         :return: True if the event calendar is empty, False otherwise.
         :rtype: bool
         """
-        return len(self.events) == 0
+        return len(self.pendingIds) == 0
 
     def addEvent(self, event: Event):
         """
@@ -52,11 +58,49 @@ class EventCalendar:
         :param event: The event to be added.
         :type event: Event
         """
-        self.events.append(event)
-        self.events.sort(key=lambda x: x.time)
+        self.assignId(event)
+        heapq.heappush(self.events, (event.time, event.id, event))
+
+    def addEvents(self, events: list[Event]):
+        """
+        Add multiple events to the event calendar at once.
+        The events are appended and the calendar is heapified only once, which is faster than adding them one by one.
+
+        :param events: The events to be added.
+        :type events: list[Event]
+        """
+        for event in events:
+            self.assignId(event)
+            self.events.append((event.time, event.id, event))
+        heapq.heapify(self.events)
+
+    def assignId(self, event: Event):
+        """
+        Assign a new unique id to the event and mark it as pending.
+
+        :param event: The event to assign the id to.
+        :type event: Event
+        """
+        # an event added again while pending keeps only its new id, its older entry becomes stale
+        if self.pendingIds.get(event.id) is event:
+            del self.pendingIds[event.id]
         event.id = self.maxId
+        event.cancelled = False
+        self.pendingIds[event.id] = event
         self.maxId += 1
 
+    def peekNextEvent(self) -> Event | None:
+        """
+        Get the next event from the event calendar without removing it from the calendar.
+
+        :return: The next event in the calendar, or None if the calendar is empty.
+        :rtype: Event | None
+        """
+        self.discardCancelledEvents()
+        if len(self.events) > 0:
+            return self.events[0][2]
+        return None
+
     def getNextEvent(self) -> Event | None:
         """
         Get the next event from the event calendar, then remove it from the calendar.
@@ -64,11 +108,52 @@ class EventCalendar:
         :return: The next event in the calendar, or None if the calendar is empty.
         :rtype: Event | None
         """
+        self.discardCancelledEvents()
         if len(self.events) > 0:
-            event = self.events.pop(0)
+            _, eventId, event = heapq.heappop(self.events)
+            del self.pendingIds[eventId]
             return event
         return None
+
+    def cancelEvent(self, event: Event) -> bool:
+        """
+        Cancel a pending event. The event is only marked as cancelled and is skipped once it reaches the top of the calendar,
+        so no search through the calendar is needed.
+
+        :param event: The event to be cancelled.
+        :type event: Event
+        :return: True if the event was pending and is now cancelled, False otherwise.
+        :rtype: bool
+        """
+        if event.cancelled or self.pendingIds.get(event.id) is not event:
+            return False
+        event.cancelled = True
+        del self.pendingIds[event.id]
+        return True
+
+    def discardCancelledEvents(self):
+        """
+        Remove cancelled events from the top of the calendar.
+        An event added again gets a new id, so its older entries are stale and removed as well.
+        """
+        while len(self.events) > 0 and not EventCalendar.isLive(self.events[0], self.pendingIds):
+            heapq.heappop(self.events)
+
+    @staticmethod
+    def isLive(entry: tuple, pendingIds: dict) -> bool:
+        """
+        Check whether the entry of the calendar belongs to a pending event, it is not cancelled and it is the latest entry of the event.
+
+        :param entry: The (time, id, event) entry.
+        :type entry: tuple
+        :param pendingIds: The pending events by their ids.
+        :type pendingIds: dict
+        :return: True if the entry is live, False otherwise.
+        :rtype: bool
+        """
+        _, eventId, event = entry
+        return eventId == event.id and pendingIds.get(eventId) is event
     
     # STR
     def __str__(self):
-        return "\n".join([str(event) for event in self.events])
+        return "\n".join([str(entry[2]) for entry in sorted(self.events) if EventCalendar.isLive(entry, self.pendingIds)])
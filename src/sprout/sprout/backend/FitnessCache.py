@@ -0,0 +1,110 @@
+"""
+This file contains the FitnessCache class, which is used to remember the fitness values of already simulated chromosomes during the genetic algorithm.
+
+:author: Lukas Katona
+"""
+
+from collections import OrderedDict
+
+class FitnessCache:
+    # INIT
+    def __init__(self, maxSize: int = 10000, maxReplications: int = 1):
+        self.maxSize = maxSize
+        self.maxReplications = maxReplications
+        # chromosome -> [number of replications, sum of costs, sum of satisfactions, sum of passengers left unboarded], ordered from least to most recently used
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # METHODS
+    @staticmethod
+    def key(chromosome: list[int]) -> tuple[int, ...]:
+        """
+        Get the cache key of the chromosome.
+
+        :param chromosome: The chromosome.
+        :type chromosome: list[int]
+        :return: The cache key.
+        :rtype: tuple[int, ...]
+        """
+        return tuple(int(gene) for gene in chromosome)
+
+    def get(self, chromosome: list[int]) -> tuple[float, float, float] | None:
+        """
+        Get the fitness values of the chromosome.
+        If the chromosome was not simulated yet, or it has fewer replications than the maximum number of replications, it is a miss and the chromosome should be simulated again.
+
+        :param chromosome: The chromosome.
+        :type chromosome: list[int]
+        :return: The average cost, satisfaction and number of passengers left unboarded, or None on a miss.
+        :rtype: tuple[float, float, float] | None
+        """
+        entry = self.entries.get(FitnessCache.key(chromosome))
+        if entry is None or entry[0] < self.maxReplications:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(FitnessCache.key(chromosome))
+        return FitnessCache.average(entry)
+
+    def add(self, chromosome: list[int], fitness: tuple[float, float, int]) -> tuple[float, float, float]:
+        """
+        Add a new replication of the chromosome to the cache and evict the least recently used chromosome if the cache is full.
+
+        :param chromosome: The chromosome.
+        :type chromosome: list[int]
+        :param fitness: The cost, satisfaction and number of passengers left unboarded from one simulation.
+        :type fitness: tuple[float, float, int]
+        :return: The average fitness values over all replications of the chromosome.
+        :rtype: tuple[float, float, float]
+        """
+        if self.maxSize <= 0:
+            return fitness
+        key = FitnessCache.key(chromosome)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = [0, 0, 0, 0]
+            self.entries[key] = entry
+        entry[0] += 1
+        entry[1] += fitness[0]
+        entry[2] += fitness[1]
+        entry[3] += fitness[2]
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+        return FitnessCache.average(entry)
+
+    @staticmethod
+    def average(entry: list) -> tuple[float, float, float]:
+        """
+        Calculate the average fitness values of the cache entry.
+
+        :param entry: The cache entry.
+        :type entry: list
+        :return: The average cost, satisfaction and number of passengers left unboarded.
+        :rtype: tuple[float, float, float]
+        """
+        return entry[1] / entry[0], entry[2] / entry[0], entry[3] / entry[0]
+
+    def hitRate(self) -> float:
+        """
+        Get the ratio of hits to all lookups.
+
+        :return: The hit rate, 0 if there were no lookups.
+        :rtype: float
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0
+
+    # CLEAR
+    def clear(self):
+        """
+        Clear the cache and its counters.
+        """
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # STR
+    def __str__(self):
+        return f"FitnessCache: {len(self.entries)}/{self.maxSize} entries, {self.hits} hits, {self.misses} misses"
@@ -1,116 +1,288 @@
 """
-This file contains the Genetics class and the Individual class, both used in the genetic algorithm for the optimization of the bus timetable.
+This file contains the Genetics class and the Population class, both used in the genetic algorithm for the optimization of the bus timetable.
 
 :author: Lukas Katona
 """
 
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from .ArrivalStreams import ArrivalStreams
+from .FitnessCache import FitnessCache
+from .LearnedSurrogate import LearnedSurrogate
+from .QueueingSurrogate import QueueingSurrogate
 from .RandomNumberGenerator import RandomNumberGenerator
 from .Simulation import Simulation
 from .models import TimeTable
 
-class Individual:
+def evaluateChromosome(chromosome: list[int], seed, busStops, vehicleCapacity: int, vehicleSeats: int, costPerSeatKm: float, routeLength: float, engine: Simulation.Engine = Simulation.Engine.StopMajor, arrivalStreams: ArrivalStreams = None) -> tuple[float, float, int]:
+    """
+    Run the simulation of the timetable generated from the chromosome and calculate its fitness values.
+
+    :param chromosome: The chromosome to be evaluated.
+    :type chromosome: list[int]
+    :param seed: The seed of the random number generator used by the simulation.
+    :type seed: int | np.random.SeedSequence | None
+    :param busStops: The list of bus stops to be used in the simulation.
+    :type busStops: list[BusStop]
+    :param vehicleCapacity: The capacity of the vehicle.
+    :type vehicleCapacity: int
+    :param vehicleSeats: The number of seats in the vehicle.
+    :type vehicleSeats: int
+    :param costPerSeatKm: The cost per 100 seat-kilometers.
+    :type costPerSeatKm: float
+    :param routeLength: The length of the route in kilometers.
+    :type routeLength: float
+    :param engine: The simulation engine, defaults to Simulation.Engine.StopMajor
+    :type engine: Simulation.Engine, optional
+    :param arrivalStreams: The passenger arrivals shared by all chromosomes of the generation, defaults to None (arrivals are drawn from the seed)
+    :type arrivalStreams: ArrivalStreams, optional
+    :return: The cost, the average passenger satisfaction and the total number of passengers left unboarded.
+    :rtype: tuple[float, float, int]
+    """
+    timeTable = TimeTable(chromosome)
+    stats = Simulation.run(0, 24*60, busStops, timeTable, vehicleCapacity, vehicleSeats, RandomNumberGenerator(seed), engine, arrivalStreams)
+    cost = (routeLength * stats.totalNumberOfBuses * vehicleCapacity / 100 * costPerSeatKm)
+    return cost, stats.averagePassengerSatisfaction, stats.busStopStatistics.totalPassengersLeftUnboarded
+
+# Bus stops, vehicle parameters and simulation engine of the fitness worker process, they are sent to each worker only once
+workerArguments = None
+# Passenger arrivals of the current generation in the fitness worker process, drawn once per generation and reused for all its chromosomes
+workerArrivalStreams = None
+
+def initFitnessWorker(busStops, vehicleCapacity: int, vehicleSeats: int, costPerSeatKm: float, routeLength: float, engine: Simulation.Engine):
+    """
+    Initialize the fitness worker process with the arguments shared by all evaluations.
+
+    :param busStops: The list of bus stops to be used in the simulation.
+    :type busStops: list[BusStop]
+    :param vehicleCapacity: The capacity of the vehicle.
+    :type vehicleCapacity: int
+    :param vehicleSeats: The number of seats in the vehicle.
+    :type vehicleSeats: int
+    :param costPerSeatKm: The cost per 100 seat-kilometers.
+    :type costPerSeatKm: float
+    :param routeLength: The length of the route in kilometers.
+    :type routeLength: float
+    :param engine: The simulation engine.
+    :type engine: Simulation.Engine
+    """
+    global workerArguments
+    workerArguments = (busStops, vehicleCapacity, vehicleSeats, costPerSeatKm, routeLength, engine)
+
+def evaluateChromosomeInWorker(chromosomeAndSeeds: tuple[list[int], np.random.SeedSequence, np.random.SeedSequence | None]) -> tuple[float, float, int]:
+    """
+    Evaluate the chromosome in the fitness worker process.
+
+    :param chromosomeAndSeeds: The chromosome to be evaluated, the seed of its simulation and the seed of the passenger arrivals shared by the generation, or None.
+    :type chromosomeAndSeeds: tuple[list[int], np.random.SeedSequence, np.random.SeedSequence | None]
+    :return: The cost, the average passenger satisfaction and the total number of passengers left unboarded.
+    :rtype: tuple[float, float, int]
+    """
+    global workerArrivalStreams
+    chromosome, seed, arrivalStreamsSeed = chromosomeAndSeeds
+    arrivalStreams = None
+    if arrivalStreamsSeed is not None:
+        if workerArrivalStreams is None or workerArrivalStreams.seedSequence.spawn_key != arrivalStreamsSeed.spawn_key or workerArrivalStreams.seedSequence.entropy != arrivalStreamsSeed.entropy:
+            workerArrivalStreams = ArrivalStreams(arrivalStreamsSeed, workerArguments[0], 0, 24*60)
+        arrivalStreams = workerArrivalStreams
+    return evaluateChromosome(chromosome, seed, *workerArguments, arrivalStreams)
+
+def sortIntoParetoFronts(costs: np.ndarray, satisfactions: np.ndarray) -> list[np.ndarray]:
+    """
+    Sort the points into pareto fronts by minimal cost and maximal satisfaction.
+    The points are swept in the order of increasing cost and decreasing satisfaction, every point goes to the first front whose last point does not dominate it,
+    found by binary search, because the satisfaction of the last points decreases from front to front.
+    The first front is ordered by index, every other front by the last position of its dominators in the previous front and then by index,
+    which is the order of the pairwise non-dominated sorting.
+
+    :param costs: The costs of the points.
+    :type costs: np.ndarray
+    :param satisfactions: The satisfactions of the points.
+    :type satisfactions: np.ndarray
+    :return: The indices of the points in every front.
+    :rtype: list[np.ndarray]
+    """
+    # cost and satisfaction of the last point of every front, in the order of the sweep
+    lastCosts = []
+    lastSatisfactions = []
+    members = []
+    sweepOrder = np.lexsort((-satisfactions, costs))
+    costList = costs.tolist()
+    satisfactionList = satisfactions.tolist()
+    for index in sweepOrder.tolist():
+        cost = costList[index]
+        satisfaction = satisfactionList[index]
+        low, high = 0, len(lastCosts)
+        while low < high:
+            middle = (low + high) // 2
+            if lastSatisfactions[middle] > satisfaction or (lastSatisfactions[middle] == satisfaction and lastCosts[middle] < cost):
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(lastCosts):
+            lastCosts.append(cost)
+            lastSatisfactions.append(satisfaction)
+            members.append([])
+        lastCosts[low] = cost
+        lastSatisfactions[low] = satisfaction
+        members[low].append(index)
+
+    fronts = []
+    for i, front in enumerate(members):
+        front = np.array(front, dtype=np.int64)
+        if i == 0:
+            fronts.append(np.sort(front))
+            continue
+        # members of the previous front in the order of the sweep have increasing cost and satisfaction, so the dominators of a point are a range of them
+        previous = np.array(members[i - 1], dtype=np.int64)
+        positions = np.empty(len(costs), dtype=np.int64)
+        positions[fronts[i - 1]] = np.arange(len(previous))
+        starts = np.searchsorted(satisfactions[previous], satisfactions[front], side="left")
+        ends = np.searchsorted(costs[previous], costs[front], side="right")
+        lastDominators = rangeMaximum(positions[previous], starts, ends)
+        fronts.append(front[np.lexsort((front, lastDominators))])
+    return fronts
+
+def sortIntoConstrainedFronts(costs: np.ndarray, satisfactions: np.ndarray, unboarded: np.ndarray) -> list[np.ndarray]:
+    """
+    Sort the points into fronts by the constrained domination.
+    Points without unboarded passengers dominate all others and are sorted into pareto fronts by the cost and satisfaction,
+    the others follow in fronts by the number of unboarded passengers, lower is better.
+
+    :param costs: The costs of the points.
+    :type costs: np.ndarray
+    :param satisfactions: The satisfactions of the points.
+    :type satisfactions: np.ndarray
+    :param unboarded: The numbers of unboarded passengers of the points.
+    :type unboarded: np.ndarray
+    :return: The indices of the points in every front.
+    :rtype: list[np.ndarray]
+    """
+    feasible = np.flatnonzero(unboarded == 0)
+    infeasible = np.flatnonzero(unboarded != 0)
+    fronts = [feasible[front] for front in sortIntoParetoFronts(costs[feasible], satisfactions[feasible])]
+
+    # every point with less unboarded passengers dominates, so the infeasible fronts are dominated by the whole previous front
+    for value in np.unique(unboarded[infeasible]):
+        fronts.append(infeasible[unboarded[infeasible] == value])
+    return fronts
+
+def rangeMaximum(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Get the maximum of the values in every range, using a sparse table of maximums of power of two lengths.
+
+    :param values: The values.
+    :type values: np.ndarray
+    :param starts: The first index of every range.
+    :type starts: np.ndarray
+    :param ends: The index after the last index of every range, every range has to be non-empty.
+    :type ends: np.ndarray
+    :return: The maximum of every range.
+    :rtype: np.ndarray
+    """
+    table = [values]
+    width = 1
+    while 2 * width <= len(values):
+        table.append(np.maximum(table[-1][:-width], table[-1][width:]))
+        width *= 2
+    levels = np.frexp(ends - starts)[1] - 1
+    maximums = np.empty(len(starts), dtype=values.dtype)
+    for level in np.unique(levels):
+        selected = levels == level
+        maximums[selected] = np.maximum(table[level][starts[selected]], table[level][ends[selected] - (1 << level)])
+    return maximums
+
+class Population:
     # INIT
-    def __init__(self, mutationRate, maxConnectionsPerHour, vehicleCapacity, vehicleSeats, costPerSeatKm, routeLength, busStops, constraints, chromosome=None):
-        self.mutationRate = mutationRate
-        self.maxConnectionsPerHour = maxConnectionsPerHour
-        self.vehicleCapacity = vehicleCapacity
-        self.vehicleSeats = vehicleSeats
-        self.costPerSeatKm = costPerSeatKm
-        self.routeLength = routeLength
-        self.busStops = busStops
-        self.constraints = constraints
-        if chromosome is None:
-            self.chromosome = self.generateRandomChromosome()
-        else:
-            self.chromosome = chromosome
-        self.mutate()
-        self.calculateFitness()
-        self.dominatesOver = []
-        self.dominationCount = 0
-        self.rank = 0
-        self.distance = 0
-        self.totalPassengersLeftUnboarded = 0
+    def __init__(self, chromosomes: np.ndarray):
+        # one row of genes (number of connections per hour) for every individual
+        self.chromosomes = np.asarray(chromosomes, dtype=np.int16).reshape(-1, 24)
+        # objective values of every individual, filled when the population is evaluated, individuals start unevaluated
+        self.evaluated = np.zeros(len(self.chromosomes), dtype=bool)
+        self.costs = np.zeros(len(self.chromosomes))
+        self.satisfactions = np.zeros(len(self.chromosomes))
+        self.totalPassengersLeftUnboarded = np.zeros(len(self.chromosomes))
+        # rank of the front and crowding distance of every individual, filled by the non-dominated sorting
+        self.ranks = np.zeros(len(self.chromosomes), dtype=np.int64)
+        self.distances = np.zeros(len(self.chromosomes))
 
     # METHODS
-    def generateRandomChromosome(self) -> list[int]:
-        """
-        Generate a random chromosome with 24 integers, each representing the number of connections per hour.
-        If the constraint for that hour is not None, use the constraint value instead.
+    def __len__(self) -> int:
+        return len(self.chromosomes)
 
-        :return: A list of integers representing the chromosome.
-        :rtype: list[int]
+    def take(self, indices: np.ndarray) -> 'Population':
         """
-        chromosome = []
-        for i in range(24):
-            if self.constraints[i] == None:
-                chromosome.append(RandomNumberGenerator.integers(1, self.maxConnectionsPerHour+1))
-            else:
-                chromosome.append(self.constraints[i])
-        return chromosome
+        Create a new population from the individuals at the given indices, with their objective values, ranks and distances.
 
-    def calculateFitness(self):
-        """
-        Calculate the fitness values of the individual based on the simulation results.
+        :param indices: The indices of the individuals.
+        :type indices: np.ndarray
+        :return: The new population.
+        :rtype: Population
         """
-        self.cost = 0
-        self.satisfaction = 0
-        timeTable = TimeTable(self.chromosome)
-        stats = Simulation.run(0, 24*60, self.busStops, timeTable, self.vehicleCapacity, self.vehicleSeats)
-        self.cost = (self.routeLength * stats.totalNumberOfBuses * self.vehicleCapacity / 100 * self.costPerSeatKm)
-        self.satisfaction = stats.averagePassengerSatisfaction
-        self.totalPassengersLeftUnboarded = stats.busStopStatistics.totalPassengersLeftUnboarded
+        population = Population(self.chromosomes[indices])
+        population.evaluated = self.evaluated[indices]
+        population.costs = self.costs[indices]
+        population.satisfactions = self.satisfactions[indices]
+        population.totalPassengersLeftUnboarded = self.totalPassengersLeftUnboarded[indices]
+        population.ranks = self.ranks[indices]
+        population.distances = self.distances[indices]
+        return population
 
-    def constraintDominates(self, other: 'Individual') -> bool:
+    def concatenate(self, other: 'Population') -> 'Population':
         """
-        Check if this individual dominates the other individual based on the constraints and domination results.
+        Create a new population from the individuals of this population followed by the individuals of the other population.
 
-        :param other: The other individual to compare with.
-        :type other: Individual
-        :return: True if this individual dominates the other, False otherwise.
-        :rtype: bool
+        :param other: The other population.
+        :type other: Population
+        :return: The new population.
+        :rtype: Population
         """
-        if self.totalPassengersLeftUnboarded == 0 and other.totalPassengersLeftUnboarded == 0:
-            return self.dominates(other)
-        else:
-            return self.totalPassengersLeftUnboarded < other.totalPassengersLeftUnboarded
+        population = Population(np.concatenate((self.chromosomes, other.chromosomes)))
+        population.evaluated = np.concatenate((self.evaluated, other.evaluated))
+        population.costs = np.concatenate((self.costs, other.costs))
+        population.satisfactions = np.concatenate((self.satisfactions, other.satisfactions))
+        population.totalPassengersLeftUnboarded = np.concatenate((self.totalPassengersLeftUnboarded, other.totalPassengersLeftUnboarded))
+        population.ranks = np.concatenate((self.ranks, other.ranks))
+        population.distances = np.concatenate((self.distances, other.distances))
+        return population
 
-    def dominates(self, other: 'Individual') -> bool:
+    def setFitness(self, index: int | list[int], cost: float, satisfaction: float, totalPassengersLeftUnboarded: int):
         """
-        Check if this individual dominates the other individual based on the cost and satisfaction values.
+        Set the fitness values of the individuals at the given index or indices and mark them as evaluated.
 
-        :param other: The other individual to compare with.
-        :type other: Individual
-        :return: True if this individual dominates the other, False otherwise.
-        :rtype: bool
-        """
-        return (self.cost <= other.cost and self.satisfaction >= other.satisfaction) and (self.cost < other.cost or self.satisfaction > other.satisfaction)
-        
-    def mutate(self):
+        :param index: The index or indices of the individuals.
+        :type index: int | list[int]
+        :param cost: The cost of the timetable.
+        :type cost: float
+        :param satisfaction: The average passenger satisfaction.
+        :type satisfaction: float
+        :param totalPassengersLeftUnboarded: The total number of passengers left unboarded.
+        :type totalPassengersLeftUnboarded: int
         """
-        Mutate the chromosome of the individual by randomly changing the number of connections per hour for each hour if the mutation rate is met and the constraint for that hour is None.
-        """
-        for i in range(24):
-            if RandomNumberGenerator.uniform() < self.mutationRate and self.constraints[i] == None:
-                self.chromosome[i] = RandomNumberGenerator.integers(1, self.maxConnectionsPerHour+1)
-            
-    def __lt__(self, other: 'Individual') -> bool:
+        self.evaluated[index] = True
+        self.costs[index] = cost
+        self.satisfactions[index] = satisfaction
+        self.totalPassengersLeftUnboarded[index] = totalPassengersLeftUnboarded
+
+    def getChromosome(self, index: int) -> list[int]:
         """
-        Compare this individual with another individual based on the rank and distance values.
+        Get the chromosome of the individual at the given index.
 
-        :param other: The other individual to compare with.
-        :type other: Individual
-        :return: True if this individual is better than the other, False otherwise.
-        :rtype: bool
+        :param index: The index of the individual.
+        :type index: int
+        :return: The chromosome.
+        :rtype: list[int]
         """
-        return (self.rank < other.rank) or ((self.rank == other.rank) and (self.distance > other.distance))
+        return self.chromosomes[index].tolist()
 
     # STR
     def __str__(self):
-        return f"{self.chromosome}: {self.fitness}"
+        return "\n".join([f"{chromosome}: {cost}, {satisfaction}, {unboarded}" for chromosome, cost, satisfaction, unboarded in zip(self.chromosomes.tolist(), self.costs, self.satisfactions, self.totalPassengersLeftUnboarded)])
 
 class Genetics:
     # INIT
-    def __init__(self, populationSize, mutationRate, maxConnectionsPerHour, vehicleCapacity, vehicleSeats, costPerSeatKm, routeLength, busStops, constraints):
+    def __init__(self, populationSize, mutationRate, maxConnectionsPerHour, vehicleCapacity, vehicleSeats, costPerSeatKm, routeLength, busStops, constraints, seed=None, numberOfWorkers=1, cacheSize=10000, cacheReplications=1, engine=Simulation.Engine.StopMajor, commonRandomNumbers=False, arrivalStreamsGenerations=10, surrogateFraction=1.0, learnedSurrogate=False, surrogateConfidence=4.0):
         self.populationSize = populationSize
         self.mutationRate = mutationRate
         self.maxConnectionsPerHour = maxConnectionsPerHour
@@ -120,8 +292,36 @@ class Genetics:
         self.routeLength = routeLength
         self.busStops = busStops
         self.constraints = constraints
-        self.generation = []
-        self.offsprings = []
+        # hours without a constraint can be changed by the genetic algorithm, the others always have the constraint value
+        self.freeGenes = np.array([constraint is None for constraint in constraints])
+        self.constraintValues = np.array([0 if constraint is None else constraint for constraint in constraints], dtype=np.int16)
+        # every evaluated individual gets its own seed spawned from the root seed, so results do not depend on the number of workers
+        self.seedSequence = np.random.SeedSequence(seed)
+        self.rng = RandomNumberGenerator(self.seedSequence.spawn(1)[0])
+        self.numberOfWorkers = numberOfWorkers
+        self.pool = None
+        self.engine = engine
+        self.fitnessCache = FitnessCache(cacheSize, cacheReplications)
+        # with common random numbers, all individuals are simulated with the same passenger arrivals, drawn anew after the given number of generations,
+        # the fitness cache then holds the values under the current arrivals and the individuals are simulated again only when the arrivals are drawn anew
+        self.commonRandomNumbers = commonRandomNumbers
+        if self.commonRandomNumbers and self.engine == Simulation.Engine.EventDriven:
+            raise ValueError("Common random numbers are only supported by the stop-major engine")
+        self.arrivalStreamsGenerations = arrivalStreamsGenerations
+        self.arrivalStreams = None
+        self.arrivalStreamsAge = 0
+        # with a surrogate fraction below 1, the offsprings are ranked by the queueing surrogate and only the best fraction of them is simulated
+        self.surrogateFraction = surrogateFraction
+        self.surrogate = QueueingSurrogate(busStops, vehicleCapacity, vehicleSeats, costPerSeatKm, routeLength) if surrogateFraction < 1 else None
+        # with the learned surrogate, the offsprings which would be dominated by the whole generation even at the optimistic bound of their prediction are not simulated,
+        # with the bound of 2 standard deviations about a tenth of the skipped offsprings was not dominated when simulated, with 4 about one in a hundred
+        self.learnedSurrogate = LearnedSurrogate() if learnedSurrogate else None
+        self.surrogateConfidence = surrogateConfidence
+        self.numberOfScreenedOffsprings = 0
+        # offsprings screened out by the queueing surrogate or skipped by the learned surrogate
+        self.numberOfSkippedSimulations = 0
+        self.generation = Population(np.empty((0, 24)))
+        self.offsprings = Population(np.empty((0, 24)))
         self.initPopulation()
         self.fronts = []
 
@@ -132,8 +332,10 @@ class Genetics:
         Then sort the population using non-dominated sorting and assign crowding distance to each individual.
         Finally, create the first offspring population.
         """
-        for i in range(self.populationSize):
-            self.generation.append(Individual(self.mutationRate, self.maxConnectionsPerHour, self.vehicleCapacity, self.vehicleSeats, self.costPerSeatKm, self.routeLength, self.busStops, self.constraints))
+        self.generation = Population(self.generateRandomChromosomes(self.populationSize))
+        if self.commonRandomNumbers:
+            self.arrivalStreams = ArrivalStreams(self.seedSequence.spawn(1)[0], self.busStops, 0, 24*60)
+        self.evaluatePopulation(self.generation)
         self.nonDominatedSort()
         for front in self.fronts:
             self.crowdingDistanceAssignment(front)
@@ -142,130 +344,270 @@ class Genetics:
     def updateGeneration(self):
         """
         Main loop of the genetic algorithm.
-        It updates the generation by combining the current generation and the offspring population.
+        It updates the generation by combining the current generation and the offspring population, and evaluates the offsprings.
+        With common random numbers, when the passenger arrivals are drawn anew, the current generation is evaluated again with them together with the offsprings, so all compared individuals saw the same passengers.
         Then it sorts the combined population using non-dominated sorting and assigns crowding distance to each individual.
         Finally, it promotes the best individuals to the next generation and creates a new offspring population.
+        With the queueing surrogate, only the promising offsprings are evaluated and compete with the current generation.
+        With the learned surrogate, the offsprings which are clearly dominated are dropped without the simulation.
         """
-        self.generation += self.offsprings
+        if self.surrogate is not None:
+            self.offsprings = self.screenOffsprings(self.offsprings)
+        if self.learnedSurrogate is not None and self.learnedSurrogate.isReady():
+            self.offsprings = self.skipDominatedOffsprings(self.offsprings)
+        self.generation = self.generation.concatenate(self.offsprings)
+        if self.commonRandomNumbers:
+            self.arrivalStreamsAge += 1
+            if self.arrivalStreamsAge >= self.arrivalStreamsGenerations:
+                self.arrivalStreams = ArrivalStreams(self.seedSequence.spawn(1)[0], self.busStops, 0, 24*60)
+                self.arrivalStreamsAge = 0
+                self.fitnessCache.clear()
+                self.generation.evaluated[:] = False
+        self.evaluatePopulation(self.generation)
         self.nonDominatedSort()
-        self.generation = []
+        promoted = []
+        numberOfPromoted = 0
         i = 0
-        while len(self.generation) + len(self.fronts[i]) <= self.populationSize:
+        while i < len(self.fronts) and numberOfPromoted + len(self.fronts[i]) <= self.populationSize:
             self.crowdingDistanceAssignment(self.fronts[i])
-            self.generation += self.fronts[i]
+            promoted.append(self.fronts[i])
+            numberOfPromoted += len(self.fronts[i])
             i += 1
-        self.fronts[i].sort()
-        for individual in self.fronts[i]:
-            if len(self.generation) >= self.populationSize:
-                break
-            self.generation.append(individual)
+        if i < len(self.fronts):
+            # the front that does not fit is promoted by the crowding distance, which was not assigned in this generation
+            front = self.fronts[i][np.argsort(-self.generation.distances[self.fronts[i]], kind="stable")]
+            promoted.append(front[:self.populationSize - numberOfPromoted])
+        self.generation = self.generation.take(np.concatenate(promoted))
         self.makeNewPopulation()
 
     def makeNewPopulation(self):
         """
-        Create a new population of offsprings by selecting parents from the current generation and applying crossover.
+        Create a new population of offsprings by selecting parents from the current generation, applying crossover and mutation.
+        All pairs of parents are selected and crossed over at once. The offsprings are not evaluated yet, they are evaluated with the next generation update.
         """
-        self.offsprings = []
-        for _ in range(int(self.populationSize/2)):
-            parent1 = self.parentSelection()
-            parent2 = self.parentSelection()
-            child1, child2 = self.crossover(parent1, parent2)
-            self.offsprings.append(child1)
-            self.offsprings.append(child2)
+        numberOfPairs = int(self.populationSize/2)
+        parents1 = self.parentSelection(numberOfPairs)
+        parents2 = self.parentSelection(numberOfPairs)
+        children1, children2 = self.crossover(parents1, parents2)
+        # both children of a pair follow each other
+        chromosomes = np.stack((children1, children2), axis=1).reshape(-1, 24)
+        self.offsprings = Population(self.mutate(chromosomes))
 
-    def parentSelection(self) -> Individual:
+    def screenOffsprings(self, offsprings: Population) -> Population:
         """
-        Select two parents from the current generation using tournament selection.
+        Rank the offsprings by the fitness values estimated by the queueing surrogate and keep the best fraction of them, the others are never simulated.
+        The offsprings are ranked by the constrained non-dominated sorting of the estimates, with the expected number of unboarded passengers rounded,
+        the last front which does not fit is cut in the order of the offsprings, which is random.
 
-        :return: A parent individual selected from the current generation.
-        :rtype: Individual
+        :param offsprings: The offsprings.
+        :type offsprings: Population
+        :return: The promising offsprings.
+        :rtype: Population
         """
-        parent1 = self.generation[RandomNumberGenerator.integers(0, len(self.generation))]
-        parent2 = self.generation[RandomNumberGenerator.integers(0, len(self.generation))]
-        if parent1 < parent2:
-            return parent1
-        return parent2
+        costs, satisfactions, unboarded, _ = self.surrogate.evaluate(offsprings.chromosomes)
+        fronts = sortIntoConstrainedFronts(costs, satisfactions, np.round(unboarded))
+        numberOfKept = int(np.ceil(self.surrogateFraction * len(offsprings)))
+        kept = np.concatenate(fronts)[:numberOfKept] if len(fronts) > 0 else np.empty(0, dtype=np.int64)
+        self.numberOfScreenedOffsprings += len(offsprings)
+        self.numberOfSkippedSimulations += len(offsprings) - len(kept)
+        return offsprings.take(np.sort(kept))
 
-    def crossover(self, parent1: Individual, parent2 : Individual) -> tuple[Individual, Individual]:
+    def skipDominatedOffsprings(self, offsprings: Population) -> Population:
         """
-        Perform uniform crossover between two parents to create two offsprings.
+        Drop the offsprings which are dominated by every individual of the current generation, even with the optimistic bounds of the predicted satisfaction and unboarded passengers.
+        Such an offspring would not be promoted to the next generation, because all the individuals of the current generation are in better fronts.
+        The cost is not predicted, it is calculated from the number of buses exactly.
 
-        :param parent1: First parent individual.
-        :type parent1: Individual
-        :param parent2: Second parent individual.
-        :type parent2: Individual
-        :return: Two new individuals created from the parents.
-        :rtype: tuple[Individual, Individual]
+        :param offsprings: The offsprings.
+        :type offsprings: Population
+        :return: The offsprings which have to be simulated.
+        :rtype: Population
         """
-        newChromosome1 = [0]*24
-        newChromosome2 = [0]*24
-        for i in range(24):
-            if RandomNumberGenerator.uniform() < 0.5:
-                newChromosome1[i] = parent1.chromosome[i]
-                newChromosome2[i] = parent2.chromosome[i]
+        if len(offsprings) == 0:
+            return offsprings
+        satisfactions, unboarded = self.learnedSurrogate.optimisticEstimates(offsprings.chromosomes, self.surrogateConfidence)
+        costs = self.routeLength * offsprings.chromosomes.sum(axis=1) * self.vehicleCapacity / 100 * self.costPerSeatKm
+
+        # constrained domination of every individual (rows) over every offspring (columns)
+        generation = self.generation
+        fewerUnboarded = generation.totalPassengersLeftUnboarded[:, np.newaxis] < unboarded
+        bothFeasible = (generation.totalPassengersLeftUnboarded[:, np.newaxis] == 0) & (unboarded == 0)
+        notWorse = (generation.costs[:, np.newaxis] <= costs) & (generation.satisfactions[:, np.newaxis] >= satisfactions)
+        better = (generation.costs[:, np.newaxis] < costs) | (generation.satisfactions[:, np.newaxis] > satisfactions)
+        dominated = np.all(fewerUnboarded | (bothFeasible & notWorse & better), axis=0)
+
+        self.numberOfSkippedSimulations += int(dominated.sum())
+        return offsprings.take(np.flatnonzero(~dominated))
+
+    def generateRandomChromosomes(self, numberOfChromosomes: int) -> np.ndarray:
+        """
+        Generate random chromosomes with 24 integers, each representing the number of connections per hour.
+        If the constraint for that hour is not None, the constraint value is used instead.
+
+        :param numberOfChromosomes: The number of chromosomes to generate.
+        :type numberOfChromosomes: int
+        :return: The chromosomes, one per row.
+        :rtype: np.ndarray
+        """
+        chromosomes = self.rng.integers(1, self.maxConnectionsPerHour+1, (numberOfChromosomes, 24)).astype(np.int16)
+        return self.enforceConstraints(chromosomes)
+
+    def mutate(self, chromosomes: np.ndarray) -> np.ndarray:
+        """
+        Mutate the chromosomes by randomly changing the number of connections per hour for each hour if the mutation rate is met and the constraint for that hour is None.
+
+        :param chromosomes: The chromosomes to be mutated, one per row.
+        :type chromosomes: np.ndarray
+        :return: The mutated chromosomes.
+        :rtype: np.ndarray
+        """
+        mutated = (self.rng.uniform(0, 1, chromosomes.shape) < self.mutationRate) & self.freeGenes
+        values = self.rng.integers(1, self.maxConnectionsPerHour+1, chromosomes.shape)
+        return self.enforceConstraints(np.where(mutated, values, chromosomes).astype(np.int16))
+
+    def enforceConstraints(self, chromosomes: np.ndarray) -> np.ndarray:
+        """
+        Set the hours with a constraint to the constraint value in all chromosomes.
+
+        :param chromosomes: The chromosomes, one per row.
+        :type chromosomes: np.ndarray
+        :return: The chromosomes, changed in place.
+        :rtype: np.ndarray
+        """
+        chromosomes[:, ~self.freeGenes] = self.constraintValues[~self.freeGenes]
+        return chromosomes
+
+    def evaluatePopulation(self, population: Population):
+        """
+        Calculate the fitness values of the individuals of the population, which were not evaluated yet.
+        Individuals with the same chromosome are evaluated only once, chromosomes found in the fitness cache are not simulated and the simulated ones are added to the cache.
+        If more than one worker is configured, the simulations run in a pool of worker processes, otherwise they run one by one.
+        Each simulated chromosome gets its own seed spawned from the root seed, so the results are the same for any number of workers.
+        With common random numbers, all chromosomes are simulated with the current passenger arrivals, the fitness cache is cleared whenever they are drawn anew, so its values come from the same arrivals.
+
+        :param population: The population to be evaluated.
+        :type population: Population
+        """
+        # indices of the unevaluated individuals for every distinct chromosome, in the order of the first occurrence
+        pending = {}
+        for index in np.flatnonzero(~population.evaluated).tolist():
+            pending.setdefault(FitnessCache.key(population.chromosomes[index].tolist()), []).append(index)
+
+        chromosomes = []
+        for chromosome, indices in pending.items():
+            fitness = self.fitnessCache.get(chromosome)
+            if fitness is None:
+                chromosomes.append(chromosome)
             else:
-                newChromosome1[i] = parent2.chromosome[i]
-                newChromosome2[i] = parent1.chromosome[i]
-        return Individual(self.mutationRate, self.maxConnectionsPerHour, self.vehicleCapacity, self.vehicleSeats, self.costPerSeatKm, self.routeLength, self.busStops, self.constraints, newChromosome1), Individual(self.mutationRate, self.maxConnectionsPerHour, self.vehicleCapacity, self.vehicleSeats, self.costPerSeatKm, self.routeLength, self.busStops, self.constraints, newChromosome2)
+                population.setFitness(indices, *fitness)
+
+        seeds = self.seedSequence.spawn(len(chromosomes))
+        if self.numberOfWorkers > 1:
+            chunkSize = max(1, len(chromosomes) // (self.numberOfWorkers * 4))
+            arrivalStreamsSeed = self.arrivalStreams.seedSequence if self.commonRandomNumbers else None
+            results = list(self.getPool().map(evaluateChromosomeInWorker, [(list(chromosome), seed, arrivalStreamsSeed) for chromosome, seed in zip(chromosomes, seeds)], chunksize=chunkSize))
+        else:
+            results = [evaluateChromosome(list(chromosome), seed, self.busStops, self.vehicleCapacity, self.vehicleSeats, self.costPerSeatKm, self.routeLength, self.engine, self.arrivalStreams) for chromosome, seed in zip(chromosomes, seeds)]
+        for chromosome, result in zip(chromosomes, results):
+            population.setFitness(pending[chromosome], *self.fitnessCache.add(chromosome, result))
+        if self.learnedSurrogate is not None and len(chromosomes) > 0:
+            _, satisfactions, unboarded = zip(*results)
+            self.learnedSurrogate.add(np.array(chromosomes), satisfactions, unboarded)
+
+    def getPool(self) -> ProcessPoolExecutor:
+        """
+        Get the pool of fitness worker processes, create it on the first use.
+        The bus stops and vehicle parameters are sent to each worker only once, when the worker starts.
+
+        :return: The pool of fitness worker processes.
+        :rtype: ProcessPoolExecutor
+        """
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.numberOfWorkers,
+                initializer=initFitnessWorker,
+                initargs=(self.busStops, self.vehicleCapacity, self.vehicleSeats, self.costPerSeatKm, self.routeLength, self.engine),
+            )
+        return self.pool
+
+    def close(self):
+        """
+        Shut down the pool of fitness worker processes, if it was created.
+        """
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def parentSelection(self, numberOfParents: int) -> np.ndarray:
+        """
+        Select parents from the current generation using tournament selection of two random individuals,
+        the one with the lower rank wins, for the same rank the one with the higher crowding distance.
+
+        :param numberOfParents: The number of parents to select.
+        :type numberOfParents: int
+        :return: The indices of the selected parents in the current generation.
+        :rtype: np.ndarray
+        """
+        candidates1 = self.rng.integers(0, len(self.generation), numberOfParents)
+        candidates2 = self.rng.integers(0, len(self.generation), numberOfParents)
+        ranks = self.generation.ranks
+        distances = self.generation.distances
+        firstWins = (ranks[candidates1] < ranks[candidates2]) | ((ranks[candidates1] == ranks[candidates2]) & (distances[candidates1] > distances[candidates2]))
+        return np.where(firstWins, candidates1, candidates2)
+
+    def crossover(self, parents1: np.ndarray, parents2: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Perform uniform crossover between pairs of parents to create two offsprings from every pair.
+
+        :param parents1: Indices of the first parents in the current generation.
+        :type parents1: np.ndarray
+        :param parents2: Indices of the second parents in the current generation.
+        :type parents2: np.ndarray
+        :return: Chromosomes of the first and second offsprings of every pair, one per row.
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+        chromosomes1 = self.generation.chromosomes[parents1]
+        chromosomes2 = self.generation.chromosomes[parents2]
+        masks = self.rng.uniform(0, 1, chromosomes1.shape) < 0.5
+        return np.where(masks, chromosomes1, chromosomes2), np.where(masks, chromosomes2, chromosomes1)
 
     def nonDominatedSort(self):
         """
-        Perform non-dominated sorting on the current generation of individuals.
+        Perform constrained non-dominated sorting on the current generation of individuals.
+        Individuals without unboarded passengers dominate all others and are sorted into fronts by the cost and satisfaction,
+        the others follow in fronts by the number of unboarded passengers, lower is better.
+        With two objectives the fronts are found by a sweep over the individuals sorted by cost in O(N log N), instead of comparing all pairs.
+        The fronts, their order and the ranks are the same as in the pairwise algorithm: the first front is in the order of the generation,
+        every other front in the order in which its individuals lose their last dominator in the previous front, ties in the order of the generation.
+        The fronts are stored as arrays of indices into the current generation.
         """
-        self.fronts = []
-        self.fronts.append([])
-        for p in self.generation:
-            p.dominatesOver = []
-            p.dominationCount = 0
-            for q in self.generation:
-                if p.constraintDominates(q):
-                    p.dominatesOver.append(q)
-                elif q.constraintDominates(p):
-                    p.dominationCount +=1
-            if p.dominationCount == 0:
-                p.rank = 1
-                self.fronts[0].append(p)
-        i = 0
-        while len(self.fronts[i]) > 0:
-            nextFront = []
-            for p in self.fronts[i]:
-                for q in p.dominatesOver:
-                    q.dominationCount -= 1
-                    if q.dominationCount == 0:
-                        q.rank = i+1
-                        nextFront.append(q)
-            i += 1
-            self.fronts.append(nextFront)
-        self.fronts.pop(-1)
+        self.fronts = sortIntoConstrainedFronts(self.generation.costs, self.generation.satisfactions, self.generation.totalPassengersLeftUnboarded)
 
-    def crowdingDistanceAssignment(self, front: list[Individual]):
+        # the pairwise algorithm ranked the first two fronts both as 1, the ranks are kept as they were
+        for i, front in enumerate(self.fronts):
+            self.generation.ranks[front] = max(i, 1)
+
+    def crowdingDistanceAssignment(self, front: np.ndarray):
         """
         Assign crowding distance to each individual in the front.
+        The individuals are sorted by cost and then by satisfaction, both stable, the first and the last get infinite distance
+        and the inner ones, except the second to last, the normalized distance of their neighbours.
 
-        :param front: The front of individuals to assign crowding distance to.
-        :type front: list[Individual]
+        :param front: The indices of the individuals of the front in the current generation.
+        :type front: np.ndarray
         """
         length = len(front)
-        for individual in front:
-            individual.distance = 0
-        
-        front = sorted(front, key=lambda individual: individual.cost)
-        min = front[0].cost
-        max = front[length - 1].cost
-        front[0].distance = front[length-1].distance = float('inf')
-        for i in range(1, length - 2):
-            front[i].distance += (front[i+1].cost - front[i-1].cost) / (max - min)
-
-        front = sorted(front, key=lambda individual: individual.satisfaction)
-        min = front[0].satisfaction
-        max = front[length - 1].satisfaction
-        front[0].distance = front[length-1].distance = float('inf')
-        for i in range(1, length - 2):
-            front[i].distance += (front[i+1].satisfaction - front[i-1].satisfaction) / (max - min)
+        distances = np.zeros(length)
+        order = np.arange(length)
+        for values in (self.generation.costs[front], self.generation.satisfactions[front]):
+            order = order[np.argsort(values[order], kind="stable")]
+            sortedValues = values[order]
+            distances[order[[0, -1]]] = float('inf')
+            valueRange = sortedValues[-1] - sortedValues[0]
+            if length > 3 and valueRange > 0:
+                distances[order[1:length - 2]] += (sortedValues[2:length - 1] - sortedValues[0:length - 3]) / valueRange
+        self.generation.distances[front] = distances
 
     # STR
     def __str__(self):
-        output = ""
-        for individual in self.generation:
-            output += f"{individual}\n"
-        return output
+        return f"{self.generation}\n"
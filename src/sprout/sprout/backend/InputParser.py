@@ -6,21 +6,60 @@ This file contains InputParser class with static methods for parsing the input.
 
 from .models import BusStop, TimeTable
 from collections import namedtuple
-import ast
+import re
 
 HourRate = namedtuple('HourRate', ['hour', 'rate'])
 
-class InputParser:    
+# tokens of the input formats, the parser matches them directly in the line without splitting it
+INTEGER = r"[-+]?\d+"
+NUMBER = r"[-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?"
+# the whole list of (hour, rate) pairs is checked by one pattern and the pairs are then extracted by another, both without a python loop over the pairs,
+# like the python literals read by the previous parser, the pairs and the list can be lists or tuples, a tuple with one pair needs the trailing comma
+HOUR_RATE = rf"(?:\(\s*{INTEGER}\s*,\s*{NUMBER}\s*,?\s*\)|\[\s*{INTEGER}\s*,\s*{NUMBER}\s*,?\s*\])"
+HOUR_RATE_LIST_PATTERN = re.compile(
+    rf"\[\s*(?:{HOUR_RATE}(?:\s*,\s*{HOUR_RATE})*\s*,?\s*)?\]"
+    rf"|\(\s*(?:{HOUR_RATE}\s*,(?:\s*{HOUR_RATE}(?:\s*,\s*{HOUR_RATE})*\s*,?)?\s*)?\)"
+)
+# the brackets are already matched by the list pattern
+HOUR_RATE_PATTERN = re.compile(rf"[(\[]\s*({INTEGER})\s*,\s*({NUMBER})\s*,?\s*[)\]]")
+# list without decimal points and exponents, all its rates are integers
+INTEGER_LIST_PATTERN = re.compile(r"[^.eE]*")
+# tokens of the pair, used to find the exact column of an error
+HOUR_RATE_TOKENS = [
+    (re.compile(r"\s*[(\[]"), "'('"),
+    (re.compile(rf"\s*{INTEGER}"), "an integer hour"),
+    (re.compile(r"\s*,"), "','"),
+    (re.compile(rf"\s*{NUMBER}"), "a number of passengers per hour"),
+    (re.compile(r"\s*,?\s*[)\]]"), "')'"),
+    (re.compile(r"\s*[,)\]]"), "',' or ']'"),
+]
+LIST_END_PATTERN = re.compile(r"\s*[)\]]")
+# one minute with the separator after it, used to find the column of an error in the minutes
+MINUTE_PATTERN = re.compile(rf"\s*({INTEGER})\s*(,|$)")
+SPACE_PATTERN = re.compile(r"\s*")
+
+class InputParser:
+    class ParseError(ValueError):
+        # INIT
+        def __init__(self, message: str, lineNumber: int, column: int):
+            super().__init__(f"line {lineNumber}, column {column}: {message}")
+            self.message = message
+            self.lineNumber = lineNumber
+            self.column = column
+
     @staticmethod
     def parseBusStopsFromFile(file) -> list[BusStop]:
         """
-        Parse the bus stops from a file.
+        Parse the bus stops from a file, the file is read line by line.
 
-        :param file: The file containing the bus stops.
-        :type file: FileDescriptorOrPath
+        :param file: The path of the file, or an open text or binary file object.
+        :type file: FileDescriptorOrPath | IO
+        :raises InputParser.ParseError: If a line does not have the bus stop format.
         :return: A list of bus stops.
         :rtype: list[BusStop]
         """
+        if hasattr(file, "read"):
+            return InputParser._parseBusStopsFromLines(file)
         with open(file, "r") as f:
             return InputParser._parseBusStopsFromLines(f)
 
@@ -31,6 +70,7 @@ class InputParser:
 
         :param string: The string containing the bus stops.
         :type string: str
+        :raises InputParser.ParseError: If a line does not have the bus stop format.
         :return: A list of bus stops.
         :rtype: list[BusStop]
         """
@@ -48,39 +88,148 @@ class InputParser:
 
         :param lines: The list of lines containing the bus stops.
         :type lines: list[str] | TextIOWrapper[_WrappedBuffer]
+        :raises InputParser.ParseError: If a line does not have the bus stop format.
         :return: A list of bus stops.
         :rtype: list[BusStop]
         """
         busStops = []
 
-        for line in lines:
-            line = line.strip()
-            if line.startswith("#") or line == "":
+        for lineNumber, line in enumerate(lines, 1):
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            line = line.rstrip("\r\n")
+            start = len(line) - len(line.lstrip())
+            if start == len(line) or line[start] == "#":
                 continue
 
-            name, timeDeltaToArrive, passengerArrivalRatesPerHour, leavingPassengersRate = line.split(":")
-            parsedHourRate = [HourRate(hour, rate) for hour, rate in ast.literal_eval(passengerArrivalRatesPerHour)]
+            nameEnd = line.find(":", start)
+            if nameEnd < 0:
+                raise InputParser.ParseError("expected ':' after the bus stop name", lineNumber, len(line) + 1)
+            timeDeltaEnd = line.find(":", nameEnd + 1)
+            if timeDeltaEnd < 0:
+                raise InputParser.ParseError("expected ':' after the time to arrive", lineNumber, len(line) + 1)
+            timeDeltaToArrive = InputParser._parseNumber(int, line, nameEnd + 1, timeDeltaEnd, "an integer time to arrive", lineNumber)
+
+            position = SPACE_PATTERN.match(line, timeDeltaEnd + 1).end()
+            parsedHourRate, position = InputParser._parseHourRates(line, position, lineNumber)
+
+            position = SPACE_PATTERN.match(line, position).end()
+            if not line.startswith(":", position):
+                raise InputParser.ParseError("expected ':' after the passenger arrival rates", lineNumber, position + 1)
+            leavingPassengersRate = InputParser._parseNumber(float, line, position + 1, len(line), "a number as leaving passengers rate", lineNumber)
+
             busStops.append(
                 BusStop(
-                    name.strip(),
-                    int(timeDeltaToArrive.strip()),
+                    line[start:nameEnd].strip(),
+                    timeDeltaToArrive,
                     parsedHourRate,
-                    float(leavingPassengersRate.strip())
+                    leavingPassengersRate
                 )
             )
 
         return busStops
-    
+
+    @staticmethod
+    def _parseHourRates(line: str, position: int, lineNumber: int) -> tuple[list[HourRate], int]:
+        """
+        Parse the list of (hour, rate) pairs starting at the position.
+        Rates written as integers stay integers. The list and the pairs can also be written as tuples or lists, as the previous parser accepted any python literal.
+
+        :param line: The line containing the list.
+        :type line: str
+        :param position: The index of the opening '[' or '('.
+        :type position: int
+        :param lineNumber: The number of the line, for error messages.
+        :type lineNumber: int
+        :raises InputParser.ParseError: If the list does not have the expected format.
+        :return: The pairs and the index after the closing ']' or ')'.
+        :rtype: tuple[list[HourRate], int]
+        """
+        match = HOUR_RATE_LIST_PATTERN.match(line, position)
+        if match is None:
+            InputParser._raiseHourRatesError(line, position, lineNumber)
+        pairs = HOUR_RATE_PATTERN.findall(line, position, match.end())
+        if INTEGER_LIST_PATTERN.fullmatch(line, position, match.end()):
+            hourRates = [HourRate(int(hour), int(rate)) for hour, rate in pairs]
+        else:
+            hourRates = [HourRate(int(hour), float(rate) if "." in rate or "e" in rate or "E" in rate else int(rate)) for hour, rate in pairs]
+        return hourRates, match.end()
+
+    @staticmethod
+    def _raiseHourRatesError(line: str, position: int, lineNumber: int):
+        """
+        Walk the list of (hour, rate) pairs token by token and raise the error at the column of the first token which does not match.
+
+        :param line: The line containing the list.
+        :type line: str
+        :param position: The index of the opening '[' or '('.
+        :type position: int
+        :param lineNumber: The number of the line, for error messages.
+        :type lineNumber: int
+        :raises InputParser.ParseError: Always.
+        """
+        def expect(pattern: re.Pattern, expected: str) -> int:
+            match = pattern.match(line, position)
+            if match is None:
+                column = SPACE_PATTERN.match(line, position).end()
+                found = f"'{line[column]}'" if column < len(line) else "end of line"
+                raise InputParser.ParseError(f"expected {expected} in the passenger arrival rates, found {found}", lineNumber, column + 1)
+            return match.end()
+
+        if not line.startswith(("[", "("), position):
+            raise InputParser.ParseError("expected '[' before the passenger arrival rates", lineNumber, position + 1)
+        position += 1
+        while True:
+            match = LIST_END_PATTERN.match(line, position)
+            if match is not None:
+                # the list itself is valid, so this is not reached
+                raise InputParser.ParseError("invalid passenger arrival rates", lineNumber, position + 1)
+            for pattern, expected in HOUR_RATE_TOKENS:
+                position = expect(pattern, expected)
+            if line[position - 1] in ")]":
+                raise InputParser.ParseError("invalid passenger arrival rates", lineNumber, position + 1)
+
+    @staticmethod
+    def _parseNumber(convert, line: str, start: int, end: int, expected: str, lineNumber: int) -> int | float:
+        """
+        Convert the whole field between the separators to a number.
+
+        :param convert: The conversion, int or float.
+        :type convert: type
+        :param line: The line containing the field.
+        :type line: str
+        :param start: The index where the field starts.
+        :type start: int
+        :param end: The index where the field ends.
+        :type end: int
+        :param expected: Description of the field, for error messages.
+        :type expected: str
+        :param lineNumber: The number of the line, for error messages.
+        :type lineNumber: int
+        :raises InputParser.ParseError: If the field is not a number.
+        :return: The number.
+        :rtype: int | float
+        """
+        try:
+            return convert(line[start:end])
+        except ValueError:
+            column = SPACE_PATTERN.match(line, start, end).end()
+            found = f"'{line[column:end].strip()}'" if column < end else "nothing"
+            raise InputParser.ParseError(f"expected {expected}, found {found}", lineNumber, column + 1) from None
+
     @staticmethod
     def parseTimeTableFromFile(file) -> TimeTable:
         """
-        Parse the time table from a file.
+        Parse the time table from a file, the file is read line by line.
 
-        :param file: The file containing the time table.
-        :type file: FileDescriptorOrPath
+        :param file: The path of the file, or an open text or binary file object.
+        :type file: FileDescriptorOrPath | IO
+        :raises InputParser.ParseError: If a line does not have the time table format.
         :return: The time table.
         :rtype: TimeTable
         """
+        if hasattr(file, "read"):
+            return InputParser._parseTimeTableFromLines(file)
         with open(file, "r") as f:
             return InputParser._parseTimeTableFromLines(f)
 
@@ -91,6 +240,7 @@ class InputParser:
 
         :param string: The string containing the time table.
         :type string: str
+        :raises InputParser.ParseError: If a line does not have the time table format.
         :return: The time table.
         :rtype: TimeTable
         """
@@ -101,25 +251,61 @@ class InputParser:
     def _parseTimeTableFromLines(lines) -> TimeTable:
         """
         Parse the time table from a list of lines.
+        The line should contain the hour and the minutes of the departures in the following format:
+        hour:minute,minute,minute,...
 
         :param lines: The list of lines containing the time table.
         :type lines: list[str] | TextIOWrapper[_WrappedBuffer]
+        :raises InputParser.ParseError: If a line does not have the time table format.
         :return: The time table.
         :rtype: TimeTable
         """
         timeTable = TimeTable()
 
-        for line in lines:
-            line = line.strip()
-            if line.startswith("#") or line == "":
+        for lineNumber, line in enumerate(lines, 1):
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            line = line.rstrip()
+            start = len(line) - len(line.lstrip())
+            if start == len(line) or line[start] == "#":
                 continue
 
-            hour, minutes = line.split(":")
+            hourEnd = line.find(":", start)
+            if hourEnd < 0:
+                raise InputParser.ParseError("expected ':' after the hour", lineNumber, len(line) + 1)
+            hour = InputParser._parseNumber(int, line, start, hourEnd, "an integer hour", lineNumber)
 
-            if minutes == "":
+            position = hourEnd + 1
+            if position == len(line):
                 continue
 
-            minutesInt = [int(minute.strip()) for minute in minutes.split(",")]
-            timeTable.addRow(int(hour), minutesInt)
+            try:
+                minutesInt = [int(minute) for minute in line[position:].split(",")]
+            except ValueError:
+                InputParser._raiseMinutesError(line, position, lineNumber)
+            timeTable.addRow(hour, minutesInt)
+
+        return timeTable
+
+    @staticmethod
+    def _raiseMinutesError(line: str, position: int, lineNumber: int):
+        """
+        Walk the list of minutes one by one and raise the error at the column of the first minute which does not match.
 
-        return timeTable
\ No newline at end of file
+        :param line: The line containing the minutes.
+        :type line: str
+        :param position: The index after the ':' following the hour.
+        :type position: int
+        :param lineNumber: The number of the line, for error messages.
+        :type lineNumber: int
+        :raises InputParser.ParseError: Always.
+        """
+        while True:
+            match = MINUTE_PATTERN.match(line, position)
+            if match is None:
+                column = SPACE_PATTERN.match(line, position).end()
+                found = f"'{line[column]}'" if column < len(line) else "end of line"
+                raise InputParser.ParseError(f"expected an integer minute, found {found}", lineNumber, column + 1)
+            if match.group(2) == "":
+                raise InputParser.ParseError("invalid minutes", lineNumber, position + 1)
+            position = match.end()
@@ -0,0 +1,549 @@
+"""
+This file contains the JobManager class, which queues optimization jobs and runs them in a fixed number of worker processes, and the brokers which store its queue and jobs.
+
+:author: Lukas Katona
+"""
+
+from enum import Enum
+import heapq
+import itertools
+import math
+import os
+import pickle
+import queue
+import threading
+import time
+import uuid
+
+from .OptimizationWorker import GenerationSnapshot, OptimizationWorker
+
+# ------------------------------ BROKERS ------------------------------
+class InProcessBroker:
+    # INIT
+    def __init__(self):
+        self.condition = threading.Condition()
+        # heap of (score, sequence, job id), jobs with the same score are taken in the order of submission
+        self.queue = []
+        self.sequence = itertools.count()
+        self.jobs = {}
+        self.cancelled = set()
+        # jobs taken out of the queued state, by a worker starting them or by a cancellation
+        self.claimed = set()
+        # heap of (expiration time, job id) of the jobs saved with a time to live, and the current expiration time of every such job
+        self.expirations = []
+        self.expirationTimes = {}
+        # owner -> number of unfinished jobs, owners without unfinished jobs are removed
+        self.ownerLoads = {}
+
+    # QUEUE
+    def enqueue(self, jobId: str, score: float):
+        """
+        Add the job to the queue, jobs with lower score are taken first.
+
+        :param jobId: The id of the job.
+        :type jobId: str
+        :param score: The score of the job.
+        :type score: float
+        """
+        with self.condition:
+            heapq.heappush(self.queue, (score, next(self.sequence), jobId))
+            self.condition.notify()
+
+    def dequeue(self, timeout: float) -> str | None:
+        """
+        Take the job with the lowest score from the queue, wait for it if the queue is empty.
+
+        :param timeout: Maximum number of seconds to wait.
+        :type timeout: float
+        :return: The id of the job, or None if the queue stayed empty.
+        :rtype: str | None
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: len(self.queue) > 0, timeout):
+                return None
+            return heapq.heappop(self.queue)[2]
+
+    # JOBS
+    def saveJob(self, job: dict, timeToLive: float = None):
+        """
+        Save the job.
+
+        :param job: The job, its id is under the "id" key.
+        :type job: dict
+        :param timeToLive: Number of seconds after which the job and its cancellation are removed, defaults to None (kept until saved with a time to live)
+        :type timeToLive: float, optional
+        """
+        with self.condition:
+            self.removeExpiredJobs()
+            self.jobs[job["id"]] = dict(job)
+            if timeToLive is not None:
+                self.expirationTimes[job["id"]] = time.time() + timeToLive
+                heapq.heappush(self.expirations, (self.expirationTimes[job["id"]], job["id"]))
+            else:
+                self.expirationTimes.pop(job["id"], None)
+
+    def loadJob(self, jobId: str) -> dict | None:
+        """
+        Load the job.
+
+        :param jobId: The id of the job.
+        :type jobId: str
+        :return: The job, or None if there is no job with the id.
+        :rtype: dict | None
+        """
+        with self.condition:
+            self.removeExpiredJobs()
+            job = self.jobs.get(jobId)
+            return dict(job) if job is not None else None
+
+    def removeExpiredJobs(self):
+        """
+        Remove the jobs whose time to live has passed, with their cancellations.
+        Expirations replaced by a later save of the job are skipped. Called with the lock held.
+        """
+        now = time.time()
+        while len(self.expirations) > 0 and self.expirations[0][0] <= now:
+            expirationTime, jobId = heapq.heappop(self.expirations)
+            if self.expirationTimes.get(jobId) == expirationTime:
+                del self.expirationTimes[jobId]
+                self.jobs.pop(jobId, None)
+                self.cancelled.discard(jobId)
+                self.claimed.discard(jobId)
+
+    def requestCancel(self, jobId: str):
+        """
+        Mark the job as cancelled, the job manager running it stops it.
+        The mark is removed together with the job.
+
+        :param jobId: The id of the job.
+        :type jobId: str
+        """
+        with self.condition:
+            if jobId in self.jobs:
+                self.cancelled.add(jobId)
+
+    def claimJob(self, jobId: str) -> bool:
+        """
+        Take the queued job out of the queued state, only the first claim of the job succeeds.
+        The worker starting the job and the cancellation of the job both claim it, so only one of them ends the job.
+
+        :param jobId: The id of the job.
+        :type jobId: str
+        :return: True if this claim was the first one, False otherwise.
+        :rtype: bool
+        """
+        with self.condition:
+            if jobId not in self.jobs or jobId in self.claimed:
+                return False
+            self.claimed.add(jobId)
+            return True
+
+    def isCancelRequested(self, jobId: str) -> bool:
+        """
+        Check if the job was cancelled.
+
+        :param jobId: The id of the job.
+        :type jobId: str
+        :return: True if the job was cancelled, False otherwise.
+        :rtype: bool
+        """
+        with self.condition:
+            return jobId in self.cancelled
+
+    # OWNERS
+    def changeOwnerLoad(self, owner: str, change: int):
+        """
+        Change the number of unfinished jobs of the owner, the number never drops below zero.
+
+        :param owner: The owner of the jobs.
+        :type owner: str
+        :param change: The change of the number of unfinished jobs.
+        :type change: int
+        """
+        with self.condition:
+            load = self.ownerLoads.get(owner, 0) + change
+            if load > 0:
+                self.ownerLoads[owner] = load
+            else:
+                self.ownerLoads.pop(owner, None)
+
+    def getOwnerLoad(self, owner: str) -> int:
+        """
+        Get the number of unfinished jobs of the owner.
+
+        :param owner: The owner of the jobs.
+        :type owner: str
+        :return: The number of queued and running jobs of the owner.
+        :rtype: int
+        """
+        with self.condition:
+            return self.ownerLoads.get(owner, 0)
+
+class RedisBroker:
+    # INIT
+    def __init__(self, client, prefix: str = "sprout:jobs"):
+        # redis client or any client with the same interface
+        self.client = client
+        self.prefix = prefix
+
+    @staticmethod
+    def fromUrl(url: str) -> 'RedisBroker':
+        """
+        Create the broker connected to the redis server at the url.
+
+        :param url: The url of the redis server.
+        :type url: str
+        :return: The broker.
+        :rtype: RedisBroker
+        """
+        import redis
+        return RedisBroker(redis.Redis.from_url(url))
+
+    # QUEUE
+    def enqueue(self, jobId: str, score: float):
+        """
+        Add the job to the queue, jobs with lower score are taken first.
+
+        :param jobId: The id of the job.
+        :type jobId: str
+        :param score: The score of the job.
+        :type score: float
+        """
+        # members with the same score are ordered lexicographically, so the sequence number keeps them in the order of submission
+        sequence = self.client.incr(f"{self.prefix}:sequence")
+        self.client.zadd(f"{self.prefix}:queue", {f"{sequence:016d}:{jobId}": score})
+
+    def dequeue(self, timeout: float) -> str | None:
+        """
+        Take the job with the lowest score from the queue, wait for it if the queue is empty.
+
+        :param timeout: Maximum number of seconds to wait.
+        :type timeout: float
+        :return: The id of the job, or None if the queue stayed empty.
+        :rtype: str | None
+        """
+        item = self.client.bzpopmin(f"{self.prefix}:queue", timeout)
+        if item is None:
+            return None
+        member = item[1].decode() if isinstance(item[1], bytes) else item[1]
+        return member.split(":", 1)[1]
+
+    # JOBS
+    def saveJob(self, job: dict, timeToLive: float = None):
+        """
+        Save the job, redis removes it when its time to live passes.
+
+        :param job: The job, its id is under the "id" key.
+        :type job: dict
+        :param timeToLive: Number of seconds after which the job and its cancellation are removed, defaults to None (kept until saved with a time to live)
+        :type timeToLive: float, optional
+        """
+        self.client.set(f"{self.prefix}:job:{job['id']}", pickle.dumps(job), ex=RedisBroker.toSeconds(timeToLive))
+        if timeToLive is not None:
+            self.client.expire(f"{self.prefix}:cancelled:{job['id']}", RedisBroker.toSeconds(timeToLive))
+            self.client.expire(f"{self.prefix}:claimed:{job['id']}", RedisBroker.toSeconds(timeToLive))
+
+    def loadJob(self, jobId: str) -> dict | None:
+        """
+        Load the job.
+
+        :param jobId: The id of the job.
+        :type jobId: str
+        :return: The job, or None if there is no job with the id.
+        :rtype: dict | None
+        """
+        data = self.client.get(f"{self.prefix}:job:{jobId}")
+        return pickle.loads(data) if data is not None else None
+
+    def requestCancel(self, jobId: str):
+        """
+        Mark the job as cancelled, the job manager running it stops it.
+        The mark expires with the job, or with the time to live of the job if it has one.
+
+        :param jobId: The id of the job.
+        :type jobId: str
+        """
+        timeToLive = self.client.ttl(f"{self.prefix}:job:{jobId}")
+        if timeToLive == -2:
+            return
+        self.client.set(f"{self.prefix}:cancelled:{jobId}", 1, ex=timeToLive if timeToLive > 0 else None)
+
+    def claimJob(self, jobId: str) -> bool:
+        """
+        Take the queued job out of the queued state, only the first claim of the job succeeds.
+        The claim is a single SET NX, so it is atomic even between job managers of several processes.
+        The worker starting the job and the cancellation of the job both claim it, so only one of them ends the job.
+
+        :param jobId: The id of the job.
+        :type jobId: str
+        :return: True if this claim was the first one, False otherwise.
+        :rtype: bool
+        """
+        return bool(self.client.set(f"{self.prefix}:claimed:{jobId}", 1, nx=True))
+
+    def isCancelRequested(self, jobId: str) -> bool:
+        """
+        Check if the job was cancelled.
+
+        :param jobId: The id of the job.
+        :type jobId: str
+        :return: True if the job was cancelled, False otherwise.
+        :rtype: bool
+        """
+        return bool(self.client.exists(f"{self.prefix}:cancelled:{jobId}"))
+
+    # OWNERS
+    def changeOwnerLoad(self, owner: str, change: int):
+        """
+        Change the number of unfinished jobs of the owner, owners without unfinished jobs are removed from the hash.
+
+        :param owner: The owner of the jobs.
+        :type owner: str
+        :param change: The change of the number of unfinished jobs.
+        :type change: int
+        """
+        if self.client.hincrby(f"{self.prefix}:owners", owner, change) <= 0:
+            self.client.hdel(f"{self.prefix}:owners", owner)
+
+    def getOwnerLoad(self, owner: str) -> int:
+        """
+        Get the number of unfinished jobs of the owner.
+
+        :param owner: The owner of the jobs.
+        :type owner: str
+        :return: The number of queued and running jobs of the owner.
+        :rtype: int
+        """
+        load = self.client.hget(f"{self.prefix}:owners", owner)
+        return max(int(load), 0) if load is not None else 0
+
+    @staticmethod
+    def toSeconds(timeToLive: float | None) -> int | None:
+        """
+        Round the time to live up to whole seconds, redis expirations are in seconds.
+
+        :param timeToLive: The time to live in seconds, or None.
+        :type timeToLive: float | None
+        :return: The whole number of seconds, at least 1, or None.
+        :rtype: int | None
+        """
+        return max(math.ceil(timeToLive), 1) if timeToLive is not None else None
+
+# ---------------------------- JOB MANAGER ----------------------------
+class JobManager:
+    # STATES
+    class Status(Enum):
+        Queued = 1
+        Running = 2
+        Finished = 3
+        Cancelled = 4
+        Failed = 5
+
+    # Static number of seconds the workers wait for a job or a snapshot before checking for cancellation
+    pollInterval = 0.5
+    # Static number of seconds a finished, cancelled or failed job is kept for its status and result, before it is removed
+    finishedJobTimeToLive = 3600
+
+    # INIT
+    def __init__(self, numberOfWorkers: int = None, broker=None):
+        self.numberOfWorkers = numberOfWorkers if numberOfWorkers is not None else os.cpu_count() or 1
+        self.broker = broker if broker is not None else InProcessBroker()
+        self.stopped = threading.Event()
+        # every worker thread runs one job at a time in its own process, so at most numberOfWorkers jobs run at once
+        self.workers = [threading.Thread(target=self.runWorker, daemon=True) for _ in range(self.numberOfWorkers)]
+        for worker in self.workers:
+            worker.start()
+
+    # METHODS
+    def submit(self, numberOfGenerations: int, geneticsArguments: tuple, geneticsKeywordArguments: dict = None, priority: int = 0, owner: str = None) -> str:
+        """
+        Submit an optimization job to the queue.
+        Jobs with lower priority run first. For the same priority, jobs of owners with fewer unfinished jobs run first, so the workers are shared fairly between owners.
+
+        :param numberOfGenerations: The number of generations of the optimization.
+        :type numberOfGenerations: int
+        :param geneticsArguments: The positional arguments of Genetics.
+        :type geneticsArguments: tuple
+        :param geneticsKeywordArguments: The keyword arguments of Genetics, defaults to None
+        :type geneticsKeywordArguments: dict, optional
+        :param priority: The priority of the job, defaults to 0
+        :type priority: int, optional
+        :param owner: The owner of the job, for example the session which submitted it, defaults to None
+        :type owner: str, optional
+        :return: The id of the job.
+        :rtype: str
+        """
+        ownerLoad = self.broker.getOwnerLoad(owner) if owner is not None else 0
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": JobManager.Status.Queued,
+            "priority": priority,
+            "owner": owner,
+            "numberOfGenerations": numberOfGenerations,
+            "geneticsArguments": geneticsArguments,
+            "geneticsKeywordArguments": geneticsKeywordArguments if geneticsKeywordArguments is not None else {},
+            "snapshot": None,
+            "error": None,
+            "submitted": time.time(),
+            "started": None,
+            "finished": None,
+        }
+        self.broker.saveJob(job)
+        if owner is not None:
+            self.broker.changeOwnerLoad(owner, 1)
+        self.broker.enqueue(job["id"], priority * 1000 + min(ownerLoad, 999))
+        return job["id"]
+
+    def status(self, jobId: str) -> dict | None:
+        """
+        Get the status of the job: its state, the last generation snapshot, the error and the times of submission, start and finish.
+
+        :param jobId: The id of the job.
+        :type jobId: str
+        :return: The status of the job, or None if there is no job with the id.
+        :rtype: dict | None
+        """
+        job = self.broker.loadJob(jobId)
+        if job is None:
+            return None
+        del job["geneticsArguments"]
+        del job["geneticsKeywordArguments"]
+        return job
+
+    def cancel(self, jobId: str):
+        """
+        Cancel the job. A queued job is never started, a running job is stopped before its next generation.
+        Jobs which already ended are left as they are.
+        If a worker claims the queued job first, the worker sees the cancellation and ends the job itself.
+
+        :param jobId: The id of the job.
+        :type jobId: str
+        """
+        job = self.broker.loadJob(jobId)
+        if job is None or job["status"] not in (JobManager.Status.Queued, JobManager.Status.Running):
+            return
+        self.broker.requestCancel(jobId)
+        if job["status"] == JobManager.Status.Queued and self.broker.claimJob(jobId):
+            self.endJob(job, JobManager.Status.Cancelled)
+
+    def result(self, jobId: str) -> GenerationSnapshot | None:
+        """
+        Get the last generation of the job, if the job finished or was cancelled.
+
+        :param jobId: The id of the job.
+        :type jobId: str
+        :return: The snapshot of the last generation, or None if the job is not done or has no generation.
+        :rtype: GenerationSnapshot | None
+        """
+        job = self.broker.loadJob(jobId)
+        if job is None or job["status"] not in (JobManager.Status.Finished, JobManager.Status.Cancelled):
+            return None
+        return job["snapshot"]
+
+    def shutdown(self):
+        """
+        Stop the worker threads, running jobs are cancelled.
+        """
+        self.stopped.set()
+        for worker in self.workers:
+            worker.join()
+
+    # WORKERS
+    def runWorker(self):
+        """
+        Take jobs from the queue and run them one by one, until the job manager is shut down.
+        Runs in a worker thread.
+        """
+        while not self.stopped.is_set():
+            self.runNextJob(JobManager.pollInterval)
+
+    def runNextJob(self, timeout: float):
+        """
+        Take the next job from the queue and run it, unless it was cancelled or another worker or a cancellation claimed it first.
+
+        :param timeout: Maximum number of seconds to wait for a job.
+        :type timeout: float
+        """
+        jobId = self.broker.dequeue(timeout)
+        if jobId is None:
+            return
+        job = self.broker.loadJob(jobId)
+        if job is None or job["status"] != JobManager.Status.Queued or not self.broker.claimJob(jobId):
+            return
+        if self.broker.isCancelRequested(jobId):
+            self.endJob(job, JobManager.Status.Cancelled)
+            return
+        self.runJob(job)
+
+    def runJob(self, job: dict):
+        """
+        Run the job in an optimization worker process and save its snapshots, until it ends or is cancelled.
+
+        :param job: The job to run.
+        :type job: dict
+        """
+        job["status"] = JobManager.Status.Running
+        job["started"] = time.time()
+        self.broker.saveJob(job)
+
+        worker = OptimizationWorker(job["numberOfGenerations"], *job["geneticsArguments"], **job["geneticsKeywordArguments"])
+        worker.start()
+        cancelled = False
+        try:
+            while True:
+                if self.stopped.is_set() or self.broker.isCancelRequested(job["id"]):
+                    cancelled = True
+                    break
+                try:
+                    snapshot = worker.nextSnapshot(JobManager.pollInterval)
+                except queue.Empty:
+                    continue
+                if snapshot is None:
+                    break
+                job["snapshot"] = snapshot
+                self.broker.saveJob(job)
+        finally:
+            worker.stop()
+
+        if cancelled:
+            self.endJob(job, JobManager.Status.Cancelled)
+        elif worker.exitCode != 0:
+            job["error"] = f"Optimization worker exited with code {worker.exitCode}"
+            self.endJob(job, JobManager.Status.Failed)
+        else:
+            self.endJob(job, JobManager.Status.Finished)
+
+    def endJob(self, job: dict, status: 'JobManager.Status'):
+        """
+        Save the job in its final state, it is kept for the time to live of finished jobs and no longer counts as unfinished job of its owner.
+
+        :param job: The job which ended.
+        :type job: dict
+        :param status: The final state, Finished, Cancelled or Failed.
+        :type status: JobManager.Status
+        """
+        job["status"] = status
+        job["finished"] = time.time()
+        self.broker.saveJob(job, JobManager.finishedJobTimeToLive)
+        if job["owner"] is not None:
+            self.broker.changeOwnerLoad(job["owner"], -1)
+
+# Job manager shared by all sessions of the server, created on the first use
+sharedJobManager = None
+sharedJobManagerLock = threading.Lock()
+
+def getJobManager(redisUrl: str = None) -> JobManager:
+    """
+    Get the job manager shared by all sessions of the server.
+    When it is created, it uses the redis broker if the redis url is given, otherwise the in-process broker.
+
+    :param redisUrl: The url of the redis server, defaults to None
+    :type redisUrl: str, optional
+    :return: The shared job manager.
+    :rtype: JobManager
+    """
+    global sharedJobManager
+    with sharedJobManagerLock:
+        if sharedJobManager is None:
+            sharedJobManager = JobManager(broker=RedisBroker.fromUrl(redisUrl) if redisUrl else None)
+        return sharedJobManager
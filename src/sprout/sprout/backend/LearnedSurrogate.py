@@ -0,0 +1,159 @@
+"""
+This file contains the LearnedSurrogate class, a gaussian process trained on the chromosomes simulated by the genetic algorithm.
+
+:author: Lukas Katona
+"""
+
+import numpy as np
+
+class LearnedSurrogate:
+    """
+    Gaussian process regression (kriging) of the passenger satisfaction and the number of unboarded passengers on the genes of the chromosome.
+    The number of unboarded passengers ranges over orders of magnitude, so it is learned as log(1 + unboarded).
+    Both targets are standardized and share a squared exponential kernel, whose length scale and noise are chosen by the marginal likelihood.
+    Choosing them is the expensive part of the fit, so they are chosen again only after half of the samples were replaced, other fits reuse them.
+    Only the most recent samples are kept, so fitting the model stays cheap and follows the region the genetic algorithm is exploring.
+    """
+    # Static multiples of the median distance between the samples and noise variances tried as the length scale and the noise of the kernel
+    lengthScaleFactors = (0.5, 1.0, 2.0)
+    noiseVariances = (1e-3, 1e-2, 1e-1)
+
+    # INIT
+    def __init__(self, maxSamples: int = 500, minimumSamples: int = 50):
+        self.maxSamples = maxSamples
+        self.minimumSamples = minimumSamples
+        # samples of the chromosomes and their targets (satisfaction, log(1 + unboarded)), the newest at the end
+        self.chromosomes = np.empty((0, 24))
+        self.targets = np.empty((0, 2))
+        # fitted model, None until it is fitted on the current samples
+        self.model = None
+        # length scale and noise variance of the kernel, and the number of samples added since they were chosen
+        self.hyperparameters = None
+        self.samplesSinceSelection = 0
+
+    # METHODS
+    def add(self, chromosomes: np.ndarray, satisfactions: np.ndarray, unboarded: np.ndarray):
+        """
+        Add the simulated chromosomes to the samples, the oldest samples beyond the maximum are dropped.
+
+        :param chromosomes: The chromosomes, one per row.
+        :type chromosomes: np.ndarray
+        :param satisfactions: The simulated passenger satisfactions.
+        :type satisfactions: np.ndarray
+        :param unboarded: The simulated numbers of passengers left unboarded.
+        :type unboarded: np.ndarray
+        """
+        if len(chromosomes) == 0:
+            return
+        targets = np.column_stack((np.asarray(satisfactions, dtype=np.float64), np.log1p(np.asarray(unboarded, dtype=np.float64))))
+        self.chromosomes = np.concatenate((self.chromosomes, np.asarray(chromosomes, dtype=np.float64).reshape(-1, 24)))[-self.maxSamples:]
+        self.targets = np.concatenate((self.targets, targets))[-self.maxSamples:]
+        self.samplesSinceSelection += len(targets)
+        self.model = None
+
+    def isReady(self) -> bool:
+        """
+        Check whether there are enough samples for the predictions.
+
+        :return: True if the model can be fitted.
+        :rtype: bool
+        """
+        return len(self.chromosomes) >= self.minimumSamples
+
+    def fit(self):
+        """
+        Fit the gaussian process on the current samples.
+        The length scale and the noise with the highest marginal likelihood of both targets are chosen on the first fit and after half of the samples were replaced.
+        """
+        targetMeans = self.targets.mean(axis=0)
+        targetStds = self.targets.std(axis=0)
+        targetStds[targetStds == 0] = 1.0
+        targets = (self.targets - targetMeans) / targetStds
+        squaredDistances = LearnedSurrogate.squaredDistances(self.chromosomes, self.chromosomes)
+
+        if self.hyperparameters is None or 2 * self.samplesSinceSelection >= self.maxSamples:
+            medianDistance = np.sqrt(np.median(squaredDistances[np.triu_indices(len(squaredDistances), 1)]))
+            if medianDistance == 0:
+                medianDistance = 1.0
+            candidates = [(lengthScale, noiseVariance) for lengthScale in medianDistance * np.array(LearnedSurrogate.lengthScaleFactors) for noiseVariance in LearnedSurrogate.noiseVariances]
+            self.samplesSinceSelection = 0
+        else:
+            candidates = [self.hyperparameters]
+
+        best = None
+        for lengthScale, noiseVariance in candidates:
+            covariances = np.exp(-squaredDistances / (2 * lengthScale ** 2)) + noiseVariance * np.eye(len(squaredDistances))
+            try:
+                lower = np.linalg.cholesky(covariances)
+            except np.linalg.LinAlgError:
+                continue
+            weights = np.linalg.solve(covariances, targets)
+            logLikelihood = -0.5 * np.sum(targets * weights) - targets.shape[1] * np.sum(np.log(np.diag(lower)))
+            if best is None or logLikelihood > best[0]:
+                best = (logLikelihood, lengthScale, noiseVariance, lower, weights)
+        _, lengthScale, noiseVariance, lower, weights = best
+        self.hyperparameters = (lengthScale, noiseVariance)
+        self.model = (lengthScale, noiseVariance, weights, lower, targetMeans, targetStds)
+
+    def predict(self, chromosomes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Predict the targets of the chromosomes, the model is fitted first if the samples changed.
+        The standard deviation includes the noise, so it is the uncertainty of the result of a single simulation.
+
+        :param chromosomes: The chromosomes, one per row.
+        :type chromosomes: np.ndarray
+        :return: The predicted means and standard deviations of the satisfaction (first column) and of log(1 + unboarded) (second column).
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+        if self.model is None:
+            self.fit()
+        lengthScale, noiseVariance, weights, lower, targetMeans, targetStds = self.model
+        correlations = np.exp(-LearnedSurrogate.squaredDistances(np.asarray(chromosomes, dtype=np.float64).reshape(-1, 24), self.chromosomes) / (2 * lengthScale ** 2))
+        means = correlations @ weights
+        variances = np.maximum(1 + noiseVariance - np.sum(np.linalg.solve(lower, correlations.T) ** 2, axis=0), 0)
+        return means * targetStds + targetMeans, np.sqrt(variances)[:, np.newaxis] * targetStds
+
+    def optimisticEstimates(self, chromosomes: np.ndarray, confidence: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Get the best values of the chromosomes within the confidence bounds of the prediction.
+
+        :param chromosomes: The chromosomes, one per row.
+        :type chromosomes: np.ndarray
+        :param confidence: The number of standard deviations of the bounds.
+        :type confidence: float
+        :return: The upper bound of the satisfaction and the lower bound of the number of unboarded passengers, rounded, of every chromosome.
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+        means, stds = self.predict(chromosomes)
+        bounds = means + np.array([1, -1]) * confidence * stds
+        return bounds[:, 0], np.round(np.expm1(np.maximum(bounds[:, 1], 0)))
+
+    @staticmethod
+    def squaredDistances(points: np.ndarray, others: np.ndarray) -> np.ndarray:
+        """
+        Get the squared euclidean distances between all pairs of points.
+
+        :param points: The points, one per row.
+        :type points: np.ndarray
+        :param others: The other points, one per row.
+        :type others: np.ndarray
+        :return: The squared distances, as a (points x others) array.
+        :rtype: np.ndarray
+        """
+        squaredDistances = np.sum(points ** 2, axis=1)[:, np.newaxis] + np.sum(others ** 2, axis=1) - 2 * points @ others.T
+        return np.maximum(squaredDistances, 0)
+
+    # CLEAR
+    def clear(self):
+        """
+        Drop all samples and the fitted model.
+        """
+        self.chromosomes = np.empty((0, 24))
+        self.targets = np.empty((0, 2))
+        self.model = None
+        self.hyperparameters = None
+        self.samplesSinceSelection = 0
+
+    # STR
+    def __str__(self):
+        return f"LearnedSurrogate: {len(self.chromosomes)}/{self.maxSamples} samples"
@@ -0,0 +1,113 @@
+"""
+This file contains the OptimizationWorker class, which runs the genetic algorithm in a separate process and streams the generations back to the parent process.
+
+:author: Lukas Katona
+"""
+
+from collections import namedtuple
+import multiprocessing
+import queue
+import numpy as np
+
+from .Genetics import Genetics
+
+# Snapshot of one generation, the individuals are sorted by cost
+GenerationSnapshot = namedtuple('GenerationSnapshot', ['generationNumber', 'costs', 'satisfactions', 'chromosomes', 'bestChromosome', 'skippedSimulations'], defaults=[0])
+
+def runOptimization(numberOfGenerations: int, geneticsArguments: tuple, geneticsKeywordArguments: dict, cancelEvent, snapshotQueue):
+    """
+    Run the genetic algorithm and put a snapshot of every generation to the queue, followed by None when the optimization ends.
+    Runs in the worker process, the optimization stops before the next generation when the cancel event is set.
+
+    :param numberOfGenerations: The number of generations.
+    :type numberOfGenerations: int
+    :param geneticsArguments: The positional arguments of Genetics.
+    :type geneticsArguments: tuple
+    :param geneticsKeywordArguments: The keyword arguments of Genetics.
+    :type geneticsKeywordArguments: dict
+    :param cancelEvent: The event set by the parent process to cancel the optimization.
+    :type cancelEvent: multiprocessing.Event
+    :param snapshotQueue: The queue of generation snapshots.
+    :type snapshotQueue: multiprocessing.Queue
+    """
+    genetics = None
+    try:
+        genetics = Genetics(*geneticsArguments, **geneticsKeywordArguments)
+        for i in range(numberOfGenerations):
+            if cancelEvent.is_set():
+                break
+            generation = genetics.generation
+            order = np.argsort(generation.costs, kind="stable")
+            snapshotQueue.put(GenerationSnapshot(
+                i + 1,
+                generation.costs[order].tolist(),
+                generation.satisfactions[order].tolist(),
+                generation.chromosomes[order].tolist(),
+                generation.getChromosome(int(round(len(generation)/2))),
+                genetics.numberOfSkippedSimulations,
+            ))
+            # the last generation is only shown, no offsprings are needed
+            if i < numberOfGenerations - 1:
+                genetics.updateGeneration()
+    finally:
+        if genetics is not None:
+            genetics.close()
+        snapshotQueue.put(None)
+
+class OptimizationWorker:
+    # Static number of seconds the worker process has to stop after cancellation, before it is terminated
+    stopTimeout = 1.0
+
+    # INIT
+    def __init__(self, numberOfGenerations: int, *geneticsArguments, **geneticsKeywordArguments):
+        self.numberOfGenerations = numberOfGenerations
+        self.geneticsArguments = geneticsArguments
+        self.geneticsKeywordArguments = geneticsKeywordArguments
+        # the worker process is spawned, so it does not inherit the threads and sockets of the server
+        self.context = multiprocessing.get_context("spawn")
+        self.cancelEvent = self.context.Event()
+        self.snapshotQueue = self.context.Queue()
+        self.process = None
+
+    # METHODS
+    def start(self):
+        """
+        Start the worker process.
+        """
+        self.process = self.context.Process(target=runOptimization, args=(self.numberOfGenerations, self.geneticsArguments, self.geneticsKeywordArguments, self.cancelEvent, self.snapshotQueue))
+        self.process.start()
+
+    def nextSnapshot(self, timeout: float = None) -> GenerationSnapshot | None:
+        """
+        Wait for the next generation snapshot.
+
+        :param timeout: Maximum number of seconds to wait, defaults to None (wait until the snapshot arrives)
+        :type timeout: float, optional
+        :raises queue.Empty: If no snapshot arrives in time and the worker process is still running.
+        :return: The next snapshot, or None if the optimization ended or the worker process died.
+        :rtype: GenerationSnapshot | None
+        """
+        try:
+            return self.snapshotQueue.get(timeout=timeout)
+        except queue.Empty:
+            if self.process.is_alive():
+                raise
+            return None
+
+    @property
+    def exitCode(self) -> int | None:
+        """
+        Exit code of the worker process, None if it is still running.
+        """
+        return self.process.exitcode if self.process is not None else None
+
+    def stop(self):
+        """
+        Cancel the optimization and wait for the worker process to stop, terminate it if it does not stop in time.
+        """
+        self.cancelEvent.set()
+        if self.process is not None:
+            self.process.join(OptimizationWorker.stopTimeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
@@ -0,0 +1,144 @@
+"""
+This file contains the QueueingSurrogate class, which estimates the fitness values of timetables analytically, without simulating the passengers.
+
+:author: Lukas Katona
+"""
+
+import numpy as np
+
+class QueueingSurrogate:
+    """
+    Mean-value model of the bus line, used to rank the chromosomes of the genetic algorithm cheaply.
+    The departures of a chromosome are known exactly, so the bus stops are swept in the same order as in the stop-major engine,
+    but instead of drawing the passengers, every visit gets the expected number of passengers arrived since the previous bus,
+    the expected number of boarding passengers is the expected minimum of the poisson number of passengers and the free places in the bus,
+    and the rest is the expected overflow, the passengers left unboarded.
+    All chromosomes are evaluated at once, as (chromosomes x buses) arrays.
+    """
+    # Static time of the end of the simulated day and the waiting time for the first bus, the same as in the simulation
+    endTime = 24*60
+    firstBusWaitingTime = 15
+
+    # INIT
+    def __init__(self, busStops, vehicleCapacity: int, vehicleSeats: int, costPerSeatKm: float, routeLength: float):
+        self.vehicleCapacity = vehicleCapacity
+        self.vehicleSeats = vehicleSeats
+        self.costPerSeatKm = costPerSeatKm
+        self.routeLength = routeLength
+        # bus stops in the order of the time to arrive, as in the stop-major engine, with their arrival rates per minute for every hour
+        order = sorted(range(len(busStops)), key=lambda i: busStops[i].timeDeltaToArrive)
+        self.timeDeltasToArrive = [busStops[i].timeDeltaToArrive for i in order]
+        self.leavingPassengersRates = [busStops[i].leavingPassengersRate for i in order]
+        self.rates = np.zeros((len(order), 24))
+        for row, i in enumerate(order):
+            for hourRate in reversed(busStops[i].passengerArrivalRatesPerHour):
+                self.rates[row, hourRate.hour] = hourRate.rate / 60
+
+    # METHODS
+    def evaluate(self, chromosomes: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Estimate the fitness values of the chromosomes.
+        The cost is exact, the satisfaction, the number of unboarded passengers and the waiting time are the values of the mean-value model.
+
+        :param chromosomes: The chromosomes, one per row.
+        :type chromosomes: np.ndarray
+        :return: The cost, the average passenger satisfaction, the expected number of passengers left unboarded and the expected total time spent waiting of every chromosome.
+        :rtype: tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        """
+        chromosomes = np.asarray(chromosomes, dtype=np.int64).reshape(-1, 24)
+        numberOfBuses = chromosomes.sum(axis=1)
+        costs = self.routeLength * numberOfBuses * self.vehicleCapacity / 100 * self.costPerSeatKm
+
+        departures = QueueingSurrogate.departures(chromosomes)
+        loads = np.zeros(departures.shape)
+        passengers = np.zeros(len(chromosomes))
+        satisfactions = np.zeros(len(chromosomes))
+        unboarded = np.zeros(len(chromosomes))
+        waiting = np.zeros(len(chromosomes))
+        standingCapacity = self.vehicleCapacity - self.vehicleSeats
+
+        for timeDeltaToArrive, leavingPassengersRate, rates in zip(self.timeDeltasToArrive, self.leavingPassengersRates, self.rates):
+            times = departures + timeDeltaToArrive
+            visited = times <= QueueingSurrogate.endTime
+
+            # passengers leaving the buses
+            loads = loads * (1 - leavingPassengersRate)
+
+            # expected passengers arrived since the previous bus, the departures of a chromosome are sorted and the padding is at the end
+            previousTimes = np.concatenate((np.zeros((len(times), 1), dtype=times.dtype), times[:, :-1]), axis=1)
+            intervalStarts = np.where(previousTimes == 0, times - QueueingSurrogate.firstBusWaitingTime, previousTimes)
+            intervals = np.maximum(times - intervalStarts, 0)
+            expectedPassengers = np.where(visited, rates[times // 60 % 24] * intervals, 0.0)
+
+            # passengers who have been waiting the longest board first, the expected waiting time of the first of the uniformly arrived passengers
+            boarding = expectedPoissonMinimum(expectedPassengers, np.floor(np.maximum(self.vehicleCapacity - loads, 0)).astype(np.int64))
+            boardedShare = np.divide(boarding, expectedPassengers, out=np.ones_like(boarding), where=expectedPassengers > 0)
+            waiting += (boarding * intervals * (1 - boardedShare / 2)).sum(axis=1)
+            passengers += expectedPassengers.sum(axis=1)
+            unboarded += (expectedPassengers - boarding).sum(axis=1)
+
+            # satisfaction of the boarding passengers, the same as in the stop-major engine
+            if standingCapacity > 0:
+                seated = np.clip(self.vehicleSeats - loads + 1, 0, boarding)
+                standing = boarding - seated
+                firstExcess = np.maximum(loads - self.vehicleSeats, 1)
+                lastExcess = loads + boarding - 1 - self.vehicleSeats
+                satisfactions += (boarding - standing * (firstExcess + lastExcess) / 2 / standingCapacity).sum(axis=1)
+            else:
+                satisfactions += boarding.sum(axis=1)
+            loads = loads + boarding
+
+        satisfactions = np.divide(satisfactions, passengers, out=np.zeros_like(satisfactions), where=passengers > 0)
+        return costs, satisfactions, unboarded, waiting
+
+    @staticmethod
+    def departures(chromosomes: np.ndarray) -> np.ndarray:
+        """
+        Get the departures of the timetables generated from the chromosomes, evenly distributed over every hour like in TimeTable.generateFromChromosome.
+        The rows are padded by departures after the end of the day, which are never visited.
+
+        :param chromosomes: The chromosomes, one per row.
+        :type chromosomes: np.ndarray
+        :return: The sorted departures of every chromosome, as a (chromosomes x largest number of buses) array.
+        :rtype: np.ndarray
+        """
+        counts = chromosomes.ravel()
+        hours = np.repeat(np.tile(np.arange(24), len(chromosomes)), counts)
+        divisors = np.repeat(counts, counts)
+        firsts = np.cumsum(counts) - counts
+        indices = np.arange(len(hours)) - np.repeat(firsts, counts)
+        numberOfBuses = chromosomes.sum(axis=1)
+        rows = np.repeat(np.arange(len(chromosomes)), numberOfBuses)
+        columns = np.arange(len(hours)) - np.repeat(np.cumsum(numberOfBuses) - numberOfBuses, numberOfBuses)
+        departures = np.full((len(chromosomes), max(int(numberOfBuses.max(initial=0)), 1)), 2 * QueueingSurrogate.endTime, dtype=np.int64)
+        departures[rows, columns] = hours * 60 + indices * 60 // divisors
+        return departures
+
+def expectedPoissonMinimum(means: np.ndarray, limits: np.ndarray) -> np.ndarray:
+    """
+    Get the expected minimum of a poisson number of events and a limit, E[min(N, c)] = P(N > 0) + ... + P(N > c - 1).
+    Only the means which can reach their limit are tabulated, for the others the minimum is the mean.
+
+    :param means: The expected numbers of events.
+    :type means: np.ndarray
+    :param limits: The limits, non-negative integers.
+    :type limits: np.ndarray
+    :return: The expected minimums.
+    :rtype: np.ndarray
+    """
+    minimums = means.astype(np.float64, copy=True)
+    # the probability beyond six standard deviations is negligible
+    reachable = means + 6 * np.sqrt(means) + 1 >= limits
+    if not np.any(reachable):
+        return minimums
+    selectedMeans = means[reachable]
+    selectedLimits = limits[reachable]
+    numberOfCounts = max(int(selectedLimits.max()), 1)
+    counts = np.arange(numberOfCounts)
+    logFactorials = np.concatenate(([0.0], np.cumsum(np.log(np.arange(1, numberOfCounts)))))
+    logMeans = np.log(np.maximum(selectedMeans, np.finfo(np.float64).tiny))
+    probabilities = np.exp(counts * logMeans[:, np.newaxis] - selectedMeans[:, np.newaxis] - logFactorials)
+    survivals = np.maximum(1 - np.cumsum(probabilities, axis=1), 0)
+    cumulativeSurvivals = np.concatenate((np.zeros((len(selectedMeans), 1)), np.cumsum(survivals, axis=1)), axis=1)
+    minimums[reachable] = cumulativeSurvivals[np.arange(len(selectedMeans)), selectedLimits]
+    return minimums
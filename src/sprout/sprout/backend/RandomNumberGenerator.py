@@ -1,19 +1,36 @@
 """
 This file contains the RandomNumberGenerator class, which is used to generate random numbers.
-It is important to have a single static instance of the random number generator to ensure that the random numbers are generated in a consistent manner.
+Calling the methods on the class itself uses a single static instance of the random number generator, which ensures that the random numbers are generated in a consistent manner.
+Every simulation owns its own instance, so simulations running at the same time do not share one random stream.
 
 :author: Lukas Katona
 """
 
 import numpy as np
 
+class generatorMethod:
+    """
+    Descriptor that binds the method either to the instance of the random number generator, or to the class itself when it is called statically.
+    """
+    # INIT
+    def __init__(self, function):
+        self.function = function
+        self.__doc__ = function.__doc__
+
+    def __get__(self, instance, owner):
+        return self.function.__get__(owner if instance is None else instance, owner)
+
 class RandomNumberGenerator:
     # Static variables
     _rng = np.random.default_rng()
 
+    # INIT
+    def __init__(self, seed=None):
+        self._rng = np.random.default_rng(seed)
+
     # METHODS
-    @staticmethod
-    def exponential(scale = 1.0, size: int = None) -> np.ndarray | float:
+    @generatorMethod
+    def exponential(self, scale = 1.0, size: int = None) -> np.ndarray | float:
         """
         Generate random numbers from an exponential distribution.
 
@@ -24,9 +41,26 @@ class RandomNumberGenerator:
         :return: Random numbers from the exponential distribution. If size is None, a single float is returned; otherwise, an array of floats is returned.
         :rtype: np.ndarray | float
         """
-        return RandomNumberGenerator._rng.exponential(scale=scale, size=size)
+        return self._rng.exponential(scale=scale, size=size)
+
+    @generatorMethod
+    def poisson(self, lam = 1.0, size: int | tuple[int, ...] = None) -> np.ndarray | int:
+        """
+        Generate random numbers from a poisson distribution.
+
+        :param lam: The expected number of events, or an array of them broadcastable to the size, defaults to 1.0
+        :type lam: float | np.ndarray, optional
+        :param size: The number or shape of random numbers to generate, defaults to None (single value)
+        :type size: int | tuple[int, ...], optional
+        :return: Random numbers from the poisson distribution. If size is None, a single integer is returned; otherwise, an array of integers is returned.
+        :rtype: np.ndarray | int
+        """
+        if size is None:
+            return int(self._rng.poisson(lam=lam))
+        return self._rng.poisson(lam=lam, size=size)
     
-    def uniform(low = 0.0, high = 1.0, size: int = None) -> np.ndarray | float:
+    @generatorMethod
+    def uniform(self, low = 0.0, high = 1.0, size: int = None) -> np.ndarray | float:
         """
         Generate random numbers from a uniform distribution.
 
@@ -39,9 +73,10 @@ class RandomNumberGenerator:
         :return: Random numbers from the uniform distribution. If size is None, a single float is returned; otherwise, an array of floats is returned.
         :rtype: np.ndarray | float
         """
-        return RandomNumberGenerator._rng.uniform(low=low, high=high, size=size)
+        return self._rng.uniform(low=low, high=high, size=size)
     
-    def integers(low = 0, high = 1, size: int = None) -> np.ndarray | int:
+    @generatorMethod
+    def integers(self, low = 0, high = 1, size: int = None) -> np.ndarray | int:
         """
         Generate random integers from a uniform distribution.
 
@@ -54,4 +89,6 @@ class RandomNumberGenerator:
         :return: Random integers from the uniform distribution. If size is None, a single integer is returned; otherwise, an array of integers is returned.
         :rtype: np.ndarray | int
         """
-        return int(RandomNumberGenerator._rng.integers(low=low, high=high, size=size))
\ No newline at end of file
+        if size is None:
+            return int(self._rng.integers(low=low, high=high))
+        return self._rng.integers(low=low, high=high, size=size)
@@ -0,0 +1,181 @@
+"""
+This file contains the ScenarioRegistry class, which parses the uploaded bus stops and timetables once and shares the parsed objects between the states of the UI.
+
+:author: Lukas Katona
+"""
+
+from collections import OrderedDict, namedtuple
+from enum import Enum
+import hashlib
+import threading
+
+from .InputParser import InputParser
+from .models import BusStop, TimeTable
+
+# Immutable representation of the parsed bus stop, the passenger arrival rates are a tuple of HourRate
+FrozenBusStop = namedtuple('FrozenBusStop', ['name', 'timeDeltaToArrive', 'passengerArrivalRatesPerHour', 'leavingPassengersRate'])
+
+class ScenarioRegistry:
+    # KINDS
+    class Kind(Enum):
+        BusStops = 1
+        TimeTable = 2
+
+    class MissingScenarioError(KeyError):
+        """
+        Raised when no input is registered under the id, for example after the entry was evicted or the server restarted.
+        """
+        pass
+
+    # INIT
+    def __init__(self, maxSize: int = 256):
+        self.maxSize = maxSize
+        # id -> parsed bus stops (tuple[FrozenBusStop]) or timetable (tuple of (hour, tuple of minutes)), ordered from least to most recently used
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    # METHODS
+    @staticmethod
+    def key(kind: Kind, text: str) -> str:
+        """
+        Get the id of the input text, the same text always gets the same id.
+
+        :param kind: The kind of the input.
+        :type kind: ScenarioRegistry.Kind
+        :param text: The input text.
+        :type text: str
+        :return: The id of the input.
+        :rtype: str
+        """
+        return kind.name + ":" + hashlib.sha256(text.encode()).hexdigest()
+
+    def registerBusStops(self, text: str) -> str:
+        """
+        Parse the bus stops, unless the same text was already registered.
+
+        :param text: The text containing the bus stops.
+        :type text: str
+        :raises InputParser.ParseError: If the text does not have the bus stop format.
+        :return: The id of the bus stops.
+        :rtype: str
+        """
+        scenarioId = ScenarioRegistry.key(ScenarioRegistry.Kind.BusStops, text)
+        if not self.touch(scenarioId):
+            busStops = tuple(FrozenBusStop(busStop.name, busStop.timeDeltaToArrive, tuple(busStop.passengerArrivalRatesPerHour), busStop.leavingPassengersRate) for busStop in InputParser.parseBusStopsFromString(text))
+            self.add(scenarioId, busStops)
+        return scenarioId
+
+    def registerTimeTable(self, text: str) -> str:
+        """
+        Parse the timetable, unless the same text was already registered.
+
+        :param text: The text containing the timetable.
+        :type text: str
+        :raises InputParser.ParseError: If the text does not have the timetable format.
+        :return: The id of the timetable.
+        :rtype: str
+        """
+        scenarioId = ScenarioRegistry.key(ScenarioRegistry.Kind.TimeTable, text)
+        if not self.touch(scenarioId):
+            timeTable = tuple((row.hour, tuple(row.minutes)) for row in InputParser.parseTimeTableFromString(text).rows)
+            self.add(scenarioId, timeTable)
+        return scenarioId
+
+    def getBusStops(self, scenarioId: str) -> tuple[BusStop, ...]:
+        """
+        Get the parsed bus stops.
+        The registry keeps them frozen, every call gets new bus stop objects, which the caller can modify.
+
+        :param scenarioId: The id of the bus stops.
+        :type scenarioId: str
+        :raises ScenarioRegistry.MissingScenarioError: If no bus stops are registered under the id.
+        :return: The bus stops.
+        :rtype: tuple[BusStop, ...]
+        """
+        busStops = self.get(ScenarioRegistry.Kind.BusStops, scenarioId)
+        return tuple(BusStop(busStop.name, busStop.timeDeltaToArrive, list(busStop.passengerArrivalRatesPerHour), busStop.leavingPassengersRate) for busStop in busStops)
+
+    def getTimeTable(self, scenarioId: str) -> TimeTable:
+        """
+        Get the parsed timetable.
+        The registry keeps it frozen, every call gets a new timetable, which the caller can modify.
+
+        :param scenarioId: The id of the timetable.
+        :type scenarioId: str
+        :raises ScenarioRegistry.MissingScenarioError: If no timetable is registered under the id.
+        :return: The timetable.
+        :rtype: TimeTable
+        """
+        timeTable = TimeTable()
+        for hour, minutes in self.get(ScenarioRegistry.Kind.TimeTable, scenarioId):
+            timeTable.addRow(hour, list(minutes))
+        return timeTable
+
+    def get(self, kind: Kind, scenarioId: str) -> tuple:
+        """
+        Get the frozen entry of the given kind and mark it as the most recently used.
+
+        :param kind: The kind of the input.
+        :type kind: ScenarioRegistry.Kind
+        :param scenarioId: The id of the input.
+        :type scenarioId: str
+        :raises ScenarioRegistry.MissingScenarioError: If no input of the kind is registered under the id.
+        :return: The frozen entry.
+        :rtype: tuple
+        """
+        with self.lock:
+            if not scenarioId or not scenarioId.startswith(kind.name + ":") or scenarioId not in self.entries:
+                raise ScenarioRegistry.MissingScenarioError(f"No {'bus stops' if kind == ScenarioRegistry.Kind.BusStops else 'timetable'} registered under id {scenarioId}")
+            self.entries.move_to_end(scenarioId)
+            return self.entries[scenarioId]
+
+    def touch(self, scenarioId: str) -> bool:
+        """
+        Mark the entry as the most recently used.
+
+        :param scenarioId: The id of the input.
+        :type scenarioId: str
+        :return: True if the entry is registered, False otherwise.
+        :rtype: bool
+        """
+        with self.lock:
+            if scenarioId not in self.entries:
+                return False
+            self.entries.move_to_end(scenarioId)
+            return True
+
+    def add(self, scenarioId: str, entry: tuple):
+        """
+        Add the frozen entry and evict the least recently used entries if the registry is full.
+
+        :param scenarioId: The id of the input.
+        :type scenarioId: str
+        :param entry: The frozen entry.
+        :type entry: tuple
+        """
+        with self.lock:
+            self.entries[scenarioId] = entry
+            self.entries.move_to_end(scenarioId)
+            while len(self.entries) > self.maxSize:
+                self.entries.popitem(last=False)
+
+    # STR
+    def __str__(self):
+        return f"ScenarioRegistry: {len(self.entries)}/{self.maxSize} entries"
+
+# Scenario registry shared by all sessions of the server, created on the first use
+sharedScenarioRegistry = None
+sharedScenarioRegistryLock = threading.Lock()
+
+def getScenarioRegistry() -> ScenarioRegistry:
+    """
+    Get the scenario registry shared by all sessions of the server.
+
+    :return: The shared scenario registry.
+    :rtype: ScenarioRegistry
+    """
+    global sharedScenarioRegistry
+    with sharedScenarioRegistryLock:
+        if sharedScenarioRegistry is None:
+            sharedScenarioRegistry = ScenarioRegistry()
+        return sharedScenarioRegistry
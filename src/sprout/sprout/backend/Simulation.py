@@ -1,56 +1,81 @@
 """
 This file contains the Simulation class, which is used to simulate the bus system.
+An instance of the simulation is the context of a single run, it owns the simulation clock, the event calendar and the random number generator, and it is passed to the models.
 
 :author: Lukas Katona
 """
 
+from concurrent.futures import ProcessPoolExecutor
 from datetime import timedelta
+from enum import Enum
+from functools import partial
+import numpy as np
+import time
 
+from .ArrivalStreams import ArrivalStreams
 from .EventCalendar import Event, EventCalendar
-from .Statistics import Statistics, averageStatistics
+from .RandomNumberGenerator import RandomNumberGenerator
+from .Statistics import BusStatistics, BusStopStatistics, RunningStatistic, Statistics, averageStatistics
 
 class Simulation:
-    # Static global variables
-    startTime = 0
-    currentTime = 0
-    endTime = 0
+    # ENGINES
+    class Engine(Enum):
+        # reference engine, processes the bus arrivals one by one from the event calendar
+        EventDriven = 1
+        # sweeps the bus stops of a single line one by one, for all buses at once, without the event calendar
+        StopMajor = 2
+        # stop-major engine with the replications as an additional array dimension, all replications are simulated at once
+        MultiLane = 3
+
+    # STOP REASONS
+    class StopReason(Enum):
+        # the confidence intervals of all metrics in Simulation.confidenceMetrics are precise enough
+        Confident = 1
+        # the maximum number of simulations was reached
+        MaximumReached = 2
+        # the next batch would not fit into the time budget, the result depends on the speed of the machine
+        TimeBudget = 3
+
+    # Static metrics whose confidence intervals stop the adaptive replications, with the absolute half-width that is precise enough even for a mean close to zero
+    confidenceMetrics = {
+        "averageTimeSpentWaiting": 0.0,
+        "totalPassengersLeftUnboarded": 1.0,
+        "averagePassengerSatisfaction": 0.0,
+    }
 
     # INIT
-    def __init__(self, initialTime, endTime):
-        Simulation.startTime = initialTime
-        Simulation.currentTime = initialTime
-        Simulation.endTime = endTime
+    def __init__(self, initialTime, endTime, rng: RandomNumberGenerator = None):
+        self.startTime = initialTime
+        self.currentTime = initialTime
+        self.endTime = endTime
+        self.eventCalendar = EventCalendar()
+        self.rng = rng if rng is not None else RandomNumberGenerator()
+        self.busCounter = 1
 
     # METHODS
-    @staticmethod
-    def forward(eventTime: int):
+    def forward(self, eventTime: int):
         """
         Move the simulation time forward to the event time.
 
         :param eventTime: The time of the event to move to.
         :type eventTime: int
         """
-        Simulation.currentTime = eventTime
+        self.currentTime = eventTime
 
-    @staticmethod
-    def getHour() -> int:
+    def getHour(self) -> int:
         """
         Get the current hour of the simulation.
 
         :return: The current hour of the simulation.
         :rtype: int
         """
-        return Simulation.currentTime // 60 % 24
-    
-    @staticmethod
-    def run(startTime: int, endTime: int, busStops, timeTable, vehicleCapacity: int, vehicleSeats: int) -> Statistics:
+        return self.currentTime // 60 % 24
+
+    def simulate(self, busStops, timeTable, vehicleCapacity: int, vehicleSeats: int) -> Statistics:
         """
-        Run the simulation for a given time period and return the statistics.
+        Simulate the bus line within this simulation context and return the statistics.
+        The bus stops are copied and bound to this simulation, so the given bus stops are never modified and can be shared between simulations.
 
-        :param startTime: The start time of the simulation.
-        :type startTime: int
-        :param endTime: The end time of the simulation.
-        :type endTime: int
         :param busStops: The list of bus stops to be used in the simulation.
         :type busStops: list[BusStop]
         :param timeTable: The timetable to be used in the simulation.
@@ -64,37 +89,32 @@ class Simulation:
         """
         from .models import Bus, BusStop
 
-        for busStop in busStops:
-            busStop.clear()
-
-        # initialize variables
-        Simulation.startTime = startTime
-        Simulation.currentTime = startTime
-        Simulation.endTime = endTime
-        eventCalendar = EventCalendar()
+        busStops = [busStop.copyForSimulation(self) for busStop in busStops]
         buses = []
 
         # populate event calendar with bus arrival events
+        events = []
         for time in timeTable.getAllTimes():
             # create bus
-            bus = Bus(busStops[0], vehicleCapacity, vehicleSeats)
+            bus = Bus(self, busStops[0], vehicleCapacity, vehicleSeats)
             buses.append(bus)
 
             # add bus arrival events
             for busStop in busStops:
-                eventCalendar.addEvent(Event(time + busStop.timeDeltaToArrive, bus.runBusStopSequence, busStop))
+                events.append(Event(time + busStop.timeDeltaToArrive, bus.runBusStopSequence, busStop))
+        self.eventCalendar.addEvents(events)
 
         # main simulation loop
-        while eventCalendar.isEmpty() == False:
+        while self.eventCalendar.isEmpty() == False:
             # get next event
-            event = eventCalendar.getNextEvent()
+            event = self.eventCalendar.getNextEvent()
 
             # check if event is beyond simulation time
-            if (event.time > Simulation.endTime):
+            if (event.time > self.endTime):
                 break
 
             # advance time
-            Simulation.forward(event.time)
+            self.forward(event.time)
 
             # execute event
             event()
@@ -113,11 +133,346 @@ class Simulation:
                 busStats.append(bus.stats)
 
         return Statistics(len(buses), busStopStats, busStats, "sk")
+
+    def simulateStopMajor(self, busStops, timeTable, vehicleCapacity: int, vehicleSeats: int, arrivalStreams: ArrivalStreams = None) -> Statistics:
+        """
+        Simulate the bus line without the event calendar and return the same statistics as the event-driven engine.
+        It is the multi-lane engine with a single lane, see simulateLanes.
+
+        :param busStops: The list of bus stops to be used in the simulation.
+        :type busStops: list[BusStop]
+        :param timeTable: The timetable to be used in the simulation.
+        :type timeTable: TimeTable
+        :param vehicleCapacity: The capacity of the vehicle.
+        :type vehicleCapacity: int
+        :param vehicleSeats: The number of seats in the vehicle.
+        :type vehicleSeats: int
+        :param arrivalStreams: The passenger arrivals shared with other simulations, defaults to None (arrivals are drawn from the random number generator of the simulation)
+        :type arrivalStreams: ArrivalStreams, optional
+        :return: The statistics of the simulation.
+        :rtype: Statistics
+        """
+        return self.simulateLanes(busStops, timeTable, vehicleCapacity, vehicleSeats, 1, arrivalStreams)[0]
+
+    def simulateLanes(self, busStops, timeTable, vehicleCapacity: int, vehicleSeats: int, numberOfLanes: int, arrivalStreams: ArrivalStreams = None, antithetic: bool = False) -> list[Statistics]:
+        """
+        Simulate independent replications (lanes) of the bus line at once, without the event calendar, and return the statistics of every lane.
+        On a single line without overtaking, a bus stop visit depends only on the load of the bus from its previous stop
+        and on the time the previous bus left the stop, because the stop is emptied by every bus.
+        So the bus stops are swept one by one in the order of the time to arrive, and each stop is simulated for all buses and all lanes at once,
+        as (lanes x buses) arrays with the buses in the order of their departures, which is the order in which the event calendar would process the visits.
+        The random numbers are drawn in a different order than by the event-driven engine, so the results have the same distribution, but are not the same for a fixed seed.
+        The loads and passenger satisfactions of a lane are collected in a single bus statistics for the whole fleet.
+        With antithetic lanes, the consecutive pairs of lanes draw the numbers of passengers by inversion of the poisson distribution from the uniform numbers u and 1 - u,
+        and mirror the arrival times of the passengers within the interval, so the results of a pair are negatively correlated and their mean has a lower variance.
+
+        :param busStops: The list of bus stops to be used in the simulation.
+        :type busStops: list[BusStop]
+        :param timeTable: The timetable to be used in the simulation.
+        :type timeTable: TimeTable
+        :param vehicleCapacity: The capacity of the vehicle.
+        :type vehicleCapacity: int
+        :param vehicleSeats: The number of seats in the vehicle.
+        :type vehicleSeats: int
+        :param numberOfLanes: The number of replications simulated at once.
+        :type numberOfLanes: int
+        :param arrivalStreams: The passenger arrivals shared with other simulations, defaults to None (arrivals are drawn from the random number generator of the simulation)
+        :type arrivalStreams: ArrivalStreams, optional
+        :param antithetic: Whether the consecutive pairs of lanes use antithetic random numbers, defaults to False
+        :type antithetic: bool, optional
+        :raises ValueError: If raw passenger satisfactions are kept, they are only collected by the event-driven engine, if shared arrivals are used by more than one lane,
+            or if antithetic lanes are used with shared arrivals or an odd number of lanes.
+        :return: The statistics of every lane.
+        :rtype: list[Statistics]
+        """
+        if BusStatistics.keepSamples:
+            raise ValueError("Raw passenger satisfactions are only kept by the event-driven engine")
+        if arrivalStreams is not None and numberOfLanes != 1:
+            raise ValueError("Shared passenger arrivals would make all lanes the same, they can be used only by a single lane")
+        if antithetic and (arrivalStreams is not None or numberOfLanes % 2 != 0):
+            raise ValueError("Antithetic lanes need an even number of lanes with their own passenger arrivals")
+
+        departures = np.sort(np.asarray(timeTable.getAllTimes(), dtype=np.int64), kind="stable")
+        lanes = np.arange(numberOfLanes)[:, np.newaxis]
+        loads = np.zeros((numberOfLanes, len(departures)), dtype=np.int64)
+        laneBusStats = [BusStatistics("Agregated", vehicleCapacity, vehicleSeats) for _ in range(numberOfLanes)]
+        laneBusStopStats = [[BusStopStatistics(busStop.name) for busStop in busStops] for _ in range(numberOfLanes)]
+        # passenger satisfactions of every lane, as the count, total, minimum and maximum
+        satisfactionCounts = np.zeros(numberOfLanes, dtype=np.int64)
+        satisfactionTotals = np.zeros(numberOfLanes)
+        satisfactionMinimums = np.full(numberOfLanes, np.inf)
+        satisfactionMaximums = np.full(numberOfLanes, -np.inf)
+
+        # sorting is stable, so stops with the same time to arrive are visited in the order of the list, like in the event calendar
+        for i in sorted(range(len(busStops)), key=lambda i: busStops[i].timeDeltaToArrive):
+            busStop = busStops[i]
+
+            # visits beyond the simulation time are not simulated, the departures are sorted so they are at the end
+            times = departures + busStop.timeDeltaToArrive
+            numberOfVisits = int(np.searchsorted(times, self.endTime, side="right"))
+            if numberOfVisits == 0:
+                continue
+            times = times[:numberOfVisits]
+            busLoads = loads[:, :numberOfVisits]
+            hours = times // 60 % 24
+            visitedHours = np.zeros(24, dtype=bool)
+            visitedHours[hours] = True
+            # index of the (lane, hour) pair of every visit, to sum the visits into per hour statistics of every lane
+            laneHours = lanes * 24 + hours
+
+            # passengers leaving the buses
+            numberOfLeavingPassengers = np.round(busLoads * busStop.leavingPassengersRate).astype(np.int64)
+            busLoads = np.maximum(0, busLoads - numberOfLeavingPassengers)
+
+            # passengers arrived since the previous bus, the waiting time for the first bus is restricted to 15 minutes
+            rates = np.zeros(24)
+            for hourRate in reversed(busStop.passengerArrivalRatesPerHour):
+                rates[hourRate.hour] = hourRate.rate / 60
+            previousTimes = np.concatenate(([self.startTime], times[:-1]))
+            intervalStarts = np.where(previousTimes == self.startTime, times - 15, previousTimes)
+            intervals = np.maximum(times - intervalStarts, 0)
+            if antithetic:
+                numberOfPassengers, visits, arrivalTimes = self.drawAntitheticArrivals(rates[hours] * intervals, intervalStarts, intervals, numberOfLanes)
+            elif arrivalStreams is None:
+                numberOfPassengers = self.rng.poisson(rates[hours] * intervals, (numberOfLanes, numberOfVisits))
+
+                # arrival times sorted within every visit, shifting the uniform samples by the visit index keeps the visits in order when sorting
+                visits = np.repeat(np.arange(numberOfLanes * numberOfVisits), numberOfPassengers.ravel())
+                fractions = np.sort(visits + self.rng.uniform(0, 1, len(visits))) - visits
+                arrivalTimes = intervalStarts[visits % numberOfVisits] + fractions * intervals[visits % numberOfVisits]
+            else:
+                numberOfPassengers, arrivalTimes = arrivalStreams.takeArrivals(i, hours, intervalStarts, times)
+                numberOfPassengers = numberOfPassengers[np.newaxis, :]
+                visits = np.repeat(np.arange(numberOfVisits), numberOfPassengers.ravel())
+            arrivalLaneHours = visits // numberOfVisits * 24 + (arrivalTimes // 60 % 24).astype(np.int64)
+            numberOfArrivedPassengers = np.bincount(arrivalLaneHours, minlength=numberOfLanes * 24).reshape(numberOfLanes, 24)
+
+            # passengers who have been waiting the longest board first
+            numberOfBoardingPassengers = np.minimum(numberOfPassengers, vehicleCapacity - busLoads)
+            firstPassengers = (np.cumsum(numberOfPassengers) - numberOfPassengers.ravel()).reshape(numberOfPassengers.shape)
+            cumulativeArrivalTimes = np.concatenate(([0.0], np.cumsum(arrivalTimes)))
+            timeSpentWaiting = numberOfBoardingPassengers * times - (cumulativeArrivalTimes[firstPassengers + numberOfBoardingPassengers] - cumulativeArrivalTimes[firstPassengers])
+            boarded = numberOfBoardingPassengers > 0
+            numberOfUnboardedPassengers = numberOfPassengers - numberOfBoardingPassengers
+            unboarded = numberOfUnboardedPassengers.sum(axis=1) > 0
+
+            # satisfaction of the boarding passengers, summed over the loads at which they board, unboarded passengers have zero satisfaction
+            if vehicleCapacity > vehicleSeats:
+                standingCapacity = vehicleCapacity - vehicleSeats
+                seated = np.clip(vehicleSeats - busLoads + 1, 0, numberOfBoardingPassengers)
+                standing = numberOfBoardingPassengers - seated
+                firstExcess = np.maximum(busLoads - vehicleSeats, 1)
+                lastExcess = busLoads + numberOfBoardingPassengers - 1 - vehicleSeats
+                satisfactions = numberOfBoardingPassengers - standing * (firstExcess + lastExcess) / 2 / standingCapacity
+                firstSatisfactions = 1 - np.maximum(busLoads - vehicleSeats, 0) / standingCapacity
+                lastSatisfactions = 1 - np.maximum(lastExcess, 0) / standingCapacity
+            else:
+                satisfactions = numberOfBoardingPassengers.astype(np.float64)
+                firstSatisfactions = lastSatisfactions = np.ones(busLoads.shape)
+            satisfactionCounts += numberOfPassengers.sum(axis=1)
+            satisfactionTotals += satisfactions.sum(axis=1)
+            satisfactionMinimums = np.minimum(satisfactionMinimums, np.where(boarded, lastSatisfactions, np.inf).min(axis=1))
+            satisfactionMaximums = np.maximum(satisfactionMaximums, np.where(boarded, firstSatisfactions, -np.inf).max(axis=1))
+            satisfactionMinimums[unboarded] = np.minimum(satisfactionMinimums[unboarded], 0)
+            satisfactionMaximums[unboarded] = np.maximum(satisfactionMaximums[unboarded], 0)
+
+            # loads of the buses leaving the stop
+            busLoads = busLoads + numberOfBoardingPassengers
+            loads[:, :numberOfVisits] = busLoads
+
+            # update statistics of every lane
+            numberOfDepartedPassengers = sumPerLaneAndHour(numberOfLeavingPassengers, laneHours, numberOfLanes)
+            numberOfPassengersLeftUnboarded = sumPerLaneAndHour(numberOfUnboardedPassengers, laneHours, numberOfLanes)
+            timeSpentWaitingPerHour = sumPerLaneAndHour(timeSpentWaiting, laneHours, numberOfLanes)
+            boardedHours = sumPerLaneAndHour(boarded, laneHours, numberOfLanes) > 0
+            numberOfTransportedPassengers = numberOfBoardingPassengers.sum(axis=1)
+            loadTotals = busLoads.sum(axis=1)
+            loadMinimums = busLoads.min(axis=1)
+            loadMaximums = busLoads.max(axis=1)
+            for lane in range(numberOfLanes):
+                stats = laneBusStopStats[lane][i]
+                stats.hourlyPassengersArrived.updateFromHistogram(numberOfArrivedPassengers[lane])
+                stats.hourlyPassengersDeparted.updateFromHistogram(numberOfDepartedPassengers[lane], visitedHours)
+                stats.hourlyPassengersLeftUnboarded.updateFromHistogram(numberOfPassengersLeftUnboarded[lane], visitedHours)
+                stats.hourlyTimeSpentWaiting.updateFromHistogram(timeSpentWaitingPerHour[lane], boardedHours[lane])
+                busStats = laneBusStats[lane]
+                busStats.updateTotalPassengersTransported(int(numberOfTransportedPassengers[lane]))
+                if busStop.name not in busStats.loads:
+                    busStats.loads[busStop.name] = RunningStatistic()
+                busStats.loads[busStop.name].combine(numberOfVisits, float(loadTotals[lane]), float(loadMinimums[lane]), float(loadMaximums[lane]), float(loadTotals[lane]) / numberOfVisits, 0.0)
+
+        # update statistics
+        statsList = []
+        for lane in range(numberOfLanes):
+            busStats = laneBusStats[lane]
+            if satisfactionCounts[lane] > 0:
+                busStats.passengerSatisfaction.combine(int(satisfactionCounts[lane]), float(satisfactionTotals[lane]), float(satisfactionMinimums[lane]), float(satisfactionMaximums[lane]), float(satisfactionTotals[lane] / satisfactionCounts[lane]), 0.0)
+            busStats.agregateTotal()
+            for stats in laneBusStopStats[lane]:
+                stats.agregateTotal()
+            statsList.append(Statistics(len(departures), laneBusStopStats[lane], [busStats], "sk"))
+        return statsList
+
+    def drawAntitheticArrivals(self, expectedPassengers: np.ndarray, intervalStarts: np.ndarray, intervals: np.ndarray, numberOfLanes: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Draw the passengers of the visits of a bus stop for antithetic pairs of lanes.
+        The even lanes invert the poisson distribution at the uniform numbers u, the odd lanes at 1 - u.
+        A pair shares the uniform numbers of the arrival times of the larger of its two numbers of passengers in a visit,
+        the even lane takes its first passengers at the times, the odd lane at the mirrored times, so every lane alone has the same distribution as an independent lane.
+
+        :param expectedPassengers: The expected number of passengers of every visit.
+        :type expectedPassengers: np.ndarray
+        :param intervalStarts: The start of the arrival interval of every visit.
+        :type intervalStarts: np.ndarray
+        :param intervals: The length of the arrival interval of every visit.
+        :type intervals: np.ndarray
+        :param numberOfLanes: The number of lanes, an even number.
+        :type numberOfLanes: int
+        :return: The number of passengers of every lane and visit, the index of the (lane, visit) of every passenger and the arrival times sorted within every visit.
+        :rtype: tuple[np.ndarray, np.ndarray, np.ndarray]
+        """
+        numberOfVisits = len(expectedPassengers)
+        uniforms = self.rng.uniform(0, 1, numberOfLanes // 2 * numberOfVisits).reshape(numberOfLanes // 2, numberOfVisits)
+        numberOfPassengers = poissonQuantiles(expectedPassengers, np.stack([uniforms, 1 - uniforms], axis=1).reshape(numberOfLanes, numberOfVisits))
+
+        # uniform numbers of the arrival times, grouped by the pair and visit
+        pairPassengers = np.maximum(numberOfPassengers[0::2], numberOfPassengers[1::2]).ravel()
+        pairFirstPassengers = np.repeat((np.cumsum(pairPassengers) - pairPassengers).reshape(numberOfLanes // 2, numberOfVisits), 2, axis=0).ravel()
+        timeUniforms = self.rng.uniform(0, 1, int(pairPassengers.sum()))
+
+        counts = numberOfPassengers.ravel()
+        visits = np.repeat(np.arange(numberOfLanes * numberOfVisits), counts)
+        firstPassengers = np.cumsum(counts) - counts
+        fractions = timeUniforms[np.arange(len(visits)) - firstPassengers[visits] + pairFirstPassengers[visits]]
+        fractions = np.where(visits // numberOfVisits % 2 == 1, 1 - fractions, fractions)
+        fractions = np.sort(visits + fractions) - visits
+        arrivalTimes = intervalStarts[visits % numberOfVisits] + fractions * intervals[visits % numberOfVisits]
+        return numberOfPassengers, visits, arrivalTimes
+
+    @staticmethod
+    def expectedPassengersArrived(startTime: int, endTime: int, busStops, timeTable) -> float:
+        """
+        Get the expected total number of passengers arriving at all bus stops in a simulation, it does not depend on the random numbers or the capacity of the vehicles.
+        The passengers of a visit arrive since the previous visit of the stop, or 15 minutes before the first visit, with the rate of the hour of the visit.
+
+        :param startTime: The start time of the simulation.
+        :type startTime: int
+        :param endTime: The end time of the simulation.
+        :type endTime: int
+        :param busStops: The list of bus stops.
+        :type busStops: list[BusStop]
+        :param timeTable: The timetable.
+        :type timeTable: TimeTable
+        :return: The expected number of arrived passengers.
+        :rtype: float
+        """
+        departures = np.sort(np.asarray(timeTable.getAllTimes(), dtype=np.int64))
+        expectedPassengers = 0.0
+        for busStop in busStops:
+            times = departures + busStop.timeDeltaToArrive
+            times = times[times <= endTime]
+            if len(times) == 0:
+                continue
+            rates = np.zeros(24)
+            for hourRate in reversed(busStop.passengerArrivalRatesPerHour):
+                rates[hourRate.hour] = hourRate.rate / 60
+            previousTimes = np.concatenate(([startTime], times[:-1]))
+            intervalStarts = np.where(previousTimes == startTime, times - 15, previousTimes)
+            expectedPassengers += float((rates[times // 60 % 24] * np.maximum(times - intervalStarts, 0)).sum())
+        return expectedPassengers
+
+    @staticmethod
+    def run(startTime: int, endTime: int, busStops, timeTable, vehicleCapacity: int, vehicleSeats: int, rng: RandomNumberGenerator = None, engine: Engine = Engine.EventDriven, arrivalStreams: ArrivalStreams = None) -> Statistics:
+        """
+        Run the simulation for a given time period in a new simulation context and return the statistics.
+
+        :param startTime: The start time of the simulation.
+        :type startTime: int
+        :param endTime: The end time of the simulation.
+        :type endTime: int
+        :param busStops: The list of bus stops to be used in the simulation.
+        :type busStops: list[BusStop]
+        :param timeTable: The timetable to be used in the simulation.
+        :type timeTable: TimeTable
+        :param vehicleCapacity: The capacity of the vehicle.
+        :type vehicleCapacity: int
+        :param vehicleSeats: The number of seats in the vehicle.
+        :type vehicleSeats: int
+        :param rng: The random number generator of the simulation, defaults to None (new unseeded generator)
+        :type rng: RandomNumberGenerator, optional
+        :param engine: The simulation engine, defaults to Engine.EventDriven
+        :type engine: Simulation.Engine, optional
+        :param arrivalStreams: The passenger arrivals shared with other simulations, defaults to None (arrivals are drawn from the random number generator)
+        :type arrivalStreams: ArrivalStreams, optional
+        :raises ValueError: If shared arrivals are used with the event-driven engine, which draws the arrivals itself.
+        :return: The statistics of the simulation.
+        :rtype: Statistics
+        """
+        simulation = Simulation(startTime, endTime, rng)
+        if engine in (Simulation.Engine.StopMajor, Simulation.Engine.MultiLane):
+            return simulation.simulateStopMajor(busStops, timeTable, vehicleCapacity, vehicleSeats, arrivalStreams)
+        if arrivalStreams is not None:
+            raise ValueError("Shared passenger arrivals are only used by the stop-major engine")
+        return simulation.simulate(busStops, timeTable, vehicleCapacity, vehicleSeats)
     
     @staticmethod
-    def runMultipleThanAverage(startTime: int, endTime: int, busStops, timeTable, vehicleCapacity: int, vehicleSeats: int, numberOfSimulations: int) -> Statistics:
+    def runMultiple(startTime: int, endTime: int, busStops, timeTable, vehicleCapacity: int, vehicleSeats: int, numberOfSimulations: int, seed=None, numberOfWorkers: int = 1, engine: Engine = Engine.EventDriven, antitheticVariates: bool = False) -> list[Statistics]:
+        """
+        Run multiple simulations and return the statistics of every simulation.
+        Every simulation gets an independent random number stream spawned from the root seed, so the results for a fixed seed are the same for any number of workers.
+        If more than one worker is configured, the simulations run in a pool of worker processes.
+        The multi-lane engine simulates all replications at once in this process, from a single random number stream of the root seed.
+
+        :param startTime: The start time of the simulation.
+        :type startTime: int
+        :param endTime: The end time of the simulation.
+        :type endTime: int
+        :param busStops: The list of bus stops to be used in the simulation.
+        :type busStops: list[BusStop]
+        :param timeTable: The timetable to be used in the simulation.
+        :type timeTable: TimeTable
+        :param vehicleCapacity: The capacity of the vehicle.
+        :type vehicleCapacity: int
+        :param vehicleSeats: The number of seats in the vehicle.
+        :type vehicleSeats: int
+        :param numberOfSimulations: The number of simulations to run.
+        :type numberOfSimulations: int
+        :param seed: The root seed of the random number streams of the simulations, defaults to None
+        :type seed: int | np.random.SeedSequence, optional
+        :param numberOfWorkers: The number of worker processes, defaults to 1 (simulations run one by one)
+        :type numberOfWorkers: int, optional
+        :param engine: The simulation engine, defaults to Engine.EventDriven
+        :type engine: Simulation.Engine, optional
+        :param antitheticVariates: Whether the consecutive pairs of replications use antithetic passenger arrivals, defaults to False
+        :type antitheticVariates: bool, optional
+        :raises ValueError: If antithetic replications are used with another engine than the multi-lane engine or with an odd number of simulations.
+        :return: The statistics of every simulation.
+        :rtype: list[Statistics]
+        """
+        if antitheticVariates and (engine != Simulation.Engine.MultiLane or numberOfSimulations % 2 != 0):
+            raise ValueError("Antithetic replications need the multi-lane engine and an even number of simulations")
+        seedSequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+
+        if engine == Simulation.Engine.MultiLane:
+            simulation = Simulation(startTime, endTime, RandomNumberGenerator(seedSequence))
+            return simulation.simulateLanes(busStops, timeTable, vehicleCapacity, vehicleSeats, numberOfSimulations, antithetic=antitheticVariates)
+
+        seeds = seedSequence.spawn(numberOfSimulations)
+        replication = partial(runReplication, startTime=startTime, endTime=endTime, busStops=busStops, timeTable=timeTable, vehicleCapacity=vehicleCapacity, vehicleSeats=vehicleSeats, engine=engine)
+        numberOfWorkers = min(numberOfWorkers, numberOfSimulations)
+        if numberOfWorkers > 1:
+            # one chunk per worker, so the bus stops and timetable are sent to each worker only once
+            chunkSize = -(-numberOfSimulations // numberOfWorkers)
+            with ProcessPoolExecutor(max_workers=numberOfWorkers) as pool:
+                return list(pool.map(replication, seeds, chunksize=chunkSize))
+        return [replication(seed) for seed in seeds]
+
+    @staticmethod
+    def runMultipleThanAverage(startTime: int, endTime: int, busStops, timeTable, vehicleCapacity: int, vehicleSeats: int, numberOfSimulations: int, seed: int = None, numberOfWorkers: int = 1, engine: Engine = Engine.EventDriven, antitheticVariates: bool = False, controlVariates: bool = False) -> Statistics:
         """
-        Run multiple simulations and return the average statistics.
+        Run multiple simulations and return the average statistics, see runMultiple.
+        The variance of the averages can be reduced by antithetic pairs of replications and by the expected number of arrived passengers as a control variate,
+        the variance reduction is reported by the distributions of the average statistics.
 
         :param startTime: The start time of the simulation.
         :type startTime: int
@@ -133,11 +488,173 @@ class Simulation:
         :type vehicleSeats: int
         :param numberOfSimulations: The number of simulations to run.
         :type numberOfSimulations: int
+        :param seed: The root seed of the random number streams of the simulations, defaults to None
+        :type seed: int, optional
+        :param numberOfWorkers: The number of worker processes, defaults to 1 (simulations run one by one)
+        :type numberOfWorkers: int, optional
+        :param engine: The simulation engine, defaults to Engine.EventDriven
+        :type engine: Simulation.Engine, optional
+        :param antitheticVariates: Whether the consecutive pairs of replications use antithetic passenger arrivals, defaults to False
+        :type antitheticVariates: bool, optional
+        :param controlVariates: Whether the expected number of arrived passengers is used as a control variate for the waiting time and the unboarded passengers, defaults to False
+        :type controlVariates: bool, optional
+        :raises ValueError: If antithetic replications are used with another engine than the multi-lane engine or with an odd number of simulations.
         :return: The statistics of the simulation.
         :rtype: Statistics
         """
+        statsList = Simulation.runMultiple(startTime, endTime, busStops, timeTable, vehicleCapacity, vehicleSeats, numberOfSimulations, seed, numberOfWorkers, engine, antitheticVariates)
+        expectedPassengersArrived = Simulation.expectedPassengersArrived(startTime, endTime, busStops, timeTable) if controlVariates else None
+        return averageStatistics(statsList, antitheticVariates, expectedPassengersArrived)
+
+    @staticmethod
+    def runUntilConfident(startTime: int, endTime: int, busStops, timeTable, vehicleCapacity: int, vehicleSeats: int, relativePrecision: float = 0.01, timeBudget: float = None, initialSimulations: int = 4, batchSize: int = 10, maximumSimulations: int = 1000, seed: int = None, numberOfWorkers: int = 1, engine: Engine = Engine.EventDriven, antitheticVariates: bool = False, controlVariates: bool = False) -> Statistics:
+        """
+        Run simulations in batches until the 95% confidence intervals of the key metrics are precise enough, and return the average statistics.
+        After every batch, the half-widths of the confidence intervals of the metrics in Simulation.confidenceMetrics are compared to their means,
+        so a quiet line stops after a few replications and a saturated line gets as many as it needs.
+        The simulations also stop when the maximum number of simulations is reached, or before a batch which would not fit into the time budget, estimated from the previous batches.
+        Every batch has its own random number stream spawned from the root seed and batches are never shortened,
+        so a result which did not stop on the time budget is the same for a fixed seed, whatever the speed of the machine.
+
+        :param startTime: The start time of the simulation.
+        :type startTime: int
+        :param endTime: The end time of the simulation.
+        :type endTime: int
+        :param busStops: The list of bus stops to be used in the simulation.
+        :type busStops: list[BusStop]
+        :param timeTable: The timetable to be used in the simulation.
+        :type timeTable: TimeTable
+        :param vehicleCapacity: The capacity of the vehicle.
+        :type vehicleCapacity: int
+        :param vehicleSeats: The number of seats in the vehicle.
+        :type vehicleSeats: int
+        :param relativePrecision: The largest allowed half-width of the confidence intervals relative to the means, defaults to 0.01
+        :type relativePrecision: float, optional
+        :param timeBudget: The time budget in seconds, defaults to None (no time limit)
+        :type timeBudget: float, optional
+        :param initialSimulations: The number of simulations of the first batch, defaults to 4
+        :type initialSimulations: int, optional
+        :param batchSize: The number of simulations of the following batches, defaults to 10
+        :type batchSize: int, optional
+        :param maximumSimulations: The largest number of simulations, defaults to 1000
+        :type maximumSimulations: int, optional
+        :param seed: The root seed of the random number streams of the simulations, defaults to None
+        :type seed: int, optional
+        :param numberOfWorkers: The number of worker processes, defaults to 1 (simulations run one by one)
+        :type numberOfWorkers: int, optional
+        :param engine: The simulation engine, defaults to Engine.EventDriven
+        :type engine: Simulation.Engine, optional
+        :param antitheticVariates: Whether the consecutive pairs of replications use antithetic passenger arrivals, defaults to False
+        :type antitheticVariates: bool, optional
+        :param controlVariates: Whether the expected number of arrived passengers is used as a control variate for the waiting time and the unboarded passengers, defaults to False
+        :type controlVariates: bool, optional
+        :raises ValueError: If antithetic replications are used with another engine than the multi-lane engine or with odd batches.
+        :return: The average statistics, numberOfReplications is the number of simulations run and stopReason is the Simulation.StopReason.
+        :rtype: Statistics
+        """
+        if antitheticVariates and (initialSimulations % 2 != 0 or batchSize % 2 != 0 or maximumSimulations % 2 != 0):
+            raise ValueError("Antithetic replications need even batches of simulations")
+        seedSequence = np.random.SeedSequence(seed)
+        expectedPassengersArrived = Simulation.expectedPassengersArrived(startTime, endTime, busStops, timeTable) if controlVariates else None
+        startedAt = time.perf_counter()
+
         statsList = []
-        for i in range(numberOfSimulations):
-            stats = Simulation.run(startTime, endTime, busStops, timeTable, vehicleCapacity, vehicleSeats)
-            statsList.append(stats)
-        return averageStatistics(statsList)
\ No newline at end of file
+        numberOfSimulations = min(initialSimulations, maximumSimulations)
+        while True:
+            statsList += Simulation.runMultiple(startTime, endTime, busStops, timeTable, vehicleCapacity, vehicleSeats, numberOfSimulations, seedSequence.spawn(1)[0], numberOfWorkers, engine, antitheticVariates)
+            averageStat = averageStatistics(statsList, antitheticVariates, expectedPassengersArrived)
+            if Simulation.isConfident(averageStat, relativePrecision):
+                averageStat.stopReason = Simulation.StopReason.Confident
+                return averageStat
+            if len(statsList) >= maximumSimulations:
+                averageStat.stopReason = Simulation.StopReason.MaximumReached
+                return averageStat
+
+            numberOfSimulations = min(batchSize, maximumSimulations - len(statsList))
+            if timeBudget is not None:
+                elapsed = time.perf_counter() - startedAt
+                if elapsed + numberOfSimulations * elapsed / len(statsList) > timeBudget:
+                    averageStat.stopReason = Simulation.StopReason.TimeBudget
+                    return averageStat
+
+    @staticmethod
+    def isConfident(averageStat: Statistics, relativePrecision: float) -> bool:
+        """
+        Check whether the confidence intervals of all metrics in Simulation.confidenceMetrics are precise enough.
+
+        :param averageStat: The average statistics.
+        :type averageStat: Statistics
+        :param relativePrecision: The largest allowed half-width of the confidence intervals relative to the means.
+        :type relativePrecision: float
+        :return: True if all confidence intervals are precise enough.
+        :rtype: bool
+        """
+        return all(averageStat.distributions[name].isPrecise(relativePrecision, absoluteTolerance) for name, absoluteTolerance in Simulation.confidenceMetrics.items())
+
+def runReplication(seed, startTime: int, endTime: int, busStops, timeTable, vehicleCapacity: int, vehicleSeats: int, engine: 'Simulation.Engine' = Simulation.Engine.EventDriven) -> 'Statistics':
+    """
+    Run one replication of the simulation with its own random number stream. Used by the worker processes of multiple simulations.
+
+    :param seed: The seed of the random number generator of the replication.
+    :type seed: int | np.random.SeedSequence | None
+    :param startTime: The start time of the simulation.
+    :type startTime: int
+    :param endTime: The end time of the simulation.
+    :type endTime: int
+    :param busStops: The list of bus stops to be used in the simulation.
+    :type busStops: list[BusStop]
+    :param timeTable: The timetable to be used in the simulation.
+    :type timeTable: TimeTable
+    :param vehicleCapacity: The capacity of the vehicle.
+    :type vehicleCapacity: int
+    :param vehicleSeats: The number of seats in the vehicle.
+    :type vehicleSeats: int
+    :param engine: The simulation engine, defaults to Simulation.Engine.EventDriven
+    :type engine: Simulation.Engine, optional
+    :return: The statistics of the replication.
+    :rtype: Statistics
+    """
+    return Simulation.run(startTime, endTime, busStops, timeTable, vehicleCapacity, vehicleSeats, RandomNumberGenerator(seed), engine)
+
+def poissonQuantiles(means: np.ndarray, uniforms: np.ndarray) -> np.ndarray:
+    """
+    Invert the poisson distribution, get the smallest number of events whose cumulative probability is at least the uniform number.
+    The cumulative probabilities of all means are tabulated once, shifted by the index of the mean and flattened, so a single sorted search inverts all uniform numbers.
+
+    :param means: The expected number of events of every column.
+    :type means: np.ndarray
+    :param uniforms: The uniform numbers from [0, 1), as a (rows x columns) array.
+    :type uniforms: np.ndarray
+    :return: The numbers of events, as a (rows x columns) array.
+    :rtype: np.ndarray
+    """
+    means = np.asarray(means, dtype=np.float64)
+    if len(means) == 0:
+        return np.zeros(uniforms.shape, dtype=np.int64)
+    # the probability beyond ten standard deviations is negligible
+    largestMean = float(means.max())
+    numberOfCounts = int(np.ceil(largestMean + 10 * np.sqrt(largestMean))) + 11
+    counts = np.arange(numberOfCounts)
+    logFactorials = np.concatenate(([0.0], np.cumsum(np.log(np.arange(1, numberOfCounts)))))
+    logMeans = np.log(np.maximum(means, np.finfo(np.float64).tiny))
+    cumulativeProbabilities = np.cumsum(np.exp(counts * logMeans[:, np.newaxis] - means[:, np.newaxis] - logFactorials), axis=1)
+    cumulativeProbabilities[:, -1] = 1.0
+    columns = np.arange(len(means))
+    shiftedProbabilities = (cumulativeProbabilities + columns[:, np.newaxis]).ravel()
+    return np.searchsorted(shiftedProbabilities, uniforms + columns, side="left") - columns * numberOfCounts
+
+def sumPerLaneAndHour(values: np.ndarray, laneHours: np.ndarray, numberOfLanes: int) -> np.ndarray:
+    """
+    Sum the values of the bus stop visits of every lane by the hour of the visit.
+
+    :param values: The values of the visits, as a (lanes x visits) array.
+    :type values: np.ndarray
+    :param laneHours: The index of the lane and hour of every visit (lane * 24 + hour), as an array broadcastable to the values.
+    :type laneHours: np.ndarray
+    :param numberOfLanes: The number of lanes.
+    :type numberOfLanes: int
+    :return: The sums, as a (lanes x 24) array.
+    :rtype: np.ndarray
+    """
+    laneHours = np.broadcast_to(laneHours, values.shape)
+    return np.bincount(laneHours.ravel(), weights=values.ravel(), minlength=numberOfLanes * 24).reshape(numberOfLanes, 24)
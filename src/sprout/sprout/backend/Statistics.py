@@ -4,48 +4,200 @@ This file contains the Statistics class, which is used to gather information dur
 :author: Lukas Katona
 """
 
+from functools import partial
 import matplotlib.pyplot as plt
 import numpy as np
 
-def averageStatistics(statsList: list['Statistics']) -> 'Statistics':
+# 0.975 quantiles of the student t distribution for 1 to 30 degrees of freedom, used for 95% confidence intervals
+STUDENT_T_975 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+def averageStatistics(statsList: list['Statistics'], antitheticPairs: bool = False, expectedPassengersArrived: float = None) -> 'Statistics':
     """
     Calculate the average statistics from a list of statistics.
+    The results of all runs are stacked into (runs x hours) matrices, so the mean, standard deviation, confidence interval and percentiles are calculated for all hours at once.
+    Their distributions are available in the hourlyDistributions of the bus stop statistics and in the distributions of the average statistics.
+    If the expected number of arrived passengers is given, it is used as a control variate for the total waiting time and the total number of passengers left unboarded,
+    and the totals of the average statistics are the adjusted estimates.
 
     :param statsList: List of statistics to be averaged.
     :type statsList: list[Statistics]
+    :param antitheticPairs: Whether the consecutive pairs of runs use antithetic random numbers, so only the means of the pairs are independent, defaults to False
+    :type antitheticPairs: bool, optional
+    :param expectedPassengersArrived: The expected total number of arrived passengers of a run, defaults to None (no control variate)
+    :type expectedPassengersArrived: float, optional
     :return: The average statistics.
     :rtype: Statistics
     """
+    groupSize = 2 if antitheticPairs else 1
     averageStat = Statistics()
     averageStat.language = statsList[0].language
+    averageStat.numberOfReplications = len(statsList)
     averageStat.totalNumberOfBuses = sum([x.totalNumberOfBuses for x in statsList]) / len(statsList)
     averageBusStopStat = BusStopStatistics("Agregated", statsList[0].language)
     averageBusStat = BusStatistics("Agregated", statsList[0].busStatistics.capacity, statsList[0].busStatistics.seats, statsList[0].language)
 
-    for i in range(len(statsList[0].busStopStatistics.passengersArrivedPerHour)):
-        averageBusStopStat.passengersArrivedPerHour.append((statsList[0].busStopStatistics.passengersArrivedPerHour[i][0], int(sum([x.busStopStatistics.passengersArrivedPerHour[i][1] for x in statsList]) / len(statsList))))
-    for i in range(len(statsList[0].busStopStatistics.passengersDepartedPerHour)):
-        averageBusStopStat.passengersDepartedPerHour.append((statsList[0].busStopStatistics.passengersDepartedPerHour[i][0], int(sum([x.busStopStatistics.passengersDepartedPerHour[i][1] for x in statsList]) / len(statsList))))
-    for i in range(len(statsList[0].busStopStatistics.passengersLeftUnboardedPerHour)):
-        averageBusStopStat.passengersLeftUnboardedPerHour.append((statsList[0].busStopStatistics.passengersLeftUnboardedPerHour[i][0], int(sum([x.busStopStatistics.passengersLeftUnboardedPerHour[i][1] for x in statsList]) / len(statsList))))
-    for i in range(len(statsList[0].busStopStatistics.timeSpentWaitingPerHour)):
-        averageBusStopStat.timeSpentWaitingPerHour.append((statsList[0].busStopStatistics.timeSpentWaitingPerHour[i][0], int(sum([x.busStopStatistics.timeSpentWaitingPerHour[i][1] for x in statsList]) / len(statsList))))
+    for name in BusStopStatistics.hourlyStatisticNames:
+        hourlyStatistics = [getattr(x.busStopStatistics, name) for x in statsList]
+        distribution = Distribution(np.stack([hourlyStatistic.values for hourlyStatistic in hourlyStatistics]), groupSize)
+        averageHourlyStatistic = getattr(averageBusStopStat, name)
+        averageHourlyStatistic.values[:] = np.trunc(distribution.mean)
+        averageHourlyStatistic.updated[:] = np.any([hourlyStatistic.updated for hourlyStatistic in hourlyStatistics], axis=0)
+        averageBusStopStat.hourlyDistributions[name] = distribution
+    waitingPerHour = np.stack([x.busStopStatistics.hourlyTimeSpentWaiting.values for x in statsList])
+    arrivedPerHour = np.stack([x.busStopStatistics.hourlyPassengersArrived.values for x in statsList])
+    averageBusStopStat.hourlyDistributions["averageTimeSpentWaiting"] = Distribution(np.divide(waitingPerHour, arrivedPerHour, out=np.zeros_like(waitingPerHour), where=arrivedPerHour > 0), groupSize)
     averageBusStopStat.agregateTotal()
+
+    totalPassengersArrived = np.array([x.busStopStatistics.totalPassengersArrived for x in statsList], dtype=np.float64)
+    totalTimeSpentWaiting = np.array([x.busStopStatistics.totalTimeSpentWaiting for x in statsList], dtype=np.float64)
+    # the number of arrived passengers is the control variate, more arrivals mean longer waiting and more unboarded passengers
+    controlSamples = totalPassengersArrived if expectedPassengersArrived is not None else None
+    controlled = partial(Distribution, groupSize=groupSize, controlSamples=controlSamples, controlMean=expectedPassengersArrived)
+    averageStat.distributions = {
+        "totalPassengersArrived": Distribution(totalPassengersArrived, groupSize),
+        "totalPassengersLeftUnboarded": controlled(np.array([x.busStopStatistics.totalPassengersLeftUnboarded for x in statsList], dtype=np.float64)),
+        "totalTimeSpentWaiting": controlled(totalTimeSpentWaiting),
+        "averageTimeSpentWaiting": controlled(np.divide(totalTimeSpentWaiting, totalPassengersArrived, out=np.zeros_like(totalTimeSpentWaiting), where=totalPassengersArrived > 0)),
+        "averagePassengerSatisfaction": Distribution(np.array([x.averagePassengerSatisfaction for x in statsList], dtype=np.float64), groupSize),
+        "averageLoad": Distribution(np.array([x.busStatistics.averageLoad for x in statsList], dtype=np.float64), groupSize),
+    }
+    if expectedPassengersArrived is not None:
+        averageBusStopStat.totalPassengersLeftUnboarded = int(round(float(averageStat.distributions["totalPassengersLeftUnboarded"].mean)))
+        averageBusStopStat.totalTimeSpentWaiting = float(averageStat.distributions["totalTimeSpentWaiting"].mean)
     averageBusStopStat.totalPassengersDeparted = averageBusStopStat.totalPassengersArrived - averageBusStopStat.totalPassengersLeftUnboarded
     averageStat.busStopStatistics = averageBusStopStat
     
     averageBusStat.totalPassengersTransported = averageBusStopStat.totalPassengersDeparted
-    for i in range(len(statsList[0].busStatistics.loadPerBusStop)):
-        averageBusStat.loadPerBusStop.append((statsList[0].busStatistics.loadPerBusStop[i][0], int(sum([x.busStatistics.loadPerBusStop[i][1] for x in statsList]) / len(statsList))))
-    for i in range(len(statsList[0].busStatistics.loadInPercentPerBusStop)):
-        averageBusStat.loadInPercentPerBusStop.append((statsList[0].busStatistics.loadInPercentPerBusStop[i][0], sum([x.busStatistics.loadInPercentPerBusStop[i][1] for x in statsList]) / len(statsList)))
+    busStopNames = list(statsList[0].busStatistics.loads.keys())
+    loads = Distribution(np.array([[x.busStatistics.loads[busStopName].average() for busStopName in busStopNames] for x in statsList]), groupSize)
+    for busStopName, load in zip(busStopNames, loads.mean):
+        averageBusStat.updateLoadPerBusStop(int(load), busStopName)
     averageBusStat.agregateTotal()
     averageStat.busStatistics = averageBusStat
     
     averageStat.averagePassengerSatisfaction = sum([x.averagePassengerSatisfaction for x in statsList]) / len(statsList)
+    averageStat.distributions["loadPerBusStop"] = loads
     
     return averageStat
 
+class Distribution:
+    # INIT
+    def __init__(self, samples: np.ndarray, groupSize: int = 1, controlSamples: np.ndarray = None, controlMean: float = None):
+        # samples of the replications are stacked along the first axis
+        self.samples = np.asarray(samples, dtype=np.float64)
+        self.count = self.samples.shape[0]
+        self.std = self.samples.std(axis=0, ddof=1) if self.count > 1 else np.zeros(self.samples.shape[1:])
+        self.percentiles = dict(zip([5, 50, 95], np.percentile(self.samples, [5, 50, 95], axis=0)))
+
+        # independent estimates of the mean, the averages of the groups of correlated (antithetic) replications, adjusted by the control variate
+        estimates = Distribution.groupMeans(self.samples, groupSize)
+        degreesOfFreedom = len(estimates) - 1
+        if controlSamples is not None:
+            estimates = Distribution.controlledEstimates(estimates, Distribution.groupMeans(controlSamples, groupSize), controlMean)
+            degreesOfFreedom -= 1
+        self.numberOfEstimates = len(estimates)
+        self.mean = estimates.mean(axis=0)
+        estimatesStd = estimates.std(axis=0, ddof=1) if self.numberOfEstimates > 1 else np.zeros_like(self.mean)
+        if degreesOfFreedom < 1:
+            # too few estimates to tell anything about the spread of the mean
+            self.confidenceInterval = np.full_like(self.mean, np.inf)
+        else:
+            self.confidenceInterval = Distribution.studentT975(degreesOfFreedom) * estimatesStd / np.sqrt(self.numberOfEstimates)
+        # variance of the mean of independent replications divided by the variance of the mean of the estimates,
+        # the same confidence interval is reached with 1 / varianceReduction of the replications
+        with np.errstate(divide="ignore", invalid="ignore"):
+            varianceReduction = np.where(estimatesStd > 0, (self.std ** 2 / self.count) / (estimatesStd ** 2 / self.numberOfEstimates), 1.0)
+        self.varianceReduction = varianceReduction if varianceReduction.ndim > 0 else float(varianceReduction)
+
+    # METHODS
+    @staticmethod
+    def studentT975(degreesOfFreedom: int) -> float:
+        """
+        Get the 0.975 quantile of the student t distribution, used for the 95% confidence interval.
+
+        :param degreesOfFreedom: Degrees of freedom.
+        :type degreesOfFreedom: int
+        :return: The quantile, infinity for zero degrees of freedom and the normal quantile for more than 30 degrees of freedom.
+        :rtype: float
+        """
+        if degreesOfFreedom < 1:
+            return float('inf')
+        if degreesOfFreedom <= len(STUDENT_T_975):
+            return STUDENT_T_975[degreesOfFreedom - 1]
+        return 1.96
+
+    @staticmethod
+    def groupMeans(samples: np.ndarray, groupSize: int) -> np.ndarray:
+        """
+        Average the consecutive groups of samples along the first axis.
+
+        :param samples: The samples of the replications.
+        :type samples: np.ndarray
+        :param groupSize: The number of consecutive samples in a group.
+        :type groupSize: int
+        :raises ValueError: If the number of samples is not divisible by the size of the group.
+        :return: The averages of the groups.
+        :rtype: np.ndarray
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        if groupSize == 1:
+            return samples
+        if samples.shape[0] % groupSize != 0:
+            raise ValueError(f"{samples.shape[0]} samples can not be split into groups of {groupSize}")
+        return samples.reshape((-1, groupSize) + samples.shape[1:]).mean(axis=1)
+
+    @staticmethod
+    def controlledEstimates(estimates: np.ndarray, controls: np.ndarray, controlMean: float) -> np.ndarray:
+        """
+        Adjust the estimates by a control variate with a known mean.
+        The estimates are corrected by the deviation of the control from its mean, multiplied by the regression coefficient of the estimates on the control,
+        which removes the part of the variance of the estimates explained by the control.
+
+        :param estimates: The estimates, stacked along the first axis.
+        :type estimates: np.ndarray
+        :param controls: The value of the control for every estimate.
+        :type controls: np.ndarray
+        :param controlMean: The known mean of the control.
+        :type controlMean: float
+        :return: The adjusted estimates.
+        :rtype: np.ndarray
+        """
+        controls = np.asarray(controls, dtype=np.float64)
+        centeredControls = controls - controls.mean()
+        controlVariance = centeredControls @ centeredControls
+        if controlVariance == 0:
+            return estimates
+        centeredEstimates = (estimates - estimates.mean(axis=0)).reshape(len(estimates), -1)
+        coefficients = (centeredControls @ centeredEstimates / controlVariance).reshape(estimates.shape[1:])
+        deviations = (controls - controlMean).reshape((-1,) + (1,) * (estimates.ndim - 1))
+        return estimates - coefficients * deviations
+
+    def relativeConfidenceInterval(self) -> np.ndarray | float:
+        """
+        Get the half-width of the 95% confidence interval relative to the absolute value of the mean.
+
+        :return: The relative half-width, 0 where both the mean and the half-width are 0, infinity where only the mean is 0.
+        :rtype: np.ndarray | float
+        """
+        mean = np.abs(self.mean)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            relative = np.where(mean > 0, self.confidenceInterval / mean, np.where(self.confidenceInterval > 0, np.inf, 0.0))
+        return relative if relative.ndim > 0 else float(relative)
+
+    def isPrecise(self, relativePrecision: float, absoluteTolerance: float = 0.0) -> bool:
+        """
+        Check whether the half-width of the 95% confidence interval is small enough in every element,
+        either relative to the absolute value of the mean, or in absolute terms, which is needed for means close to zero.
+
+        :param relativePrecision: The largest allowed half-width relative to the mean.
+        :type relativePrecision: float
+        :param absoluteTolerance: The largest allowed half-width regardless of the mean, defaults to 0.0
+        :type absoluteTolerance: float, optional
+        :return: True if the confidence interval is small enough in every element.
+        :rtype: bool
+        """
+        return bool(np.all((self.relativeConfidenceInterval() <= relativePrecision) | (self.confidenceInterval <= absoluteTolerance)))
+
 def keyValuePairArrayToString(keyValuePairArray: list[tuple[str | int, int | float]]) -> str:
     """
     Convert a list of key-value pairs to a string.
@@ -62,6 +214,11 @@ class Statistics:
     def __init__(self, totalNumberOfBuses=0, busStopStatistics=None, busStatistics=None, language="en"):
         self.totalNumberOfBuses = totalNumberOfBuses
         self.language = language
+        # number of averaged replications and distributions of the total statistics over them, only filled by averageStatistics
+        self.numberOfReplications = 1
+        self.distributions = {}
+        # reason why the adaptive replications stopped (Simulation.StopReason), only filled by Simulation.runUntilConfident
+        self.stopReason = None
         if busStopStatistics is None:
             busStopStatistics = []
         else:
@@ -71,7 +228,7 @@ class Statistics:
             self.averagePassengerSatisfaction = 0
         else:
             self.busStatistics = self.agregateBusStatistics(busStatistics)
-            self.averagePassengerSatisfaction = sum(self.busStatistics.passengerSatisfactions)/len(self.busStatistics.passengerSatisfactions)
+            self.averagePassengerSatisfaction = self.busStatistics.passengerSatisfaction.average()
         
     # METHODS
     def agregateBusStopStatistics(self, busStopStatistics: list['BusStopStatistics']) -> 'BusStopStatistics':
@@ -85,14 +242,7 @@ class Statistics:
         """
         busStopStatisticsAgregated = BusStopStatistics("Agregated", self.language)
         for busStop in busStopStatistics:
-            for hourValuePair in busStop.passengersArrivedPerHour:
-                busStopStatisticsAgregated.updatePassengersArrivedPerHour(hourValuePair[1], hourValuePair[0])
-            for hourValuePair in busStop.passengersDepartedPerHour:
-                busStopStatisticsAgregated.updatePassengersDepartedPerHour(hourValuePair[1], hourValuePair[0])
-            for hourValuePair in busStop.passengersLeftUnboardedPerHour:
-                busStopStatisticsAgregated.updatePassengersLeftUnboardedPerHour(hourValuePair[1], hourValuePair[0])
-            for hourValuePair in busStop.timeSpentWaitingPerHour:
-                busStopStatisticsAgregated.updateTimeSpentWaitingPerHour(hourValuePair[1], hourValuePair[0])
+            busStopStatisticsAgregated.merge(busStop)
         busStopStatisticsAgregated.agregateTotal()
         return busStopStatisticsAgregated
 
@@ -106,18 +256,8 @@ class Statistics:
         :rtype: BusStatistics
         """
         busStatisticsAgregated = BusStatistics("Agregated", busStatistics[0].capacity, busStatistics[0].seats, self.language)
-        loadPerBusStop = {}
         for bus in busStatistics:
-            for nameValuePair in bus.loadPerBusStop:
-                if nameValuePair[0] not in loadPerBusStop:
-                    loadPerBusStop[nameValuePair[0]] = []
-                loadPerBusStop[nameValuePair[0]].append(nameValuePair[1])
-            busStatisticsAgregated.updateTotalPassengersTransported(bus.totalPassengersTransported)
-            busStatisticsAgregated.passengerSatisfactions += bus.passengerSatisfactions
-        
-        for busStopName, loads in loadPerBusStop.items():
-            averageLoad = sum(loads) / len(loads)
-            busStatisticsAgregated.updateLoadPerBusStop(averageLoad, busStopName)
+            busStatisticsAgregated.merge(bus)
         
         busStatisticsAgregated.agregateTotal()
         return busStatisticsAgregated
@@ -150,8 +290,194 @@ class Statistics:
                 f"Bus statistics:\n{self.busStatistics}\n" + \
                 "================================================================\n")
 
+# ------------------------------ PER HOUR ------------------------------
+class HourlyStatistic:
+    # INIT
+    def __init__(self, dtype=np.int64):
+        # value for every hour of the day and whether the hour was ever updated
+        self.values = np.zeros(24, dtype=dtype)
+        self.updated = np.zeros(24, dtype=bool)
+
+    # METHODS
+    def update(self, value: int | float, hour: int):
+        """
+        Add the value to the given hour.
+
+        :param value: The value to be added.
+        :type value: int | float
+        :param hour: The hour of the day (0-23).
+        :type hour: int
+        """
+        hour = int(hour)
+        self.values[hour] += value
+        self.updated[hour] = True
+
+    def updateFromHistogram(self, values, updated=None):
+        """
+        Add the values to all hours at once.
+
+        :param values: The values to be added, indexed by hour (0-23).
+        :type values: np.ndarray | list[int | float]
+        :param updated: Which hours are marked as updated, indexed by hour (0-23), defaults to None (hours with nonzero value)
+        :type updated: np.ndarray | list[bool], optional
+        """
+        values = np.asarray(values)
+        self.values += values.astype(self.values.dtype)
+        self.updated |= values != 0 if updated is None else np.asarray(updated, dtype=bool)
+
+    def merge(self, other: 'HourlyStatistic'):
+        """
+        Add all values of the other hourly statistic.
+
+        :param other: The hourly statistic to be added.
+        :type other: HourlyStatistic
+        """
+        self.values += other.values.astype(self.values.dtype)
+        self.updated |= other.updated
+
+    def total(self) -> int | float:
+        """
+        Get the sum of the values over all hours.
+
+        :return: The sum of the values.
+        :rtype: int | float
+        """
+        return self.values.sum().item()
+
+    def toList(self) -> list[tuple[int, int | float]]:
+        """
+        Get the updated hours as a list of (hour, value) pairs, ordered by hour.
+
+        :return: The list of (hour, value) pairs.
+        :rtype: list[tuple[int, int | float]]
+        """
+        return [(int(hour), self.values[hour].item()) for hour in np.flatnonzero(self.updated)]
+
+    # CLEAR
+    def clear(self):
+        """
+        Clear the values of all hours.
+        """
+        self.values[:] = 0
+        self.updated[:] = False
+
+# ------------------------------ RUNNING ------------------------------
+class RunningStatistic:
+    # INIT
+    def __init__(self, trackVariance=False):
+        self.trackVariance = trackVariance
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float('inf')
+        self.maximum = float('-inf')
+        # Welford's running mean and sum of squared differences from the mean, only used if the variance is tracked
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    # METHODS
+    def update(self, value: float, count: int = 1):
+        """
+        Add the value to the statistic, the given number of times.
+
+        :param value: The value to be added.
+        :type value: float
+        :param count: How many times the value is added, defaults to 1
+        :type count: int, optional
+        """
+        if count <= 0:
+            return
+        self.combine(count, value * count, value, value, value, 0.0)
+
+    def updateFromArray(self, values):
+        """
+        Add all values of the array to the statistic.
+
+        :param values: The values to be added.
+        :type values: np.ndarray | list[float]
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        mean = values.mean() if self.trackVariance else 0.0
+        m2 = float(np.sum((values - mean) ** 2)) if self.trackVariance else 0.0
+        self.combine(len(values), float(values.sum()), float(values.min()), float(values.max()), float(mean), m2)
+
+    def merge(self, other: 'RunningStatistic'):
+        """
+        Add all values of the other running statistic.
+
+        :param other: The running statistic to be added.
+        :type other: RunningStatistic
+        """
+        if other.count == 0:
+            return
+        self.combine(other.count, other.total, other.minimum, other.maximum, other.mean, other.m2)
+
+    def combine(self, count: int, total: float, minimum: float, maximum: float, mean: float, m2: float):
+        """
+        Combine the statistic with the summary of another group of values, using the parallel variant of Welford's algorithm for the variance.
+
+        :param count: Number of values in the group.
+        :type count: int
+        :param total: Sum of the values in the group.
+        :type total: float
+        :param minimum: Minimum of the values in the group.
+        :type minimum: float
+        :param maximum: Maximum of the values in the group.
+        :type maximum: float
+        :param mean: Mean of the values in the group.
+        :type mean: float
+        :param m2: Sum of squared differences from the mean of the group.
+        :type m2: float
+        """
+        if self.trackVariance:
+            newCount = self.count + count
+            delta = mean - self.mean
+            self.mean += delta * count / newCount
+            self.m2 += m2 + delta * delta * self.count * count / newCount
+        self.count += count
+        self.total += total
+        self.minimum = min(self.minimum, minimum)
+        self.maximum = max(self.maximum, maximum)
+
+    def average(self) -> float:
+        """
+        Get the average of the values.
+
+        :return: The average, 0 if there are no values.
+        :rtype: float
+        """
+        return self.total / self.count if self.count > 0 else 0
+
+    def variance(self) -> float:
+        """
+        Get the sample variance of the values.
+
+        :raises ValueError: If the variance is not tracked.
+        :return: The sample variance, 0 if there are less than two values.
+        :rtype: float
+        """
+        if not self.trackVariance:
+            raise ValueError("Variance is not tracked by this statistic")
+        return self.m2 / (self.count - 1) if self.count > 1 else 0
+
+    # CLEAR
+    def clear(self):
+        """
+        Clear the statistic.
+        """
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float('inf')
+        self.maximum = float('-inf')
+        self.mean = 0.0
+        self.m2 = 0.0
+
 # ------------------------------ BUSSTOP ------------------------------
 class BusStopStatistics:
+    # Static names of the per hour statistics
+    hourlyStatisticNames = ["hourlyPassengersArrived", "hourlyPassengersDeparted", "hourlyPassengersLeftUnboarded", "hourlyTimeSpentWaiting"]
+
     # INIT
     def __init__(self, name, language="en"):
         self.name = name
@@ -162,12 +488,42 @@ class BusStopStatistics:
         self.totalPassengersLeftUnboarded = 0
         self.totalTimeSpentWaiting = 0
         # per hour
-        self.passengersArrivedPerHour = []
-        self.passengersDepartedPerHour = []
-        self.passengersLeftUnboardedPerHour = []
-        self.timeSpentWaitingPerHour = []
+        self.hourlyPassengersArrived = HourlyStatistic()
+        self.hourlyPassengersDeparted = HourlyStatistic()
+        self.hourlyPassengersLeftUnboarded = HourlyStatistic()
+        self.hourlyTimeSpentWaiting = HourlyStatistic(np.float64)
+        # distributions of the per hour statistics over replications, only filled by averageStatistics
+        self.hourlyDistributions = {}
 
     # PER HOUR
+    @property
+    def passengersArrivedPerHour(self) -> list[tuple[int, int]]:
+        """
+        Number of passengers arrived per hour, as a list of (hour, value) pairs.
+        """
+        return self.hourlyPassengersArrived.toList()
+
+    @property
+    def passengersDepartedPerHour(self) -> list[tuple[int, int]]:
+        """
+        Number of passengers departed per hour, as a list of (hour, value) pairs.
+        """
+        return self.hourlyPassengersDeparted.toList()
+
+    @property
+    def passengersLeftUnboardedPerHour(self) -> list[tuple[int, int]]:
+        """
+        Number of passengers left unboarded per hour, as a list of (hour, value) pairs.
+        """
+        return self.hourlyPassengersLeftUnboarded.toList()
+
+    @property
+    def timeSpentWaitingPerHour(self) -> list[tuple[int, float]]:
+        """
+        Time spent waiting per hour (in minutes), as a list of (hour, value) pairs.
+        """
+        return self.hourlyTimeSpentWaiting.toList()
+
     def updatePassengersArrivedPerHour(self, passengersArrived: int, hour: int):
         """
         Update the number of passengers arrived per hour.
@@ -177,11 +533,16 @@ class BusStopStatistics:
         :param hour: The hour of the day (0-23).
         :type hour: int
         """
-        for i in range(len(self.passengersArrivedPerHour)):
-            if self.passengersArrivedPerHour[i][0] == hour:
-                self.passengersArrivedPerHour[i] = (hour, self.passengersArrivedPerHour[i][1] + passengersArrived)
-                return
-        self.passengersArrivedPerHour.append((hour, passengersArrived))
+        self.hourlyPassengersArrived.update(passengersArrived, hour)
+
+    def updatePassengersArrivedPerHourFromHistogram(self, passengersArrivedPerHour):
+        """
+        Update the number of passengers arrived per hour for all hours at once.
+
+        :param passengersArrivedPerHour: The number of passengers arrived in each hour of the day, indexed by hour (0-23).
+        :type passengersArrivedPerHour: np.ndarray | list[int]
+        """
+        self.hourlyPassengersArrived.updateFromHistogram(passengersArrivedPerHour)
 
     def updatePassengersDepartedPerHour(self, passengersDeparted: int, hour: int):
         """
@@ -192,11 +553,7 @@ class BusStopStatistics:
         :param hour: The hour of the day (0-23).
         :type hour: int
         """
-        for i in range(len(self.passengersDepartedPerHour)):
-            if self.passengersDepartedPerHour[i][0] == hour:
-                self.passengersDepartedPerHour[i] = (hour, self.passengersDepartedPerHour[i][1] + passengersDeparted)
-                return
-        self.passengersDepartedPerHour.append((hour, passengersDeparted))
+        self.hourlyPassengersDeparted.update(passengersDeparted, hour)
 
     def updatePassengersLeftUnboardedPerHour(self, passengersWaiting: int, hour: int):
         """
@@ -207,11 +564,7 @@ class BusStopStatistics:
         :param hour: The hour of the day (0-23).
         :type hour: int
         """
-        for i in range(len(self.passengersLeftUnboardedPerHour)):
-            if self.passengersLeftUnboardedPerHour[i][0] == hour:
-                self.passengersLeftUnboardedPerHour[i] = (hour, self.passengersLeftUnboardedPerHour[i][1] + passengersWaiting)
-                return
-        self.passengersLeftUnboardedPerHour.append((hour, passengersWaiting))
+        self.hourlyPassengersLeftUnboarded.update(passengersWaiting, hour)
 
     def updateTimeSpentWaitingPerHour(self, timeSpentWaiting: int, hour: int):
         """
@@ -222,21 +575,29 @@ class BusStopStatistics:
         :param hour: The hour of the day (0-23).
         :type hour: int
         """
-        for i in range(len(self.timeSpentWaitingPerHour)):
-            if self.timeSpentWaitingPerHour[i][0] == hour:
-                self.timeSpentWaitingPerHour[i] = (hour, self.timeSpentWaitingPerHour[i][1] + timeSpentWaiting)
-                return
-        self.timeSpentWaitingPerHour.append((hour, timeSpentWaiting))
+        self.hourlyTimeSpentWaiting.update(timeSpentWaiting, hour)
+
+    def merge(self, other: 'BusStopStatistics'):
+        """
+        Add the per hour statistics of the other bus stop statistics.
+
+        :param other: The bus stop statistics to be added.
+        :type other: BusStopStatistics
+        """
+        self.hourlyPassengersArrived.merge(other.hourlyPassengersArrived)
+        self.hourlyPassengersDeparted.merge(other.hourlyPassengersDeparted)
+        self.hourlyPassengersLeftUnboarded.merge(other.hourlyPassengersLeftUnboarded)
+        self.hourlyTimeSpentWaiting.merge(other.hourlyTimeSpentWaiting)
 
     # TOTAL
     def agregateTotal(self):
         """
         Agregate the total statistics from the per hour statistics.
         """
-        self.totalPassengersArrived = sum([x[1] for x in self.passengersArrivedPerHour])
-        self.totalPassengersDeparted = sum([x[1] for x in self.passengersDepartedPerHour])
-        self.totalPassengersLeftUnboarded = sum([x[1] for x in self.passengersLeftUnboardedPerHour])
-        self.totalTimeSpentWaiting = sum([x[1] for x in self.timeSpentWaitingPerHour])
+        self.totalPassengersArrived = self.hourlyPassengersArrived.total()
+        self.totalPassengersDeparted = self.hourlyPassengersDeparted.total()
+        self.totalPassengersLeftUnboarded = self.hourlyPassengersLeftUnboarded.total()
+        self.totalTimeSpentWaiting = self.hourlyTimeSpentWaiting.total()
 
     # CLEAR
     def clear(self):
@@ -247,10 +608,10 @@ class BusStopStatistics:
         self.totalPassengersDeparted = 0
         self.totalPassengersLeftUnboarded = 0
         self.totalTimeSpentWaiting = 0
-        self.passengersArrivedPerHour = []
-        self.passengersDepartedPerHour = []
-        self.passengersLeftUnboardedPerHour = []
-        self.timeSpentWaitingPerHour = []
+        self.hourlyPassengersArrived.clear()
+        self.hourlyPassengersDeparted.clear()
+        self.hourlyPassengersLeftUnboarded.clear()
+        self.hourlyTimeSpentWaiting.clear()
 
     # STR
     def __str__(self):
@@ -284,23 +645,41 @@ class BusStopStatistics:
     
 # -------------------------------- BUS --------------------------------
 class BusStatistics:
+    # Static debug flag, if set, raw passenger satisfactions are kept in addition to the running statistics
+    keepSamples = False
+
     # INIT
-    def __init__(self, busNumber, capacity, seats, language="en"):
+    def __init__(self, busNumber, capacity, seats, language="en", keepSamples=None):
         self.busNumber = busNumber
         self.capacity = capacity
         self.seats = seats
         self.language = language
+        self.keepSamples = BusStatistics.keepSamples if keepSamples is None else keepSamples
         # total
         self.averageLoad = 0
         self.averageLoadInPercent = 0
         self.totalPassengersTransported = 0
-        # per bus stop
-        self.loadPerBusStop = []
-        self.loadInPercentPerBusStop = []
+        # per bus stop, running statistic of the load for every bus stop name, in order of the first visit
+        self.loads = {}
         # passengers
-        self.passengerSatisfactions = []
+        self.passengerSatisfaction = RunningStatistic(self.keepSamples)
+        self.passengerSatisfactions = [] if self.keepSamples else None
     
     # PER BUS STOP
+    @property
+    def loadPerBusStop(self) -> list[tuple[str, float]]:
+        """
+        Average load per bus stop, as a list of (bus stop name, load) pairs.
+        """
+        return [(busStopName, load.average()) for busStopName, load in self.loads.items()]
+
+    @property
+    def loadInPercentPerBusStop(self) -> list[tuple[str, float]]:
+        """
+        Average load in percent of the capacity per bus stop, as a list of (bus stop name, load) pairs.
+        """
+        return [(busStopName, load.average() / self.capacity) for busStopName, load in self.loads.items()]
+
     def updateLoadPerBusStop(self, load: int, busStopName: str):
         """
         Update the load per bus stop.
@@ -310,25 +689,58 @@ class BusStatistics:
         :param busStopName: The name of the bus stop.
         :type busStopName: str
         """
-        self.loadPerBusStop.append((busStopName, load))
-        self.loadInPercentPerBusStop.append((busStopName, load / self.capacity))
+        if busStopName not in self.loads:
+            self.loads[busStopName] = RunningStatistic()
+        self.loads[busStopName].update(load)
 
     # PASSENGERS
-    def updatePassengerSatisfactions(self, satisfaction: float):
+    def updatePassengerSatisfactions(self, satisfaction: float, numberOfPassengers: int = 1):
         """
         Update the passenger satisfaction.
 
         :param satisfaction: The satisfaction of the passenger.
         :type satisfaction: float
+        :param numberOfPassengers: The number of passengers with this satisfaction, defaults to 1
+        :type numberOfPassengers: int, optional
+        """
+        self.passengerSatisfaction.update(satisfaction, numberOfPassengers)
+        if self.keepSamples:
+            self.passengerSatisfactions.extend([satisfaction] * numberOfPassengers)
+
+    def updatePassengerSatisfactionsInBulk(self, satisfactions):
+        """
+        Update the passenger satisfaction of multiple passengers at once.
+
+        :param satisfactions: The satisfactions of the passengers.
+        :type satisfactions: np.ndarray | list[float]
+        """
+        self.passengerSatisfaction.updateFromArray(satisfactions)
+        if self.keepSamples:
+            self.passengerSatisfactions.extend(np.asarray(satisfactions).tolist())
+
+    def merge(self, other: 'BusStatistics'):
+        """
+        Add the loads, passenger satisfactions and transported passengers of the other bus statistics.
+
+        :param other: The bus statistics to be added.
+        :type other: BusStatistics
         """
-        self.passengerSatisfactions.append(satisfaction)
+        for busStopName, load in other.loads.items():
+            if busStopName not in self.loads:
+                self.loads[busStopName] = RunningStatistic()
+            self.loads[busStopName].merge(load)
+        self.passengerSatisfaction.merge(other.passengerSatisfaction)
+        if self.keepSamples and other.keepSamples:
+            self.passengerSatisfactions.extend(other.passengerSatisfactions)
+        self.updateTotalPassengersTransported(other.totalPassengersTransported)
 
     # TOTAL
     def agregateTotal(self):
         """
         Agregate the total statistics from the per bus stop statistics.
         """
-        self.averageLoad = sum([x[1] for x in self.loadPerBusStop]) / len(self.loadPerBusStop)
+        loadPerBusStop = self.loadPerBusStop
+        self.averageLoad = sum([x[1] for x in loadPerBusStop]) / len(loadPerBusStop) if len(loadPerBusStop) > 0 else 0
         self.averageLoadInPercent = self.averageLoad / self.capacity
     
     def updateTotalPassengersTransported(self, passengersTransported: int):
@@ -348,8 +760,10 @@ class BusStatistics:
         self.averageLoad = 0
         self.averageLoadInPercent = 0
         self.totalPassengersTransported = 0
-        self.loadPerBusStop = []
-        self.loadInPercentPerBusStop = []
+        self.loads = {}
+        self.passengerSatisfaction.clear()
+        if self.keepSamples:
+            self.passengerSatisfactions = []
 
     # STR
     def __str__(self):
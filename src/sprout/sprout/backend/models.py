@@ -5,8 +5,8 @@ This file contains the Bus, BusStop, and TimeTable classes, which are used in th
 """
 
 from enum import Enum
-from .RandomNumberGenerator import RandomNumberGenerator
-from .Simulation import Simulation
+import numpy as np
+
 from .Statistics import BusStatistics, BusStopStatistics
 
 # ------------------------------ BUSSTOP ------------------------------
@@ -61,20 +61,39 @@ class BusStop:
         self.passengerArrivalRatesPerHour = passengerArrivalRatesPerHour
         self.leavingPassengersRate = leavingPassengersRate
         self.state = BusStop.State.Idle
-        self.timeOfLastBusArrival = Simulation.startTime
+        self.simulation = None
+        self.timeOfLastBusArrival = 0
         self.timeIntervalBetweenBuses = 0
-        self.waitingPassengersArrivalTimes = []
+        # sorted arrival times of waiting passengers, passengers before the head index already boarded
+        self.waitingPassengersArrivalTimes = np.empty(0)
+        self.waitingPassengersHead = 0
         self.setOutputSignals()
         self.stats = BusStopStatistics(name)
     
     # METHODS
+    def copyForSimulation(self, simulation) -> 'BusStop':
+        """
+        Create a copy of the bus stop with a clear state, bound to the given simulation.
+        The copy reads the simulation clock and random number generator from the simulation.
+
+        :param simulation: The simulation the copy belongs to.
+        :type simulation: Simulation
+        :return: The copy of the bus stop.
+        :rtype: BusStop
+        """
+        busStop = BusStop(self.name, self.timeDeltaToArrive, self.passengerArrivalRatesPerHour, self.leavingPassengersRate)
+        busStop.simulation = simulation
+        busStop.clear()
+        return busStop
+
     def clear(self):
         """
         Clear the bus stop statistics and reset the state of the bus stop.
         """
-        self.timeOfLastBusArrival = Simulation.startTime
+        self.timeOfLastBusArrival = self.simulation.startTime if self.simulation is not None else 0
         self.timeIntervalBetweenBuses = 0
-        self.waitingPassengersArrivalTimes = []
+        self.waitingPassengersArrivalTimes = np.empty(0)
+        self.waitingPassengersHead = 0
         self.stats.clear()
 
     def busArrived(self):
@@ -82,41 +101,67 @@ class BusStop:
         Update the state of the bus stop when a bus arrives. This will set the state to BusArrived and update the time it took for the next bus to arrive.
         """
         self.state = BusStop.State.BusArrived
-        self.timeIntervalBetweenBuses = Simulation.currentTime - self.timeOfLastBusArrival
+        self.timeIntervalBetweenBuses = self.simulation.currentTime - self.timeOfLastBusArrival
 
     def startBoarding(self):
         """
         Update the state of the bus stop when boarding starts. This will set the state to BusBoarding and generate new passengers.
         """
         self.state = BusStop.State.BusBoarding
-        self.waitingPassengersArrivalTimes += self.generatePassengers()
-        self.waitingPassengersArrivalTimes.sort()
+        # new passengers arrived after all passengers already waiting, so the queue stays sorted without sorting
+        self.waitingPassengersArrivalTimes = np.concatenate((self.waitingPassengersArrivalTimes[self.waitingPassengersHead:], self.generatePassengers()))
+        self.waitingPassengersHead = 0
 
-        
     def finishBoarding(self):
         """
         Update the state of the bus stop when boarding finishes. This will set the state to Idle and update the time of the last bus arrival.
         """
         self.state = BusStop.State.Idle
-        self.timeOfLastBusArrival = Simulation.currentTime
-        self.waitingPassengersArrivalTimes = []
+        self.timeOfLastBusArrival = self.simulation.currentTime
+        self.waitingPassengersArrivalTimes = np.empty(0)
+        self.waitingPassengersHead = 0
+
+    def getNumberOfWaitingPassengers(self, arrivedUntil: float = None) -> int:
+        """
+        Get the number of passengers waiting at the bus stop.
+
+        :param arrivedUntil: Count only passengers who arrived until this time, defaults to None (all passengers)
+        :type arrivedUntil: float, optional
+        :return: The number of waiting passengers.
+        :rtype: int
+        """
+        if arrivedUntil is None:
+            return len(self.waitingPassengersArrivalTimes) - self.waitingPassengersHead
+        return int(np.searchsorted(self.waitingPassengersArrivalTimes, arrivedUntil, side="right")) - self.waitingPassengersHead
+
+    def takeWaitingPassengers(self, numberOfPassengers: int) -> np.ndarray:
+        """
+        Remove the passengers who have been waiting the longest from the queue.
+
+        :param numberOfPassengers: The number of passengers to remove.
+        :type numberOfPassengers: int
+        :return: The arrival times of the removed passengers.
+        :rtype: np.ndarray
+        """
+        passengers = self.waitingPassengersArrivalTimes[self.waitingPassengersHead:self.waitingPassengersHead + numberOfPassengers]
+        self.waitingPassengersHead += len(passengers)
+        return passengers
 
     def generatePassengers(self):
         """
         Generate passengers based on the passenger arrival rates per hour. This will generate a list of arrival times for the passengers.
-        The arrival times are generated using an exponential distribution based on the rate for the current hour.
-        Instead of using poisson distribution for generating the number of passengers,
-        we use an exponential distribution to generate the time between passenger arrivals.
-        Generated time is added to the time of the last bus arrival to get the arrival time of the passenger.
-        Local simulation time is forwarded by the generated time.
-        This proccess is repeated until the current simulation time is reached.
+        The arrivals form a poisson process with the rate for the current hour, between the time of the last bus arrival and the current simulation time.
+        Instead of drawing the time between passenger arrivals one by one,
+        the number of passengers is drawn from a poisson distribution with the expected number of arrivals in the whole interval,
+        and their arrival times are drawn uniformly from the interval and sorted, which gives the same distribution of arrival times.
+        Arrived passengers are added to the statistics with a single update per hour.
 
-        :return: A list of arrival times for the passengers.
-        :rtype: list[float]
+        :return: The sorted arrival times of the passengers.
+        :rtype: np.ndarray
         """
         # find the rate for the current hour
         lambdaValue = 0
-        currentHour = Simulation.getHour()
+        currentHour = self.simulation.getHour()
         for hourRate in self.passengerArrivalRatesPerHour:
             if hourRate.hour == currentHour:
                 lambdaValue = hourRate.rate / 60
@@ -124,23 +169,22 @@ class BusStop:
 
         # if there is no rate for the current hour, no passengers will arrive
         if lambdaValue == 0:
-            return []
+            return np.empty(0)
         
         # restrict the waiting time for the first bus to 15 minutes
-        if self.timeOfLastBusArrival == Simulation.startTime:
-            self.timeOfLastBusArrival = Simulation.currentTime - 15
+        if self.timeOfLastBusArrival == self.simulation.startTime:
+            self.timeOfLastBusArrival = self.simulation.currentTime - 15
 
         # generate passengers
-        arrivalTimes = []
-        currentTime = self.timeOfLastBusArrival
-        while currentTime < Simulation.currentTime:
-            interArrivalTime = RandomNumberGenerator.exponential(1 / lambdaValue)
-            currentTime += interArrivalTime
+        interval = self.simulation.currentTime - self.timeOfLastBusArrival
+        if interval <= 0:
+            return np.empty(0)
+        numberOfPassengers = self.simulation.rng.poisson(lambdaValue * interval)
+        arrivalTimes = np.sort(self.simulation.rng.uniform(self.timeOfLastBusArrival, self.simulation.currentTime, numberOfPassengers))
 
-            if currentTime < Simulation.currentTime:
-                arrivalTimes.append(currentTime)
-                # update statistics
-                self.stats.updatePassengersArrivedPerHour(1, currentTime // 60 % 24)
+        # update statistics
+        hours = (arrivalTimes // 60 % 24).astype(int)
+        self.stats.updatePassengersArrivedPerHourFromHistogram(np.bincount(hours, minlength=24))
 
         return arrivalTimes
 
@@ -223,8 +267,6 @@ class TimeTable:
 
 # -------------------------------- BUS --------------------------------
 class Bus:
-    busCounter = 1
-
     # STATES
     class State(Enum):
         Traveling = 1
@@ -271,9 +313,10 @@ class Bus:
             inputSignal[0].triggerInputSignal(inputSignal[1])
 
     # INIT
-    def __init__(self, firstBusStop, capacity, seats):
-        self.busNumber = Bus.busCounter
-        Bus.busCounter += 1
+    def __init__(self, simulation, firstBusStop, capacity, seats):
+        self.simulation = simulation
+        self.busNumber = simulation.busCounter
+        simulation.busCounter += 1
         self.state = Bus.State.Traveling
         self.currentBusStop = firstBusStop
         self.capacity = capacity
@@ -310,7 +353,7 @@ class Bus:
         numberOfLeavingPassengers = round(self.load * self.currentBusStop.leavingPassengersRate)
         self.load = max(0, self.load - numberOfLeavingPassengers)
         # update statistics
-        self.currentBusStop.stats.updatePassengersDepartedPerHour(numberOfLeavingPassengers, Simulation.getHour())
+        self.currentBusStop.stats.updatePassengersDepartedPerHour(numberOfLeavingPassengers, self.simulation.getHour())
         
     def boardPassengers(self):
         """
@@ -322,19 +365,17 @@ class Bus:
         # notify bus stop to generate new passengers
         self.triggerOutputSignal(Bus.OutputSignals.Boarding)
         # board passengers, if there is capacity and there are passengers waiting
-        while len(self.currentBusStop.waitingPassengersArrivalTimes) > 0 and self.currentBusStop.waitingPassengersArrivalTimes[0] <= Simulation.currentTime:
-            if self.load == self.capacity:
-                break;
-            self.updatePassengerSatisfaction()
-            self.load += 1
-            passengerArrivalTime = self.currentBusStop.waitingPassengersArrivalTimes.pop(0)
-            # update statistics
-            self.currentBusStop.stats.updateTimeSpentWaitingPerHour(Simulation.currentTime - passengerArrivalTime, Simulation.getHour())
-            self.stats.updateTotalPassengersTransported(1)
+        numberOfBoardingPassengers = min(self.currentBusStop.getNumberOfWaitingPassengers(self.simulation.currentTime), self.capacity - self.load)
+        passengerArrivalTimes = self.currentBusStop.takeWaitingPassengers(numberOfBoardingPassengers)
+        self.updatePassengerSatisfactions(numberOfBoardingPassengers)
+        self.load += numberOfBoardingPassengers
         # update statistics
-        self.currentBusStop.stats.updatePassengersLeftUnboardedPerHour(len(self.currentBusStop.waitingPassengersArrivalTimes), Simulation.getHour())
-        for i in range(len(self.currentBusStop.waitingPassengersArrivalTimes)):
-            self.stats.updatePassengerSatisfactions(0)
+        if numberOfBoardingPassengers > 0:
+            self.currentBusStop.stats.updateTimeSpentWaitingPerHour(float(np.sum(self.simulation.currentTime - passengerArrivalTimes)), self.simulation.getHour())
+        self.stats.updateTotalPassengersTransported(numberOfBoardingPassengers)
+        numberOfUnboardedPassengers = self.currentBusStop.getNumberOfWaitingPassengers()
+        self.currentBusStop.stats.updatePassengersLeftUnboardedPerHour(numberOfUnboardedPassengers, self.simulation.getHour())
+        self.stats.updatePassengerSatisfactions(0, numberOfUnboardedPassengers)
         self.stats.updateLoadPerBusStop(self.load, self.currentBusStop.name)
         
     def departFromStop(self):
@@ -346,15 +387,19 @@ class Bus:
         # notify bus stop that bus has departed
         self.triggerOutputSignal(Bus.OutputSignals.Departure)    
 
-    def updatePassengerSatisfaction(self):
+    def updatePassengerSatisfactions(self, numberOfBoardingPassengers: int):
         """
-        Update the passenger satisfaction based on the current load of the bus and the number of seats.
+        Update the passenger satisfaction of the boarding passengers based on the load of the bus when each of them boards and the number of seats.
+
+        :param numberOfBoardingPassengers: The number of passengers boarding the bus.
+        :type numberOfBoardingPassengers: int
         """
-        if self.load <= self.seats:
-            satisfaction = 1
-        elif self.load > self.seats:
-            satisfaction = 1 - (self.load - self.seats)/(self.capacity - self.seats)
-        self.stats.updatePassengerSatisfactions(satisfaction)
+        loads = self.load + np.arange(numberOfBoardingPassengers)
+        if self.capacity > self.seats:
+            satisfactions = 1 - np.maximum(loads - self.seats, 0) / (self.capacity - self.seats)
+        else:
+            satisfactions = np.ones(numberOfBoardingPassengers)
+        self.stats.updatePassengerSatisfactionsInBulk(satisfactions)
 
     # STR
     def __str__(self):
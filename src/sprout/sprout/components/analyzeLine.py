@@ -4,11 +4,19 @@ This file contains analyze line component and its state.
 :author: Lukas Katona
 """
 
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import multiprocessing
+import os
 import reflex as rx
 from tkinter import filedialog
 
-from ..backend.InputParser import InputParser
+from ..backend.models import BusStop
 from ..backend.Simulation import Simulation
+from ..backend.Statistics import Statistics
+from ..backend.AnalysisCache import getAnalysisCache
+from ..backend.ScenarioRegistry import ScenarioRegistry, getScenarioRegistry
 
 from .infoCard import infoCard
 from .hourChart import hourChart
@@ -17,10 +25,11 @@ from .numberInput import numberImput
 
 class AnalyzeLineState(rx.State):
     selectedTimeTableName: str = ""
-    selectedTimeTable: str = ""
+    # ids of the parsed inputs in the scenario registry
+    timeTableId: str = ""
 
     busSopsFilename: str = ""
-    selectedBusStops: str = ""
+    busStopsId: str = ""
     timeTableFilename: str = ""
     busStopTable: list[tuple[str, str, bool]] = []
     timeTable: list[tuple[str, str, bool]] = []
@@ -34,9 +43,9 @@ class AnalyzeLineState(rx.State):
     totalPassengersLeftUnboarded: str = ""
     totalTimeSpentWaiting: str = ""
     averageTimeSpentWaiting: str = ""
-    passengersArrivedPerHour: list[dict[str,int]] = []
-    passengersLeftUnboardedPerHour: list[dict[str,int]] = []
-    timeSpentWaitingPerHour: list[dict[str,int]] = []
+    passengersArrivedPerHour: list[dict[str,float]] = []
+    passengersLeftUnboardedPerHour: list[dict[str,float]] = []
+    timeSpentWaitingPerHour: list[dict[str,float]] = []
 
     vehicleCapacity: int = 80
     vehicleSeats: int = 30
@@ -51,7 +60,22 @@ class AnalyzeLineState(rx.State):
 
     totalCost: str = ""
 
+    # how many times fewer replications reach the same confidence interval thanks to the variance reduction
+    varianceReduction: str = ""
+    numberOfReplications: int = 0
+
     showAnalysis: bool = False
+    analysisRunning: bool = False
+
+    # fixed seed, so the same scenario always gives the same result and can be cached
+    _analysisSeed: int = 0
+    # replications are added until the confidence intervals are within 1% of the means, or the time budget in seconds runs out
+    _relativePrecision: float = 0.01
+    _timeBudget: float = 10.0
+    # three antithetic pairs are the fewest which give a finite confidence interval with the control variate, so a quiet line stops after them
+    _initialSimulations: int = 6
+    _batchSize: int = 10
+    _maximumSimulations: int = 1000
 
     @rx.event
     async def resetAnalysis(self):
@@ -59,10 +83,10 @@ class AnalyzeLineState(rx.State):
         Resets all state variables.
         """
         self.selectedTimeTableName = ""
-        self.selectedTimeTable = ""
+        self.timeTableId = ""
 
         self.busSopsFilename = ""
-        self.selectedBusStops = ""
+        self.busStopsId = ""
         self.timeTableFilename = ""
         self.busStopTable = []
         self.timeTable = []
@@ -93,21 +117,63 @@ class AnalyzeLineState(rx.State):
 
         self.totalCost = ""
 
+        self.varianceReduction = ""
+        self.numberOfReplications = 0
+
         self.showAnalysis = False
 
 
-    @rx.event
+    @rx.event(background=True)
     async def handleAnalysis(self):
         """
         Handles whole analysis process.
+        The simulations run in the pool of analysis processes, so the server keeps serving other sessions meanwhile.
         """
-        if not self.selectedBusStops or not self.selectedTimeTable:
-            return
-
-        busStops = InputParser.parseBusStopsFromString(self.selectedBusStops)
-        timeTable = InputParser.parseTimeTableFromString(self.selectedTimeTable)
-        stats = Simulation.runMultipleThanAverage(0, 24*60, busStops, timeTable, self.vehicleCapacity, self.vehicleSeats, 10)
+        async with self:
+            if self.analysisRunning or not self.busStopsId or not self.timeTableId:
+                return
+            scenarioRegistry = getScenarioRegistry()
+            try:
+                busStops = scenarioRegistry.getBusStops(self.busStopsId)
+                timeTable = scenarioRegistry.getTimeTable(self.timeTableId)
+            except ScenarioRegistry.MissingScenarioError:
+                yield self.forgetMissingInputs()
+                return
+            self.analysisRunning = True
+            vehicleCapacity = self.vehicleCapacity
+            vehicleSeats = self.vehicleSeats
+
+        try:
+            # batches of replications are simulated at once by the multi-lane engine, as antithetic pairs with the arrived passengers as a control variate,
+            # the result is shared by all sessions analyzing the same scenario, unless the time budget stopped it before it was precise enough
+            analysisCache = getAnalysisCache()
+            key = analysisCache.key(busStops, timeTable, vehicleCapacity, vehicleSeats, self._maximumSimulations, self._analysisSeed, Simulation.Engine.MultiLane, True, True,
+                                    self._relativePrecision, self._timeBudget, self._initialSimulations, self._batchSize)
+            stats = analysisCache.get(key)
+            if stats is None:
+                stats = await asyncio.get_running_loop().run_in_executor(getAnalysisExecutor(), functools.partial(
+                    Simulation.runUntilConfident, 0, 24*60, busStops, timeTable, vehicleCapacity, vehicleSeats, self._relativePrecision, self._timeBudget, self._initialSimulations, self._batchSize, self._maximumSimulations,
+                    seed=self._analysisSeed, engine=Simulation.Engine.MultiLane, antitheticVariates=True, controlVariates=True))
+                if stats.stopReason != Simulation.StopReason.TimeBudget:
+                    analysisCache.add(key, stats)
+        finally:
+            async with self:
+                self.analysisRunning = False
+
+        async with self:
+            self.showStatistics(busStops, stats)
+            if stats.stopReason == Simulation.StopReason.TimeBudget:
+                yield rx.toast.info("Analýza bola zastavená časovým limitom, intervaly spoľahlivosti môžu byť širšie")
+
+    def showStatistics(self, busStops: tuple[BusStop, ...], stats: Statistics):
+        """
+        Fills the state variables with the results of the analysis.
 
+        :param busStops: Analyzed bus stops
+        :type busStops: tuple[BusStop, ...]
+        :param stats: Averaged statistics of the analysis
+        :type stats: Statistics
+        """
         self.numberOfBusStops = len(busStops)
         self.longestBusStopNameLength = max([len(busStop.name) for busStop in busStops])
 
@@ -119,15 +185,18 @@ class AnalyzeLineState(rx.State):
         self.totalTimeSpentWaiting = str(int(round(stats.busStopStatistics.totalTimeSpentWaiting)))
         self.averageTimeSpentWaiting = str(int(round(stats.busStopStatistics.totalTimeSpentWaiting / stats.busStopStatistics.totalPassengersArrived)))
 
-        self.passengersArrivedPerHour = [{"hour": hour, "count": 0} for hour in range(24)]
+        # error bars show the 95% confidence interval over the replications
+        hourlyDistributions = stats.busStopStatistics.hourlyDistributions
+
+        self.passengersArrivedPerHour = [{"hour": hour, "count": 0, "error": round(float(hourlyDistributions["hourlyPassengersArrived"].confidenceInterval[hour]), 2)} for hour in range(24)]
         for stat in stats.busStopStatistics.passengersArrivedPerHour:
             self.passengersArrivedPerHour[int(stat[0])]["count"] = stat[1]
 
-        self.passengersLeftUnboardedPerHour = [{"hour": hour, "count": 0} for hour in range(24)]
+        self.passengersLeftUnboardedPerHour = [{"hour": hour, "count": 0, "error": round(float(hourlyDistributions["hourlyPassengersLeftUnboarded"].confidenceInterval[hour]), 2)} for hour in range(24)]
         for stat in stats.busStopStatistics.passengersLeftUnboardedPerHour:
             self.passengersLeftUnboardedPerHour[int(stat[0])]["count"] = stat[1]
 
-        self.timeSpentWaitingPerHour = [{"hour": hour, "count": 0} for hour in range(24)]
+        self.timeSpentWaitingPerHour = [{"hour": hour, "count": 0, "error": round(float(hourlyDistributions["averageTimeSpentWaiting"].confidenceInterval[hour]), 2)} for hour in range(24)]
         for stat in stats.busStopStatistics.timeSpentWaitingPerHour:
             passengerArrivedCount = next((arrivedStat[1] for arrivedStat in stats.busStopStatistics.passengersArrivedPerHour if arrivedStat[0] == stat[0]),1)
             self.timeSpentWaitingPerHour[int(stat[0])]["count"] = stat[1] / passengerArrivedCount
@@ -144,8 +213,32 @@ class AnalyzeLineState(rx.State):
 
         self.totalCost = str(int(round(self.routeLength * self.totalNumberOfBuses * self.vehicleCapacity / 100 * self.costPerSeatKm)))
 
+        waitingReduction = float(stats.distributions["averageTimeSpentWaiting"].varianceReduction)
+        unboardedReduction = float(stats.distributions["totalPassengersLeftUnboarded"].varianceReduction)
+        self.numberOfReplications = stats.numberOfReplications
+        self.varianceReduction = "čakanie " + str(round(waitingReduction, 1)) + "×, neobslúžení " + str(round(unboardedReduction, 1)) + "×"
+
         self.showAnalysis = True
 
+    def forgetMissingInputs(self):
+        """
+        Clears the ids of the inputs which are no longer in the scenario registry, so they have to be uploaded again.
+
+        :return: Error toast asking for the upload
+        :rtype: rx.event.EventSpec
+        """
+        scenarioRegistry = getScenarioRegistry()
+        if not scenarioRegistry.touch(self.busStopsId):
+            self.busStopsId = ""
+            self.busSopsFilename = ""
+            self.busStopTable = []
+        if not scenarioRegistry.touch(self.timeTableId):
+            self.timeTableId = ""
+            self.timeTableFilename = ""
+            self.selectedTimeTableName = ""
+            self.timeTable = []
+        return rx.toast.error("Vstupy už nie sú dostupné, nahrajte ich znova")
+
     @rx.event
     async def handleExport(self):
         """
@@ -157,18 +250,24 @@ class AnalyzeLineState(rx.State):
             title="Uložiť analýzu",
         )
         if file_path:
+            scenarioRegistry = getScenarioRegistry()
+            try:
+                busStops = scenarioRegistry.getBusStops(self.busStopsId)
+                timeTable = scenarioRegistry.getTimeTable(self.timeTableId)
+            except ScenarioRegistry.MissingScenarioError:
+                return self.forgetMissingInputs()
             with open(file_path, 'w') as file:
                 file.write(
                     f"Analýza linky\n"
                     f"\n------- Zastávky -------\n"
                 )
-                for busStop in InputParser.parseBusStopsFromString(self.selectedBusStops):
+                for busStop in busStops:
                     file.write(
                         f"{busStop}\n"
                     )
                 file.write(
                     f"\n------- Časový rozpis -------\n"
-                    f"{InputParser.parseTimeTableFromString(self.selectedTimeTable)}\n\n"
+                    f"{timeTable}\n\n"
                     f"------- Vstupy -------\n"
                     f"Kapacita vozidla: {self.vehicleCapacity}\n"
                     f"Počet miest na sedenie: {self.vehicleSeats}\n"
@@ -184,12 +283,29 @@ class AnalyzeLineState(rx.State):
                     f"Priemerná spokojnosť cestujúcich: {self.averagePassengerSatisfaction} %\n"
                     f"Celkový počet vozidiel: {self.totalNumberOfBuses}\n"
                     f"Priemerná naplnenosť vozidiel: {self.averageLoad} ({self.averageLoadInPercent} %)\n"
+                    f"Počet replikácií simulácie: {self.numberOfReplications}\n"
+                    f"Redukcia rozptylu (koľkokrát menej replikácií pre rovnaký interval spoľahlivosti): {self.varianceReduction}\n"
                     f"Cestujúci prichádzajúci za hodinu:\n{self.passengersArrivedPerHour}\n"
                     f"Priemerný čas strávený čakaním za hodinu (min):\n{self.timeSpentWaitingPerHour}\n"
                     f"Počet prípadov kedy sa cestujúci nezmestili do vozidla za hodinu:\n{self.passengersLeftUnboardedPerHour}\n"
                     f"Priemerná naplnenosť vozidiel naprieč zastávkami:\n{self.loadPerBusStop}\n"
                 )
 
+# Pool of analysis processes shared by all sessions of the server, created on the first use
+sharedAnalysisExecutor = None
+
+def getAnalysisExecutor() -> ProcessPoolExecutor:
+    """
+    Get the pool of analysis processes shared by all sessions of the server.
+    The processes are spawned, so they do not inherit the threads and sockets of the server.
+
+    :return: The shared pool of analysis processes.
+    :rtype: ProcessPoolExecutor
+    """
+    global sharedAnalysisExecutor
+    if sharedAnalysisExecutor is None:
+        sharedAnalysisExecutor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=multiprocessing.get_context("spawn"))
+    return sharedAnalysisExecutor
 
 def analyzeLine() -> rx.Component:
     """
@@ -218,8 +334,9 @@ def analyzeLine() -> rx.Component:
                 rx.heading("Analyzovať", size="3"),
                 on_click=AnalyzeLineState.handleAnalysis(),
                 size="3",
+                loading=AnalyzeLineState.analysisRunning,
                 disabled=rx.cond(
-                    (AnalyzeLineState.selectedBusStops == "") | (AnalyzeLineState.selectedTimeTable == ""),
+                    (AnalyzeLineState.busStopsId == "") | (AnalyzeLineState.timeTableId == "") | AnalyzeLineState.analysisRunning,
                     True,
                     False,
                 ),
@@ -265,9 +382,16 @@ def analyzeLine() -> rx.Component:
                     width="100%",
                     align_items="stretch",
                 ),
-                hourChart("Cestujúci prichádzajúci za hodinu", AnalyzeLineState.passengersArrivedPerHour),
-                hourChart("Priemerný čas strávený čakaním za hodinu (min)", AnalyzeLineState.timeSpentWaitingPerHour),
-                hourChart("Počet prípadov kedy sa cestujúci nezmestil do vozidla za hodinu", AnalyzeLineState.passengersLeftUnboardedPerHour),
+                rx.hstack(
+                    infoCard("Počet replikácií simulácie", AnalyzeLineState.numberOfReplications),
+                    infoCard("Redukcia rozptylu", AnalyzeLineState.varianceReduction),
+                    spacing="5",
+                    width="100%",
+                    align_items="stretch",
+                ),
+                hourChart("Cestujúci prichádzajúci za hodinu", AnalyzeLineState.passengersArrivedPerHour, "error"),
+                hourChart("Priemerný čas strávený čakaním za hodinu (min)", AnalyzeLineState.timeSpentWaitingPerHour, "error"),
+                hourChart("Počet prípadov kedy sa cestujúci nezmestil do vozidla za hodinu", AnalyzeLineState.passengersLeftUnboardedPerHour, "error"),
                 busStopChart("Priemerná naplnenosť naprieč zastávkami", AnalyzeLineState.loadPerBusStop, AnalyzeLineState.vehicleCapacity, AnalyzeLineState.numberOfBusStops, AnalyzeLineState.longestBusStopNameLength),
                 rx.button(
                     rx.heading("Uložiť analýzu", size="3"),
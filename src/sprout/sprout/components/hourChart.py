@@ -6,7 +6,7 @@ This file contains simple column graph with statistics agregated by hour of the
 
 import reflex as rx
 
-def hourChart(title: str, data: list[dict[str,int]]) -> rx.Component:
+def hourChart(title: str, data: list[dict[str,int]], errorKey: str = None) -> rx.Component:
     """
     Column graph that displays data agregated by hour of the day.
 
@@ -14,14 +14,18 @@ def hourChart(title: str, data: list[dict[str,int]]) -> rx.Component:
     :type title: str
     :param data: Data to display
     :type data: list[dict[str,int]]
+    :param errorKey: Key of the data with the error bar size, defaults to None (no error bars)
+    :type errorKey: str, optional
     :return: Hour chart component
     :rtype: rx.Component
     """
+    errorBars = [rx.recharts.error_bar(data_key=errorKey, width=4, stroke_width=1, stroke="gray")] if errorKey is not None else []
     return rx.card(
         rx.vstack(
             rx.heading(title, size="4"),
             rx.recharts.bar_chart(
                 rx.recharts.bar(
+                    *errorBars,
                     data_key="count",
                     fill=rx.color("accent", 8),
                 ),
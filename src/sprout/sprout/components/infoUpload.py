@@ -8,6 +8,8 @@ import os
 import reflex as rx
 
 from ..backend.InputParser import InputParser
+from ..backend.models import BusStop, TimeTable
+from ..backend.ScenarioRegistry import ScenarioRegistry, getScenarioRegistry
 
 from .busStopTable import busStopTable
 from .timeTable import timeTable
@@ -41,6 +43,7 @@ def getFilePath(fileName: str) -> str:
     return os.path.join(os.path.dirname(__file__), fileName)
 
 class InfoUploadState(rx.State):
+    # saved timetables as (name, id in the scenario registry)
     options: list[tuple[str, str]] = []
     dropdownOptions: list[str] = []
 
@@ -57,31 +60,38 @@ class InfoUploadState(rx.State):
         if self.router.page.path == "/optimize":
             stateClass = OptimizeLineState
         state = await self.get_state(stateClass)
+        timeTableId = next((option[1] for option in self.options if option[0] == value), "")
+        try:
+            timeTable = getScenarioRegistry().getTimeTable(timeTableId)
+        except ScenarioRegistry.MissingScenarioError:
+            # the saved timetable is no longer registered, it cannot be selected again
+            self.options = [option for option in self.options if option[0] != value]
+            self.dropdownOptions = [option for option in self.dropdownOptions if option != value]
+            return rx.toast.error("Rozpis " + value + " už nie je dostupný, nahrajte ho znova")
         state.selectedTimeTableName = value
-        state.selectedTimeTable = next((option[1] for option in self.options if option[0] == value), None)
+        state.timeTableId = timeTableId
         state.timeTableFilename = ''
-        state.timeTable = self.parseTimeTableToTuple(state.selectedTimeTable)
+        state.timeTable = self.parseTimeTableToTuple(timeTable)
 
     def insertNewTimeTable(self, timeTable: tuple[str, str]):
         """
         Inserts new timetable to dropdown options
 
-        :param timeTable: Timetable to insert
+        :param timeTable: Name of the timetable and its id in the scenario registry
         :type timeTable: tuple[str, str]
         """
         self.options.append(timeTable)
         self.dropdownOptions.append(timeTable[0])
 
-    def parseBusStopsToTuple(self, selectedBusStops: str) -> list[tuple[str, str, bool]]:
+    def parseBusStopsToTuple(self, busStops: tuple[BusStop, ...]) -> list[tuple[str, str, bool]]:
         """
-        Parses the text containing information about bus stops.
+        Formats the parsed bus stops for FE rendering.
 
-        :param selectedBusStops: Bus stops information
-        :type selectedBusStops: str
+        :param busStops: Parsed bus stops
+        :type busStops: tuple[BusStop, ...]
         :return: List of formated bus stops
         :rtype: list[tuple[str, str, bool]]
         """
-        busStops = InputParser.parseBusStopsFromString(selectedBusStops)
         busStopTuple: list[tuple[str, str, bool]] = []
         even = True
         for busStop in busStops:
@@ -89,16 +99,15 @@ class InfoUploadState(rx.State):
             even = not even
         return busStopTuple
 
-    def parseTimeTableToTuple(self, selectedTimeTable: str) -> list[tuple[str, str, bool]]:
+    def parseTimeTableToTuple(self, timeTable: TimeTable) -> list[tuple[str, str, bool]]:
         """
-        Parses the text containing niformation about timetable.
+        Formats the parsed timetable for FE rendering.
 
-        :param selectedTimeTable: Timetable information
-        :type selectedTimeTable: str
+        :param timeTable: Parsed timetable
+        :type timeTable: TimeTable
         :return: Formated timetable
         :rtype: list[tuple[str, str, bool]]
         """
-        timeTable = InputParser.parseTimeTableFromString(selectedTimeTable)
         timeTableTuple: list[tuple[str, str, bool]] = []
         for hour in range(24):
             hourStr = str(hour).zfill(2) + ":" if hour < 10 else str(hour) + ":"
@@ -123,11 +132,20 @@ class InfoUploadState(rx.State):
         if self.router.page.path == "/optimize":
             stateClass = OptimizeLineState
         state = await self.get_state(stateClass)
+        # the bus stops are parsed once here, the states only keep their id
+        scenarioRegistry = getScenarioRegistry()
+        try:
+            busStopsId = scenarioRegistry.registerBusStops(uploadBusStops[0].file.read().decode('utf-8'))
+            busStops = scenarioRegistry.getBusStops(busStopsId)
+        except InputParser.ParseError as error:
+            return rx.toast.error("Chyba v súbore " + uploadBusStops[0].filename + ": " + str(error))
+        except ScenarioRegistry.MissingScenarioError:
+            return rx.toast.error("Zastávky už nie sú dostupné, nahrajte ich znova")
         state.busSopsFilename = uploadBusStops[0].filename
-        state.selectedBusStops = uploadBusStops[0].file.read().decode('utf-8')
-        state.busStopTable = self.parseBusStopsToTuple(state.selectedBusStops)
+        state.busStopsId = busStopsId
+        state.busStopTable = self.parseBusStopsToTuple(busStops)
         if self.router.page.path == "/optimize":
-            state.initConstraints()
+            state.initConstraints(busStops)
         
     @rx.event
     async def handleUploadTimeTable(self, uploadTimeTable: list[rx.UploadFile]):
@@ -142,10 +160,18 @@ class InfoUploadState(rx.State):
         if self.router.page.path == "/optimize":
             stateClass = OptimizeLineState
         state = await self.get_state(stateClass)
+        scenarioRegistry = getScenarioRegistry()
+        try:
+            timeTableId = scenarioRegistry.registerTimeTable(uploadTimeTable[0].file.read().decode('utf-8'))
+            timeTable = scenarioRegistry.getTimeTable(timeTableId)
+        except InputParser.ParseError as error:
+            return rx.toast.error("Chyba v súbore " + uploadTimeTable[0].filename + ": " + str(error))
+        except ScenarioRegistry.MissingScenarioError:
+            return rx.toast.error("Rozpis už nie je dostupný, nahrajte ho znova")
         state.selectedTimeTableName = ''
         state.timeTableFilename = uploadTimeTable[0].filename
-        state.selectedTimeTable = uploadTimeTable[0].file.read().decode('utf-8')
-        state.timeTable = self.parseTimeTableToTuple(state.selectedTimeTable)
+        state.timeTableId = timeTableId
+        state.timeTable = self.parseTimeTableToTuple(timeTable)
         
 def infoUpload(stateClass) -> rx.Component:
     """
@@ -4,12 +4,13 @@ This file contains optimize line component and its state.
 :author: Lukas Katona
 """
 
+import asyncio
 import reflex as rx
 from datetime import datetime
 
-from ..backend.models import TimeTable
-from ..backend.InputParser import InputParser
-from ..backend.Genetics import Genetics
+from ..backend.models import BusStop, TimeTable
+from ..backend.ScenarioRegistry import ScenarioRegistry, getScenarioRegistry
+from ..backend.JobManager import JobManager, getJobManager
 
 from ..components.timeTable import timeTable
 from ..components.infoCard import infoCard
@@ -18,10 +19,11 @@ from .numberInput import numberImput
 
 class OptimizeLineState(rx.State):
     selectedTimeTableName: str = ""
-    selectedTimeTable: str = ""
+    # ids of the parsed inputs in the scenario registry
+    timeTableId: str = ""
 
     busSopsFilename: str = ""
-    selectedBusStops: str = ""
+    busStopsId: str = ""
     timeTableFilename: str = ""
     busStopTable: list[tuple[str, str, bool]] = []
     timeTable: list[tuple[str, str, bool]] = []
@@ -41,9 +43,18 @@ class OptimizeLineState(rx.State):
 
     optimizationRunning: bool = False
     _n_tasks: int = 0
+    _jobId: str = ""
     startTime: str = ""
     endTime: str = ""
     duration: str = ""
+    # offsprings ranked out by the queueing surrogate or skipped by the learned surrogate, which were never simulated
+    skippedSimulations: int = 0
+    # share of the offsprings of every generation screened out by the queueing surrogate without the simulation,
+    # 0 simulates all offsprings like the optimization without the surrogate, the screening has to be chosen explicitly
+    _screenedFraction: float = 0
+    # the offsprings predicted to be dominated by the whole generation are skipped by the learned surrogate, off by default,
+    # because a bound tight enough to skip only a few non-dominated offsprings skips too few simulations to pay off
+    _learnedSurrogate: bool = False
 
     generation = []
     generationChromosomes: list[list[int]] = []
@@ -83,7 +94,7 @@ class OptimizeLineState(rx.State):
         Resets all state variables.
         """
         self.busSopsFilename = ""
-        self.selectedBusStops = ""
+        self.busStopsId = ""
         self.timeTableFilename = ""
         self.busStopTable = []
         self.timeTable = []
@@ -106,6 +117,7 @@ class OptimizeLineState(rx.State):
         self.startTime = ''
         self.endTime = ''
         self.duration = ''
+        self.skippedSimulations = 0
 
         self.generation = []
         self.generationChromosomes = []
@@ -139,40 +151,80 @@ class OptimizeLineState(rx.State):
         """
         Handles whole optimization process.
         """
-        if not self.selectedBusStops:
+        if not self.busStopsId:
             return
         
         async with self:
             if self._n_tasks > 0:
                 return
+            try:
+                busStops = getScenarioRegistry().getBusStops(self.busStopsId)
+            except ScenarioRegistry.MissingScenarioError:
+                self.optimizationRunning = False
+                self.busStopsId = ""
+                self.busStopTable = []
+                yield rx.toast.error("Zastávky už nie sú dostupné, nahrajte ich znova")
+                return
             self._n_tasks += 1
             self.generationNumber = "0/" + str(self.numberOfGenerations)
-
-        genetics = Genetics(self.populationSize, self.mutationRate, self.maxConnectionsPerHour, self.vehicleCapacity, self.vehicleSeats, self.costPerSeatKm, self.routeLength, InputParser.parseBusStopsFromString(self.selectedBusStops), self.constraints)
-
-        for i in range(self.numberOfGenerations):
-            async with self:
-                if not self.optimizationRunning:
+            self.skippedSimulations = 0
+
+        # the optimization runs as a job of the job manager shared by all sessions, the state only polls its status,
+        # the calls of the job manager can wait for the redis broker, so they run in a thread and do not block the other sessions
+        jobManager = getJobManager(rx.config.get_config().redis_url)
+        jobId = await asyncio.to_thread(
+            jobManager.submit,
+            self.numberOfGenerations,
+            (self.populationSize, self.mutationRate, self.maxConnectionsPerHour, self.vehicleCapacity, self.vehicleSeats, self.costPerSeatKm, self.routeLength, busStops, self.constraints),
+            {"surrogateFraction": 1 - self._screenedFraction, "learnedSurrogate": self._learnedSurrogate},
+            owner=self.router.session.client_token,
+        )
+        async with self:
+            self._jobId = jobId
+        lastGenerationNumber = 0
+        stoppedByUser = False
+        try:
+            while True:
+                async with self:
+                    if not self.optimizationRunning:
+                        stoppedByUser = True
+                        break
+                status = await asyncio.to_thread(jobManager.status, jobId)
+                # the job expired or the broker lost it
+                if status is None:
                     break
-                self.generationNumber = str(i+1) + "/" + str(self.numberOfGenerations)
-                self.generation = []
-                self.generationChromosomes = []
-                sortedGeneration = genetics.generation.copy()
-                sortedGeneration = sorted(sortedGeneration, key=lambda individual: individual.cost)
-                for individual in sortedGeneration:
-                    self.generation.append({"cost": individual.cost, "satisfaction": individual.satisfaction})
-                    self.generationChromosomes.append(individual.chromosome)
-                self.bestTimeTableChromosome = genetics.generation[int(round(len(genetics.generation)/2))].chromosome
-                self.bestTimeTableString = str(TimeTable(self.bestTimeTableChromosome))
-                self.bestTimeTable = self.parseTimeTableToTuple(TimeTable(self.bestTimeTableChromosome))
-            genetics.updateGeneration()
-                
+                snapshot = status["snapshot"]
+                if snapshot is not None and snapshot.generationNumber != lastGenerationNumber:
+                    lastGenerationNumber = snapshot.generationNumber
+                    async with self:
+                        self.generationNumber = str(snapshot.generationNumber) + "/" + str(self.numberOfGenerations)
+                        self.generation = [{"cost": cost, "satisfaction": satisfaction} for cost, satisfaction in zip(snapshot.costs, snapshot.satisfactions)]
+                        self.generationChromosomes = snapshot.chromosomes
+                        self.bestTimeTableChromosome = snapshot.bestChromosome
+                        self.skippedSimulations = snapshot.skippedSimulations
+                        self.bestTimeTableString = str(TimeTable(self.bestTimeTableChromosome))
+                        self.bestTimeTable = self.parseTimeTableToTuple(TimeTable(self.bestTimeTableChromosome))
+                if status["status"] not in (JobManager.Status.Queued, JobManager.Status.Running):
+                    break
+                await asyncio.sleep(JobManager.pollInterval)
+        finally:
+            await asyncio.to_thread(jobManager.cancel, jobId)
+        status = await asyncio.to_thread(jobManager.status, jobId)
+
         async with self:
             self.optimizationRunning = False
             self._n_tasks -= 1
             self.endTime = datetime.now().strftime("%H:%M:%S")
             self.duration = str(datetime.strptime(self.endTime, "%H:%M:%S") - datetime.strptime(self.startTime, "%H:%M:%S"))
-            yield rx.toast.success("Optimalizácia dokončená")
+            # stopping by the user is already announced by the button
+            if status is None:
+                yield rx.toast.error("Stav optimalizácie už nie je dostupný, spustite ju znova")
+            elif status["status"] == JobManager.Status.Failed:
+                yield rx.toast.error(status["error"])
+            elif status["status"] == JobManager.Status.Finished:
+                yield rx.toast.success("Optimalizácia dokončená")
+            elif not stoppedByUser:
+                yield rx.toast.warning("Optimalizácia bola zrušená")
 
     @rx.event
     async def toggleOptimizationRun(self):
@@ -183,16 +235,20 @@ class OptimizeLineState(rx.State):
         :rtype: function
         """
         self.optimizationRunning = not self.optimizationRunning
+        if not self.optimizationRunning and self._jobId:
+            await asyncio.to_thread(getJobManager(rx.config.get_config().redis_url).cancel, self._jobId)
         if self.optimizationRunning:
             self.startTime = datetime.now().strftime("%H:%M:%S")
             self.showOptimization = True
             return OptimizeLineState.handleOptimization
         
-    def initConstraints(self):
+    def initConstraints(self, busStops: tuple[BusStop, ...]):
         """
         Parses statistics of incoming passengers during day and if none are comming during specific hour, its constraint is set to 0.
+
+        :param busStops: Uploaded bus stops
+        :type busStops: tuple[BusStop, ...]
         """
-        busStops = InputParser.parseBusStopsFromString(self.selectedBusStops)
         busStopRates = {rate[0] for busStop in busStops for rate in busStop.passengerArrivalRatesPerHour}
         self.constraints = [0 if hour not in busStopRates else self.constraints[hour] for hour in range(24)]
 
@@ -239,7 +295,7 @@ class OptimizeLineState(rx.State):
         state = await self.get_state(InfoUploadState)
         if self.saveTimeTableName == "":
             self.saveTimeTableName = "Rozpis " + str(datetime.now())
-        state.insertNewTimeTable((self.saveTimeTableName, self.bestTimeTableString))
+        state.insertNewTimeTable((self.saveTimeTableName, getScenarioRegistry().registerTimeTable(self.bestTimeTableString)))
         self.saveTimeTableName = ""
     
     def setPopulationSize(self, value: str):
@@ -298,7 +354,7 @@ def optimizeLine() -> rx.Component:
                 ],
                 size="3",
                 disabled=rx.cond(
-                    (OptimizeLineState.selectedBusStops == ""),
+                    (OptimizeLineState.busStopsId == ""),
                     True,
                     False,
                 ),
@@ -320,6 +376,7 @@ def optimizeLine() -> rx.Component:
                     infoCard("Začiatok", OptimizeLineState.startTime),
                     infoCard("Koniec", OptimizeLineState.endTime, loading=rx.cond(OptimizeLineState.optimizationRunning, True, False)),
                     infoCard("Trvanie", OptimizeLineState.duration, loading=rx.cond(OptimizeLineState.optimizationRunning, True, False)),
+                    infoCard("Ušetrené simulácie", OptimizeLineState.skippedSimulations),
                     width="100%",
                     spacing="5",
                     align="stretch",
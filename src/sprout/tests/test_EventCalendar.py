@@ -0,0 +1,121 @@
+"""
+This file contains the tests of the EventCalendar class, random sequences of operations are compared with a sorted list of the pending events.
+
+:author: Lukas Katona
+"""
+
+import random
+
+import pytest
+
+from sprout.backend.EventCalendar import Event, EventCalendar
+
+class ReferenceCalendar:
+    """
+    The pending events in a list, the next event is the one with the lowest time, added first among the events with the same time.
+    """
+    # INIT
+    def __init__(self):
+        # (time, sequence, event) of the pending events
+        self.entries = []
+        self.sequence = 0
+
+    # METHODS
+    def add(self, event: Event):
+        self.remove(event)
+        self.entries.append((event.time, self.sequence, event))
+        self.sequence += 1
+
+    def remove(self, event: Event) -> bool:
+        for entry in self.entries:
+            if entry[2] is event:
+                self.entries.remove(entry)
+                return True
+        return False
+
+    def peek(self) -> Event | None:
+        return min(self.entries, key=lambda entry: entry[:2])[2] if self.entries else None
+
+    def pop(self) -> Event | None:
+        event = self.peek()
+        if event is not None:
+            self.remove(event)
+        return event
+
+def testEventsInOrderOfTimeAndInsertion():
+    calendar = EventCalendar()
+    events = [Event(time, print, name) for time, name in ((5, "a"), (1, "b"), (5, "c"), (1, "d"))]
+    calendar.addEvent(events[0])
+    calendar.addEvent(events[1])
+    calendar.addEvents(events[2:])
+    assert [calendar.getNextEvent().actionArgument for _ in range(4)] == ["b", "d", "a", "c"]
+    assert calendar.isEmpty()
+    assert calendar.getNextEvent() is None
+
+def testCancelledEventIsSkipped():
+    calendar = EventCalendar()
+    first, second = Event(1, print, "first"), Event(2, print, "second")
+    calendar.addEvents([first, second])
+    assert calendar.cancelEvent(first)
+    assert not calendar.cancelEvent(first)
+    assert calendar.peekNextEvent() is second
+    assert calendar.getNextEvent() is second
+    assert not calendar.cancelEvent(second)
+    assert calendar.isEmpty()
+
+def testEventAddedAgainLeavesNoStaleEntry():
+    calendar = EventCalendar()
+    event = Event(1, print, "event")
+    calendar.addEvent(event)
+    event.time = 3
+    calendar.addEvent(event)
+    calendar.addEvent(Event(2, print, "other"))
+    assert calendar.getNextEvent().actionArgument == "other"
+    assert calendar.getNextEvent() is event
+    assert calendar.getNextEvent() is None
+    assert calendar.isEmpty()
+
+    # the cancelled event added again is pending, its cancelled entry stays skipped
+    calendar.addEvent(event)
+    calendar.cancelEvent(event)
+    calendar.addEvent(event)
+    assert calendar.getNextEvent() is event
+    assert calendar.isEmpty()
+
+@pytest.mark.parametrize("seed", range(20))
+def testRandomOperationsMatchReference(seed):
+    generator = random.Random(seed)
+    calendar = EventCalendar()
+    reference = ReferenceCalendar()
+    events = []
+    for _ in range(2000):
+        operation = generator.random()
+        if operation < 0.3 or not events:
+            event = Event(generator.randint(0, 50), print, len(events))
+            events.append(event)
+            calendar.addEvent(event)
+            reference.add(event)
+        elif operation < 0.4:
+            batch = [Event(generator.randint(0, 50), print, len(events) + i) for i in range(generator.randint(1, 5))]
+            events.extend(batch)
+            calendar.addEvents(batch)
+            for event in batch:
+                reference.add(event)
+        elif operation < 0.55:
+            # any known event is added again, pending, cancelled or already returned
+            event = generator.choice(events)
+            event.time = generator.randint(0, 50)
+            calendar.addEvent(event)
+            reference.add(event)
+        elif operation < 0.7:
+            event = generator.choice(events)
+            assert calendar.cancelEvent(event) == reference.remove(event)
+        elif operation < 0.8:
+            assert calendar.peekNextEvent() is reference.peek()
+        else:
+            assert calendar.getNextEvent() is reference.pop()
+        assert calendar.isEmpty() == (len(reference.entries) == 0)
+    for _ in range(len(reference.entries)):
+        assert calendar.getNextEvent() is reference.pop()
+    assert calendar.isEmpty()
+    assert calendar.getNextEvent() is None
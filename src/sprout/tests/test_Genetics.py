@@ -0,0 +1,91 @@
+"""
+This file contains the tests of the sorting into fronts used by the Genetics class, compared with the pairwise non-dominated sorting it replaced.
+
+:author: Lukas Katona
+"""
+
+import numpy as np
+import pytest
+
+from sprout.backend.Genetics import rangeMaximum, sortIntoConstrainedFronts, sortIntoParetoFronts
+
+def constrainedDominates(p: int, q: int, costs: np.ndarray, satisfactions: np.ndarray, unboarded: np.ndarray) -> bool:
+    if unboarded[p] == 0 and unboarded[q] == 0:
+        return (costs[p] <= costs[q] and satisfactions[p] >= satisfactions[q]) and (costs[p] < costs[q] or satisfactions[p] > satisfactions[q])
+    return unboarded[p] < unboarded[q]
+
+def pairwiseFronts(costs: np.ndarray, satisfactions: np.ndarray, unboarded: np.ndarray) -> list[list[int]]:
+    # the O(N^2) non-dominated sorting of the previous implementation, the fronts in the same order
+    dominatesOver = [[] for _ in range(len(costs))]
+    dominationCounts = [0] * len(costs)
+    fronts = [[]]
+    for p in range(len(costs)):
+        for q in range(len(costs)):
+            if constrainedDominates(p, q, costs, satisfactions, unboarded):
+                dominatesOver[p].append(q)
+            elif constrainedDominates(q, p, costs, satisfactions, unboarded):
+                dominationCounts[p] += 1
+        if dominationCounts[p] == 0:
+            fronts[0].append(p)
+    i = 0
+    while len(fronts[i]) > 0:
+        nextFront = []
+        for p in fronts[i]:
+            for q in dominatesOver[p]:
+                dominationCounts[q] -= 1
+                if dominationCounts[q] == 0:
+                    nextFront.append(q)
+        i += 1
+        fronts.append(nextFront)
+    fronts.pop(-1)
+    return fronts
+
+def randomPopulation(generator: np.random.Generator, size: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # few distinct values, so there are many ties and individuals with equal objectives
+    costs = generator.integers(0, 6, size).astype(np.float64) * 1000
+    satisfactions = generator.integers(0, 6, size) / 5
+    unboarded = np.where(generator.uniform(0, 1, size) < 0.6, 0, generator.integers(1, 4, size)).astype(np.float64)
+    return costs, satisfactions, unboarded
+
+@pytest.mark.parametrize("seed", range(5))
+def testConstrainedFrontsMatchPairwiseSorting(seed):
+    generator = np.random.default_rng(seed)
+    for _ in range(200):
+        costs, satisfactions, unboarded = randomPopulation(generator, int(generator.integers(1, 60)))
+        fronts = sortIntoConstrainedFronts(costs, satisfactions, unboarded)
+        assert [front.tolist() for front in fronts] == pairwiseFronts(costs, satisfactions, unboarded)
+
+@pytest.mark.parametrize("seed", range(5))
+def testParetoFrontsMatchPairwiseSorting(seed):
+    generator = np.random.default_rng(seed)
+    for _ in range(200):
+        size = int(generator.integers(1, 60))
+        costs = generator.integers(0, 8, size).astype(np.float64)
+        satisfactions = generator.integers(0, 8, size) / 7
+        fronts = sortIntoParetoFronts(costs, satisfactions)
+        assert [front.tolist() for front in fronts] == pairwiseFronts(costs, satisfactions, np.zeros(size))
+
+def testContinuousObjectivesMatchPairwiseSorting():
+    generator = np.random.default_rng(0)
+    costs = generator.uniform(0, 1, 300)
+    satisfactions = generator.uniform(0, 1, 300)
+    fronts = sortIntoParetoFronts(costs, satisfactions)
+    assert [front.tolist() for front in fronts] == pairwiseFronts(costs, satisfactions, np.zeros(300))
+
+def testEqualObjectivesShareOneFront():
+    costs = np.full(10, 5.0)
+    satisfactions = np.full(10, 0.5)
+    assert [front.tolist() for front in sortIntoConstrainedFronts(costs, satisfactions, np.zeros(10))] == [list(range(10))]
+    assert [front.tolist() for front in sortIntoConstrainedFronts(costs, satisfactions, np.full(10, 3.0))] == [list(range(10))]
+
+def testEmptyPopulation():
+    assert sortIntoConstrainedFronts(np.empty(0), np.empty(0), np.empty(0)) == []
+
+def testRangeMaximum():
+    generator = np.random.default_rng(0)
+    for size in range(1, 70):
+        values = generator.integers(0, 20, size)
+        starts = generator.integers(0, size, 50)
+        ends = starts + 1 + (generator.integers(0, size, 50) % (size - starts))
+        expected = [values[start:end].max() for start, end in zip(starts, ends)]
+        assert rangeMaximum(values, starts, ends).tolist() == expected
@@ -0,0 +1,106 @@
+"""
+This file contains the tests of the InputParser class, its results are compared with the previous parser based on ast.literal_eval and str.split.
+
+:author: Lukas Katona
+"""
+
+import pathlib
+
+import pytest
+
+from benchmarks.inputParserBenchmark import generateBusStops, generateTimeTable, parseBusStopsWithLiteralEval
+from sprout.backend.InputParser import InputParser
+from sprout.backend.models import TimeTable
+
+INPUTS = pathlib.Path(__file__).parents[2] / "inputs"
+
+def parseTimeTableWithSplit(string: str) -> TimeTable:
+    # the timetable parser replaced by InputParser
+    timeTable = TimeTable()
+    for line in string.split("\n"):
+        line = line.strip()
+        if line.startswith("#") or line == "":
+            continue
+        hour, minutes = line.split(":")
+        if minutes == "":
+            continue
+        timeTable.addRow(int(hour), [int(minute.strip()) for minute in minutes.split(",")])
+    return timeTable
+
+def busStopValues(busStops) -> list[tuple]:
+    # the types are compared as well, rates written as integers have to stay integers
+    return [
+        (busStop.name, busStop.timeDeltaToArrive, [(hourRate.hour, hourRate.rate, type(hourRate.rate)) for hourRate in busStop.passengerArrivalRatesPerHour], busStop.leavingPassengersRate)
+        for busStop in busStops
+    ]
+
+def timeTableValues(timeTable: TimeTable) -> list[tuple]:
+    return [(row.hour, row.minutes) for row in timeTable.rows]
+
+@pytest.mark.parametrize("fileName", ["46_bus-stops.txt", "84_bus-stops.txt"])
+def testSampleBusStopsMatchPreviousParser(fileName):
+    string = (INPUTS / fileName).read_text()
+    assert busStopValues(InputParser.parseBusStopsFromFile(INPUTS / fileName)) == busStopValues(parseBusStopsWithLiteralEval(string))
+    assert busStopValues(InputParser.parseBusStopsFromString(string)) == busStopValues(parseBusStopsWithLiteralEval(string))
+
+def testSampleTimeTableMatchesPreviousParser():
+    string = (INPUTS / "46_time-table.txt").read_text()
+    assert timeTableValues(InputParser.parseTimeTableFromFile(INPUTS / "46_time-table.txt")) == timeTableValues(parseTimeTableWithSplit(string))
+
+@pytest.mark.parametrize("seed", range(3))
+def testGeneratedInputsMatchPreviousParser(seed):
+    busStops = generateBusStops(300, seed)
+    assert busStopValues(InputParser.parseBusStopsFromString(busStops)) == busStopValues(parseBusStopsWithLiteralEval(busStops))
+    timeTable = generateTimeTable(5, seed)
+    assert timeTableValues(InputParser.parseTimeTableFromString(timeTable)) == timeTableValues(parseTimeTableWithSplit(timeTable))
+
+@pytest.mark.parametrize("rates", [
+    "[]",
+    "()",
+    "[(5, 60)]",
+    "[(5, 60),]",
+    "((5, 60),)",
+    "((5, 60), (6, 70.5))",
+    "[[5, 60], (6, 7)]",
+    "[(5, 60,), [6, 7,]]",
+    "[ ( 5 , 60 ) , ( 6 , 1e2 ) ]",
+    "[(5, -1), (+6, .5), (7, 2.)]",
+])
+def testRateFormsMatchPreviousParser(rates):
+    string = f"# comment\n  Arbesova : 3 :{rates}: 0.25 \n\n"
+    assert busStopValues(InputParser.parseBusStopsFromString(string)) == busStopValues(parseBusStopsWithLiteralEval(string))
+
+def testTimeTableFormsMatchPreviousParser():
+    string = "# comment\n5:10, 20 ,30\n 6 :\n\n7:0\n"
+    assert timeTableValues(InputParser.parseTimeTableFromString(string)) == timeTableValues(parseTimeTableWithSplit(string))
+
+@pytest.mark.parametrize("line, column, message", [
+    ("A:1:[(5, 60), (6, x)]:0.1", 19, "expected a number of passengers per hour in the passenger arrival rates, found 'x'"),
+    ("A:x:[(5, 60)]:0.1", 3, "expected an integer time to arrive, found 'x'"),
+    ("Arbesova", 9, "expected ':' after the bus stop name"),
+    ("A:1", 4, "expected ':' after the time to arrive"),
+    ("A:1:[(5, 60)]0.1", 14, "expected ':' after the passenger arrival rates"),
+    ("A:1:(5, 60):0.1", 6, "expected '(' in the passenger arrival rates, found '5'"),
+    ("A:1:{(5, 60)}:0.1", 5, "expected '[' before the passenger arrival rates"),
+    ("A:1:[(5, 60) (6, 70)]:0.1", 14, "expected ',' or ']' in the passenger arrival rates, found '('"),
+    ("A:1:[(5.5, 60)]:0.1", 8, "expected ',' in the passenger arrival rates, found '.'"),
+    ("A:1:[(5, 60)", 13, "expected ',' or ']' in the passenger arrival rates, found end of line"),
+    ("A:1:[(5, 60)]:abc", 15, "expected a number as leaving passengers rate, found 'abc'"),
+])
+def testBusStopErrorPosition(line, column, message):
+    with pytest.raises(InputParser.ParseError) as error:
+        InputParser.parseBusStopsFromString(f"# comment\n\n{line}\nB:1:[]:0")
+    assert (error.value.lineNumber, error.value.column, error.value.message) == (3, column, message)
+    assert isinstance(error.value, ValueError)
+
+@pytest.mark.parametrize("line, column, message", [
+    ("5:10,x,20", 6, "expected an integer minute, found 'x'"),
+    ("5:10,,20", 6, "expected an integer minute, found ','"),
+    ("5:10, 20 ,", 11, "expected an integer minute, found end of line"),
+    ("x:10", 1, "expected an integer hour, found 'x'"),
+    ("5 10", 5, "expected ':' after the hour"),
+])
+def testTimeTableErrorPosition(line, column, message):
+    with pytest.raises(InputParser.ParseError) as error:
+        InputParser.parseTimeTableFromString(f"# comment\n{line}\n6:0")
+    assert (error.value.lineNumber, error.value.column, error.value.message) == (2, column, message)
@@ -0,0 +1,281 @@
+"""
+This file contains the tests of the JobManager class and its brokers, the redis broker runs on a fake in-memory client.
+
+:author: Lukas Katona
+"""
+
+import pathlib
+import threading
+import time
+
+import pytest
+
+from sprout.backend.InputParser import InputParser
+from sprout.backend.JobManager import InProcessBroker, JobManager, RedisBroker
+
+BUS_STOPS = InputParser.parseBusStopsFromFile(pathlib.Path(__file__).parents[2] / "inputs" / "46_bus-stops.txt")
+
+class FakeRedis:
+    """
+    In-memory stand-in for the redis client, with the commands used by the redis broker.
+    Values are stored as bytes and keys expire like in redis.
+    """
+    # INIT
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.values = {}
+        self.sortedSets = {}
+        self.hashes = {}
+        self.expirations = {}
+
+    # KEYS
+    def expireKeys(self):
+        now = time.time()
+        for key in [key for key, expiration in self.expirations.items() if expiration <= now]:
+            del self.expirations[key]
+            self.values.pop(key, None)
+
+    def set(self, key, value, ex=None, nx=False):
+        with self.condition:
+            self.expireKeys()
+            if nx and key in self.values:
+                return None
+            self.values[key] = value if isinstance(value, bytes) else str(value).encode()
+            self.expirations.pop(key, None)
+            if ex is not None:
+                self.expirations[key] = time.time() + ex
+            return True
+
+    def get(self, key):
+        with self.condition:
+            self.expireKeys()
+            return self.values.get(key)
+
+    def exists(self, key):
+        with self.condition:
+            self.expireKeys()
+            return int(key in self.values)
+
+    def expire(self, key, seconds):
+        with self.condition:
+            self.expireKeys()
+            if key not in self.values:
+                return False
+            self.expirations[key] = time.time() + seconds
+            return True
+
+    def ttl(self, key):
+        with self.condition:
+            self.expireKeys()
+            if key not in self.values:
+                return -2
+            if key not in self.expirations:
+                return -1
+            return max(int(self.expirations[key] - time.time()), 0)
+
+    def incr(self, key):
+        with self.condition:
+            value = int(self.values.get(key, b"0")) + 1
+            self.values[key] = str(value).encode()
+            return value
+
+    # SORTED SETS
+    def zadd(self, key, mapping):
+        with self.condition:
+            self.sortedSets.setdefault(key, {}).update(mapping)
+            self.condition.notify_all()
+
+    def bzpopmin(self, key, timeout):
+        with self.condition:
+            if not self.condition.wait_for(lambda: len(self.sortedSets.get(key, {})) > 0, timeout):
+                return None
+            members = self.sortedSets[key]
+            member = min(members, key=lambda member: (members[member], member))
+            return (key.encode(), member.encode(), members.pop(member))
+
+    # HASHES
+    def hincrby(self, key, field, amount):
+        with self.condition:
+            fields = self.hashes.setdefault(key, {})
+            fields[field] = fields.get(field, 0) + amount
+            return fields[field]
+
+    def hget(self, key, field):
+        with self.condition:
+            value = self.hashes.get(key, {}).get(field)
+            return str(value).encode() if value is not None else None
+
+    def hdel(self, key, field):
+        with self.condition:
+            self.hashes.get(key, {}).pop(field, None)
+
+@pytest.fixture(params=["inProcess", "redis"])
+def broker(request):
+    return InProcessBroker() if request.param == "inProcess" else RedisBroker(FakeRedis())
+
+def geneticsArguments(busStops=BUS_STOPS) -> tuple:
+    return (4, 0.05, 15, 80, 30, 99.82, 3.8, busStops, [None]*24)
+
+def waitForEnd(jobManager: JobManager, jobId: str, timeout: float = 60) -> dict:
+    end = time.time() + timeout
+    while time.time() < end:
+        status = jobManager.status(jobId)
+        if status["status"] not in (JobManager.Status.Queued, JobManager.Status.Running):
+            return status
+        time.sleep(0.1)
+    raise TimeoutError(f"job {jobId} did not end")
+
+def testFinishedJob(broker):
+    jobManager = JobManager(1, broker)
+    try:
+        jobId = jobManager.submit(2, geneticsArguments(), owner="owner")
+        status = waitForEnd(jobManager, jobId)
+        assert status["status"] == JobManager.Status.Finished
+        assert status["error"] is None
+        assert "geneticsArguments" not in status
+        snapshot = jobManager.result(jobId)
+        assert snapshot.generationNumber == 2
+        assert len(snapshot.chromosomes) == 4
+        assert broker.getOwnerLoad("owner") == 0
+    finally:
+        jobManager.shutdown()
+
+def testFailedJob(broker):
+    jobManager = JobManager(1, broker)
+    try:
+        jobId = jobManager.submit(2, geneticsArguments(busStops=None), owner="owner")
+        status = waitForEnd(jobManager, jobId)
+        assert status["status"] == JobManager.Status.Failed
+        assert "exited with code" in status["error"]
+        assert jobManager.result(jobId) is None
+        assert broker.getOwnerLoad("owner") == 0
+    finally:
+        jobManager.shutdown()
+
+def testCancelQueuedJob(broker):
+    # without workers the jobs stay queued
+    jobManager = JobManager(0, broker)
+    jobId = jobManager.submit(2, geneticsArguments(), owner="owner")
+    assert jobManager.status(jobId)["status"] == JobManager.Status.Queued
+    assert broker.getOwnerLoad("owner") == 1
+    jobManager.cancel(jobId)
+    assert jobManager.status(jobId)["status"] == JobManager.Status.Cancelled
+    assert broker.isCancelRequested(jobId)
+    assert broker.getOwnerLoad("owner") == 0
+    # cancelling an ended job changes nothing
+    jobManager.cancel(jobId)
+    assert broker.getOwnerLoad("owner") == 0
+
+def testCancelRunningJob(broker):
+    jobManager = JobManager(1, broker)
+    try:
+        jobId = jobManager.submit(1000, geneticsArguments(), owner="owner")
+        end = time.time() + 60
+        while jobManager.status(jobId)["snapshot"] is None and time.time() < end:
+            time.sleep(0.1)
+        jobManager.cancel(jobId)
+        status = waitForEnd(jobManager, jobId)
+        assert status["status"] == JobManager.Status.Cancelled
+        assert jobManager.result(jobId).generationNumber >= 1
+        assert broker.getOwnerLoad("owner") == 0
+    finally:
+        jobManager.shutdown()
+
+def testCancelWhileDequeuing(broker):
+    jobManager = JobManager(0, broker)
+    endedJobIds = []
+    endJob = jobManager.endJob
+    def countingEndJob(job, status):
+        endedJobIds.append(job["id"])
+        endJob(job, status)
+    def runJob(job):
+        # stands in for the worker process, it runs until the cancellation like JobManager.runJob
+        job["status"] = JobManager.Status.Running
+        broker.saveJob(job)
+        while not broker.isCancelRequested(job["id"]):
+            time.sleep(0.001)
+        jobManager.endJob(job, JobManager.Status.Cancelled)
+    jobManager.endJob = countingEndJob
+    jobManager.runJob = runJob
+    # in every other round the cancellation loads the queued job first and marks it only after the worker started it
+    requestCancel = broker.requestCancel
+    delayed = False
+    def delayedRequestCancel(jobId):
+        if delayed:
+            time.sleep(0.02)
+        requestCancel(jobId)
+    broker.requestCancel = delayedRequestCancel
+    # the waiting job keeps the load of the owner above zero, so a second decrement would show
+    jobManager.submit(1, geneticsArguments(), priority=1, owner="owner")
+
+    for round in range(50):
+        delayed = round % 2 == 0
+        jobId = jobManager.submit(1, geneticsArguments(), owner="owner")
+        barrier = threading.Barrier(2)
+        def cancel():
+            barrier.wait()
+            jobManager.cancel(jobId)
+        def dequeue():
+            barrier.wait()
+            if delayed:
+                time.sleep(0.005)
+            jobManager.runNextJob(1)
+        threads = [threading.Thread(target=cancel), threading.Thread(target=dequeue)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        assert jobManager.status(jobId)["status"] == JobManager.Status.Cancelled
+        assert endedJobIds.count(jobId) == 1
+        assert broker.getOwnerLoad("owner") == 1
+
+def testOwnerLoadOrdersQueue(broker):
+    jobManager = JobManager(0, broker)
+    first = jobManager.submit(1, geneticsArguments(), owner="busy")
+    second = jobManager.submit(1, geneticsArguments(), owner="busy")
+    other = jobManager.submit(1, geneticsArguments(), owner="other")
+    urgent = jobManager.submit(1, geneticsArguments(), priority=-1, owner="busy")
+    assert broker.getOwnerLoad("busy") == 3
+    assert [broker.dequeue(0.1) for _ in range(4)] == [urgent, first, other, second]
+    assert broker.dequeue(0.1) is None
+
+def testEndedJobsExpire(broker, monkeypatch):
+    monkeypatch.setattr(JobManager, "finishedJobTimeToLive", 0.2)
+    jobManager = JobManager(0, broker)
+    jobId = jobManager.submit(1, geneticsArguments(), owner="owner")
+    jobManager.cancel(jobId)
+    assert jobManager.status(jobId) is not None
+    # redis expirations are in whole seconds
+    time.sleep(1.2 if isinstance(broker, RedisBroker) else 0.3)
+    assert jobManager.status(jobId) is None
+    assert not broker.isCancelRequested(jobId)
+
+def testInProcessBrokerForgetsExpiredJobs(monkeypatch):
+    monkeypatch.setattr(JobManager, "finishedJobTimeToLive", 0.05)
+    broker = InProcessBroker()
+    jobManager = JobManager(0, broker)
+    for _ in range(10):
+        jobManager.cancel(jobManager.submit(1, geneticsArguments(), owner="owner"))
+    time.sleep(0.1)
+    broker.loadJob("missing")
+    assert broker.jobs == {}
+    assert broker.cancelled == set()
+    assert broker.ownerLoads == {}
+
+def testRedisBrokerKeys():
+    client = FakeRedis()
+    broker = RedisBroker(client, prefix="test")
+    jobManager = JobManager(0, broker)
+    jobId = jobManager.submit(1, geneticsArguments(), owner="owner")
+    assert client.ttl(f"test:job:{jobId}") == -1
+    assert client.hget("test:owners", "owner") == b"1"
+    assert len(client.sortedSets["test:queue"]) == 1
+    jobManager.cancel(jobId)
+    assert 0 < client.ttl(f"test:job:{jobId}") <= JobManager.finishedJobTimeToLive
+    assert 0 < client.ttl(f"test:cancelled:{jobId}") <= JobManager.finishedJobTimeToLive
+    assert client.hget("test:owners", "owner") is None
+    assert 0 < client.ttl(f"test:claimed:{jobId}") <= JobManager.finishedJobTimeToLive
+    assert not broker.claimJob(jobId)
+    # the cancellation of a job which does not exist is not stored
+    broker.requestCancel("missing")
+    assert client.get("test:cancelled:missing") is None
@@ -0,0 +1,79 @@
+"""
+This file contains the tests of the simulation engines, their results have to agree within the standard error and be reproducible for a fixed seed.
+
+:author: Lukas Katona
+"""
+
+import pathlib
+
+import numpy as np
+import pytest
+
+from sprout.backend.InputParser import InputParser
+from sprout.backend.RandomNumberGenerator import RandomNumberGenerator
+from sprout.backend.Simulation import Simulation
+
+INPUTS = pathlib.Path(__file__).parents[2] / "inputs"
+BUS_STOPS = InputParser.parseBusStopsFromFile(INPUTS / "46_bus-stops.txt")
+TIME_TABLE = InputParser.parseTimeTableFromFile(INPUTS / "46_time-table.txt")
+# a crowded line, where passengers are left unboarded, and a quiet one
+VEHICLES = [(40, 20), (100, 40)]
+
+def metrics(stats) -> tuple:
+    busStopStatistics = stats.busStopStatistics
+    return (
+        busStopStatistics.totalPassengersArrived,
+        busStopStatistics.totalPassengersLeftUnboarded,
+        busStopStatistics.totalTimeSpentWaiting,
+        stats.averagePassengerSatisfaction,
+        stats.busStatistics.averageLoad,
+        stats.totalNumberOfBuses,
+    )
+
+def assertAgree(statsList, otherStatsList):
+    # the means differ by less than four standard errors of the difference, equal if neither varies
+    samples = np.array([metrics(stats) for stats in statsList], dtype=np.float64)
+    otherSamples = np.array([metrics(stats) for stats in otherStatsList], dtype=np.float64)
+    difference = np.abs(samples.mean(axis=0) - otherSamples.mean(axis=0))
+    standardError = np.sqrt(samples.var(axis=0, ddof=1) / len(samples) + otherSamples.var(axis=0, ddof=1) / len(otherSamples))
+    assert np.all(difference <= 4 * standardError + 1e-9), (difference, standardError)
+
+@pytest.mark.parametrize("vehicleCapacity, vehicleSeats", VEHICLES)
+def testStopMajorAgreesWithEventDriven(vehicleCapacity, vehicleSeats):
+    eventDriven = Simulation.runMultiple(0, 24*60, BUS_STOPS, TIME_TABLE, vehicleCapacity, vehicleSeats, 40, seed=1, engine=Simulation.Engine.EventDriven)
+    stopMajor = Simulation.runMultiple(0, 24*60, BUS_STOPS, TIME_TABLE, vehicleCapacity, vehicleSeats, 100, seed=2, engine=Simulation.Engine.StopMajor)
+    assertAgree(eventDriven, stopMajor)
+
+@pytest.mark.parametrize("engine", [Simulation.Engine.EventDriven, Simulation.Engine.StopMajor])
+def testRunIsReproducible(engine):
+    first = Simulation.run(0, 24*60, BUS_STOPS, TIME_TABLE, 40, 20, RandomNumberGenerator(7), engine)
+    second = Simulation.run(0, 24*60, BUS_STOPS, TIME_TABLE, 40, 20, RandomNumberGenerator(7), engine)
+    other = Simulation.run(0, 24*60, BUS_STOPS, TIME_TABLE, 40, 20, RandomNumberGenerator(8), engine)
+    assert metrics(first) == metrics(second)
+    assert first.busStopStatistics.passengersLeftUnboardedPerHour == second.busStopStatistics.passengersLeftUnboardedPerHour
+    assert metrics(first) != metrics(other)
+
+def testRunMultipleDoesNotDependOnWorkers():
+    oneWorker = Simulation.runMultiple(0, 24*60, BUS_STOPS, TIME_TABLE, 40, 20, 6, seed=3, engine=Simulation.Engine.StopMajor)
+    twoWorkers = Simulation.runMultiple(0, 24*60, BUS_STOPS, TIME_TABLE, 40, 20, 6, seed=3, numberOfWorkers=2, engine=Simulation.Engine.StopMajor)
+    assert [metrics(stats) for stats in oneWorker] == [metrics(stats) for stats in twoWorkers]
+
+@pytest.mark.parametrize("vehicleCapacity, vehicleSeats", VEHICLES)
+@pytest.mark.parametrize("antitheticVariates", [False, True])
+def testMultiLaneAgreesWithStopMajor(vehicleCapacity, vehicleSeats, antitheticVariates):
+    stopMajor = Simulation.runMultiple(0, 24*60, BUS_STOPS, TIME_TABLE, vehicleCapacity, vehicleSeats, 100, seed=2, engine=Simulation.Engine.StopMajor)
+    multiLane = Simulation.runMultiple(0, 24*60, BUS_STOPS, TIME_TABLE, vehicleCapacity, vehicleSeats, 100, seed=3, engine=Simulation.Engine.MultiLane, antitheticVariates=antitheticVariates)
+    assertAgree(stopMajor, multiLane)
+
+@pytest.mark.parametrize("antitheticVariates", [False, True])
+def testMultiLaneIsReproducible(antitheticVariates):
+    first = Simulation.runMultiple(0, 24*60, BUS_STOPS, TIME_TABLE, 40, 20, 10, seed=4, engine=Simulation.Engine.MultiLane, antitheticVariates=antitheticVariates)
+    second = Simulation.runMultiple(0, 24*60, BUS_STOPS, TIME_TABLE, 40, 20, 10, seed=4, engine=Simulation.Engine.MultiLane, antitheticVariates=antitheticVariates)
+    assert [metrics(stats) for stats in first] == [metrics(stats) for stats in second]
+    assert len({metrics(stats) for stats in first}) == 10
+
+def testAverageIsReproducible():
+    first = Simulation.runMultipleThanAverage(0, 24*60, BUS_STOPS, TIME_TABLE, 40, 20, 10, seed=5, engine=Simulation.Engine.MultiLane, controlVariates=True)
+    second = Simulation.runMultipleThanAverage(0, 24*60, BUS_STOPS, TIME_TABLE, 40, 20, 10, seed=5, engine=Simulation.Engine.MultiLane, controlVariates=True)
+    assert metrics(first) == metrics(second)
+    assert all(np.array_equal(first.distributions[name].mean, second.distributions[name].mean) for name in first.distributions)